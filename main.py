@@ -1,9 +1,13 @@
 import gradio as gr
 
-from src.assistant import ChatBot
+from src.assistant import ChatBot, ResultBrowser
+from src.assistant.startup import health_routes, warm_up
 from src.utils import UISettings
+from src.utils.instrumentation import metrics_routes
 
 with gr.Blocks() as demo:
+    session_id = gr.BrowserState("", storage_key="agentic_lakehouse_session")
+
     with gr.Row() as row_one:
         chatbot = gr.Chatbot(
             [],
@@ -25,15 +29,38 @@ with gr.Blocks() as demo:
         text_submit_btn = gr.Button(value="Submit text")
         clear_button = gr.ClearButton([input_txt, chatbot])
 
+    with gr.Accordion("Query results", open=False):
+        with gr.Row():
+            result_handle = gr.Textbox(label="Result handle", scale=4)
+            result_page = gr.Number(value=0, label="Page", precision=0, scale=1)
+        result_status = gr.Markdown()
+        result_table = gr.Dataframe(interactive=False, wrap=True)
+        with gr.Row():
+            prev_page_btn = gr.Button(value="Previous page")
+            next_page_btn = gr.Button(value="Next page")
+            download_btn = gr.DownloadButton(label="Download CSV")
+
+    result_outputs = [result_table, result_page, result_status]
+    result_handle.submit(ResultBrowser.show, [result_handle, result_page], result_outputs, queue=False).then(
+        ResultBrowser.download, [result_handle], [download_btn], queue=False
+    )
+    prev_page_btn.click(ResultBrowser.previous_page, [result_handle, result_page], result_outputs, queue=False)
+    next_page_btn.click(ResultBrowser.next_page, [result_handle, result_page], result_outputs, queue=False)
+
+    demo.load(ChatBot.restore_session, [session_id], [session_id, chatbot])
+    clear_button.click(ChatBot.clear_session, [session_id], [session_id], queue=False)
+
     text_submit_btn.click(
-        fn=ChatBot.respond,
-        inputs=[chatbot, input_txt],
+        fn=ChatBot.arespond,
+        inputs=[chatbot, input_txt, session_id],
         outputs=[input_txt, chatbot],
-        queue=True
+        queue=True,
+        concurrency_limit=None, # arespond is async, sessions interleave on the event loop; admission control is done by the `scheduler` config
     ).then(
         lambda: gr.Textbox(interactive=True), None, [input_txt], queue=False
     )
 
 
 if __name__ == "__main__":
-    demo.launch(debug=True)
+    warm_up()
+    demo.launch(debug=True, app_kwargs={"routes": health_routes() + metrics_routes()})
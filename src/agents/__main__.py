@@ -0,0 +1,34 @@
+from langchain_core.tools import StructuredTool
+
+import argparse
+
+from ..load_config import get_tools_config
+
+TOOLS_CFG = get_tools_config()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Renders the agent graph diagram to images/<name>.png (Mermaid, needs network access).")
+    parser.add_argument("--name", default="router_agent", help="File name of the diagram, without extension")
+    args = parser.parse_args()
+
+    # The diagram only shows the nodes and edges, so the graph is built on stand-ins and
+    # no LLM, Databricks, Supabase or Tavily credentials are needed.
+    from ..benchmark.fakes import ROUTER, ScriptedChatModel, load_fake_search_tool
+    from .backend import plot_agent_schema
+    from .graph import build_graph
+
+    graph = build_graph(
+        web_search_agent_llm=ScriptedChatModel(scenarios={}, role=TOOLS_CFG.web_search_agent_name),
+        spark_sql_agent_llm=ScriptedChatModel(scenarios={}, role=TOOLS_CFG.spark_sql_agent_name),
+        router_llm=ScriptedChatModel(scenarios={}, role=ROUTER),
+        rag_agent_llm=ScriptedChatModel(scenarios={}, role=TOOLS_CFG.rag_agent_name),
+        search_tool=load_fake_search_tool(),
+        spark_sql_tools=[],
+        retriever_tool=StructuredTool.from_function(lambda query: "", name="retrieve_docs", description="unused"),
+    )
+    plot_agent_schema(graph, args.name)
+
+
+if __name__ == "__main__":
+    main()
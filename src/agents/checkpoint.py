@@ -0,0 +1,263 @@
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langchain_core.runnables import RunnableConfig
+
+from typing import Any, Dict, Iterator, Sequence, Tuple
+from collections import OrderedDict
+from pathlib import Path
+import threading
+import sqlite3
+import pickle
+import atexit
+import queue
+import time
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS checkpoints (thread_id TEXT, checkpoint_id TEXT, updated_at REAL, payload BLOB, PRIMARY KEY (thread_id, checkpoint_id))",
+    "CREATE TABLE IF NOT EXISTS checkpoint_blobs (thread_id TEXT, channel TEXT, version TEXT, payload BLOB, PRIMARY KEY (thread_id, channel, version))",
+    "CREATE TABLE IF NOT EXISTS checkpoint_writes (thread_id TEXT, checkpoint_id TEXT, payload BLOB, PRIMARY KEY (thread_id, checkpoint_id))",
+)
+
+
+class BoundedCheckpointSaver(InMemorySaver):
+    """
+    In-memory checkpointer with bounded memory and an optional SQLite backing store.
+
+    - Only the last `keep_checkpoints` checkpoints of each thread/namespace are kept, along
+      with the pending writes and channel blobs they reference, and finished subgraph
+      namespaces are dropped (compaction).
+    - At most `max_threads` threads stay in memory; least recently used threads and threads
+      idle for more than `idle_ttl` seconds are evicted.
+    - With `sqlite_path` set, root checkpoints are written through to SQLite incrementally
+      (the new checkpoint, its new channel blobs and pending writes; compacted ones are
+      deleted) by a background writer that commits whatever queued up in one transaction,
+      so evicted threads are reloaded on their next access and a restarted app picks up
+      active sessions. Subgraph checkpoints stay in memory only. Threads idle for more than
+      `disk_ttl` seconds are deleted.
+    """
+
+    def __init__(
+        self,
+        max_threads: int = 512,
+        idle_ttl: float = 3600.0,
+        keep_checkpoints: int = 2,
+        sqlite_path: str | Path | None = None,
+        disk_ttl: float = 7 * 24 * 3600.0,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.idle_ttl = idle_ttl
+        self.keep_checkpoints = max(keep_checkpoints, 1)
+        self.disk_ttl = disk_ttl
+        self._last_access: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._counters = {"evictions": 0, "disk_loads": 0, "disk_writes": 0, "disk_statements": 0, "compacted_checkpoints": 0}
+
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self._pending: "queue.Queue[Tuple[str, tuple]]" = queue.Queue()
+        if sqlite_path:
+            Path(sqlite_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(sqlite_path), check_same_thread=False)
+            for statement in _SCHEMA:
+                self._db.execute(statement)
+            self._db.commit()
+            self.sweep()
+            threading.Thread(target=self._write_loop, name="checkpoint-writer", daemon=True).start()
+            atexit.register(self.flush)
+
+    # ---- persistence -------------------------------------------------------------------
+
+    def _enqueue(self, statement: str, params: tuple) -> None:
+        if self._db is not None:
+            self._pending.put((statement, params))
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._pending.get()]
+            while True:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._db_lock:
+                    for statement, params in batch:
+                        self._db.execute(statement, params)
+                    self._db.commit()
+                    # Not under self._lock: `_restore` holds it while waiting for this loop.
+                    self._counters["disk_writes"] += 1
+                    self._counters["disk_statements"] += len(batch)
+            except Exception as e:
+                print(f"Checkpoint write failed: {e}")
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+
+    def flush(self) -> None:
+        """Waits until every queued checkpoint write is committed."""
+        if self._db is not None:
+            self._pending.join()
+
+    def _persist_checkpoint(self, thread_id: str, checkpoint_id: str, new_versions: ChannelVersions) -> None:
+        self._enqueue(
+            "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_id, updated_at, payload) VALUES (?, ?, ?, ?)",
+            (thread_id, checkpoint_id, time.time(), pickle.dumps(self.storage[thread_id][""][checkpoint_id])),
+        )
+        for channel, version in new_versions.items():
+            self._enqueue(
+                "INSERT OR REPLACE INTO checkpoint_blobs (thread_id, channel, version, payload) VALUES (?, ?, ?, ?)",
+                (thread_id, channel, str(version), pickle.dumps((version, self.blobs[(thread_id, "", channel, version)]))),
+            )
+
+    def _persist_writes(self, thread_id: str, checkpoint_id: str) -> None:
+        writes = self.writes.get((thread_id, "", checkpoint_id))
+        if writes:
+            self._enqueue(
+                "INSERT OR REPLACE INTO checkpoint_writes (thread_id, checkpoint_id, payload) VALUES (?, ?, ?)",
+                (thread_id, checkpoint_id, pickle.dumps(dict(writes))),
+            )
+
+    def _restore(self, thread_id: str) -> None:
+        if self._db is None or thread_id in self.storage:
+            return
+        # An evicted thread may still have writes in the queue.
+        self.flush()
+        with self._db_lock:
+            checkpoints = self._db.execute("SELECT checkpoint_id, payload FROM checkpoints WHERE thread_id = ?", (thread_id,)).fetchall()
+            if not checkpoints:
+                return
+            blobs = self._db.execute("SELECT channel, payload FROM checkpoint_blobs WHERE thread_id = ?", (thread_id,)).fetchall()
+            writes = self._db.execute("SELECT checkpoint_id, payload FROM checkpoint_writes WHERE thread_id = ?", (thread_id,)).fetchall()
+        for checkpoint_id, payload in checkpoints:
+            self.storage[thread_id][""][checkpoint_id] = pickle.loads(payload)
+        for channel, payload in blobs:
+            version, blob = pickle.loads(payload)
+            self.blobs[(thread_id, "", channel, version)] = blob
+        for checkpoint_id, payload in writes:
+            self.writes[(thread_id, "", checkpoint_id)] = pickle.loads(payload)
+        self._counters["disk_loads"] += 1
+
+    # ---- bounding ----------------------------------------------------------------------
+
+    def _drop_from_memory(self, thread_id: str) -> None:
+        self.storage.pop(thread_id, None)
+        for key in [k for k in self.writes if k[0] == thread_id]:
+            del self.writes[key]
+        for key in [k for k in self.blobs if k[0] == thread_id]:
+            del self.blobs[key]
+        self._last_access.pop(thread_id, None)
+
+    def _evict(self) -> None:
+        now = time.time()
+        while self._last_access:
+            thread_id, last_access = next(iter(self._last_access.items()))
+            if len(self._last_access) <= self.max_threads and now - last_access <= self.idle_ttl:
+                break
+            self._drop_from_memory(thread_id)
+            self._counters["evictions"] += 1
+
+    def _touch(self, thread_id: str) -> None:
+        """Marks a thread as used, loading it from disk first when it was evicted."""
+        self._restore(thread_id)
+        self._last_access[thread_id] = time.time()
+        self._last_access.move_to_end(thread_id)
+        self._evict()
+
+    def _drop_subgraph_namespaces(self, thread_id: str) -> None:
+        """
+        Drops the checkpoints of finished subgraph runs (the ReAct agents).
+
+        Every agent call gets its own namespace, so they would otherwise pile up turn after
+        turn. A root checkpoint is only written once all nodes of its step are done, and the
+        app never interrupts a subgraph, so none of them is needed past that point.
+        """
+        for checkpoint_ns in [ns for ns in self.storage[thread_id] if ns]:
+            del self.storage[thread_id][checkpoint_ns]
+        for key in [k for k in self.writes if k[0] == thread_id and k[1]]:
+            del self.writes[key]
+        for key in [k for k in self.blobs if k[0] == thread_id and k[1]]:
+            del self.blobs[key]
+
+    def _compact(self, thread_id: str, checkpoint_ns: str) -> None:
+        """Keeps the newest `keep_checkpoints` checkpoints and the writes/blobs they use."""
+        if checkpoint_ns == "":
+            self._drop_subgraph_namespaces(thread_id)
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.keep_checkpoints:
+            return
+        stale_ids = sorted(checkpoints)[:-self.keep_checkpoints]
+        for checkpoint_id in stale_ids:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            if checkpoint_ns == "":
+                self._enqueue("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id = ?", (thread_id, checkpoint_id))
+                self._enqueue("DELETE FROM checkpoint_writes WHERE thread_id = ? AND checkpoint_id = ?", (thread_id, checkpoint_id))
+        self._counters["compacted_checkpoints"] += len(stale_ids)
+
+        live_versions = set()
+        for checkpoint, _, _ in checkpoints.values():
+            for channel, version in self.serde.loads_typed(checkpoint)["channel_versions"].items():
+                live_versions.add((channel, version))
+        for key in [k for k in self.blobs if k[0] == thread_id and k[1] == checkpoint_ns and (k[2], k[3]) not in live_versions]:
+            del self.blobs[key]
+            if checkpoint_ns == "":
+                self._enqueue("DELETE FROM checkpoint_blobs WHERE thread_id = ? AND channel = ? AND version = ?", (thread_id, key[2], str(key[3])))
+
+    def sweep(self) -> None:
+        """Evicts idle threads from memory and expired threads from disk."""
+        with self._lock:
+            self._evict()
+        if self._db is None:
+            return
+        with self._db_lock:
+            expired = [row[0] for row in self._db.execute(
+                "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(updated_at) < ?", (time.time() - self.disk_ttl,)
+            )]
+            for table in ("checkpoints", "checkpoint_blobs", "checkpoint_writes"):
+                self._db.executemany(f"DELETE FROM {table} WHERE thread_id = ?", [(thread_id,) for thread_id in expired])
+            self._db.commit()
+
+    # ---- BaseCheckpointSaver -----------------------------------------------------------
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        with self._lock:
+            self._touch(config["configurable"]["thread_id"])
+            return super().get_tuple(config)
+
+    def list(self, config: RunnableConfig | None, **kwargs: Any) -> Iterator[CheckpointTuple]:
+        with self._lock:
+            if config:
+                self._touch(config["configurable"]["thread_id"])
+            items = list(super().list(config, **kwargs))
+        yield from items
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        with self._lock:
+            thread_id = config["configurable"]["thread_id"]
+            self._touch(thread_id)
+            checkpoint_ns = config["configurable"]["checkpoint_ns"]
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            if checkpoint_ns == "":
+                self._persist_checkpoint(thread_id, checkpoint["id"], new_versions)
+            self._compact(thread_id, checkpoint_ns)
+            return next_config
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        with self._lock:
+            thread_id = config["configurable"]["thread_id"]
+            self._touch(thread_id)
+            super().put_writes(config, writes, task_id, task_path)
+            if config["configurable"].get("checkpoint_ns", "") == "":
+                self._persist_writes(thread_id, config["configurable"]["checkpoint_id"])
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._drop_from_memory(thread_id)
+            for table in ("checkpoints", "checkpoint_blobs", "checkpoint_writes"):
+                self._enqueue(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, "threads_in_memory": len(self._last_access), "blobs": len(self.blobs)}
@@ -0,0 +1,391 @@
+from langchain_core.messages import AnyMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph._internal._runnable import RunnableCallable
+from langgraph.errors import ParentCommand
+from langgraph.graph import END
+from langgraph.pregel import Pregel
+from langgraph.types import Command
+from pyprojroot import here
+import numpy as np
+
+from typing import Dict, Iterable, List, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from collections import defaultdict, deque
+import threading
+import json
+import time
+import zlib
+import os
+import re
+
+from ..load_config import get_tools_config
+
+TOOLS_CFG = get_tools_config()
+
+_WORD_RE = re.compile(r"\w+")
+# Follow ups whose meaning depends on the conversation ("and last year?", "show more"):
+# never fast routed, the router LLM sees the history.
+_FOLLOW_UP_RE = re.compile(
+    r"^\s*(and|but|also|or|so|then|now|ok|okay|only|just|what about|how about|same)\b"
+    r"|^\s*(show|give|list|tell)\s+(me\s+)?more\b"
+    r"|\b(sort|order|filter|group|break down|limit|split)\s+(that|this)\b"
+    r"|\b(it|its|those|these|them|they|again|instead|previous|above|same)\b",
+    re.IGNORECASE,
+)
+
+
+def is_follow_up(question: str, min_tokens: int = 2) -> bool:
+    """Too short, or referring back to the conversation: its meaning depends on the history."""
+    return len(_WORD_RE.findall(question)) < min_tokens or bool(_FOLLOW_UP_RE.search(question))
+
+
+# Routers share one decision log file.
+_LOG_LOCK = threading.Lock()
+
+# Seed keyword weights per route, used until enough logged decisions exist to train the
+# classifier. Keys are single words or two word phrases.
+SPARK_SQL_KEYWORDS = {
+    "tables": 4, "table": 3, "schema": 4, "schemas": 4, "sql": 4, "columns": 3, "column": 3,
+    "query": 2, "rows": 2, "count": 1, "revenue": 2, "customer": 1.5, "customers": 1.5,
+    "orders": 1.5, "order": 1, "lineitem": 2, "supplier": 1.5, "suppliers": 1.5, "nation": 1.5,
+    "nations": 1.5, "region": 1, "regions": 1, "partsupp": 2, "average": 0.5, "total": 0.5,
+    "top": 0.5, "group by": 3, "catalog": 2,
+}
+WEB_SEARCH_KEYWORDS = {
+    "latest": 2, "news": 3, "today": 2, "current": 1, "weather": 4, "internet": 4, "web": 3,
+    "online": 2, "search": 1.5, "who is": 2, "stock price": 4, "recent": 1.5, "website": 3,
+}
+DIRECT_KEYWORDS = {"hello": 3, "hi": 3, "thanks": 3, "thank you": 3, "bye": 3}
+RETRIEVER_KEYWORDS = {
+    "tpc h": 3, "tpch": 3, "documentation": 3, "docs": 3, "spec": 2, "specification": 3,
+    "benchmark": 2, "lakehouse": 2, "databricks": 2,
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words plus two word phrases of `text`."""
+    words = _WORD_RE.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def last_human_message(messages: List[AnyMessage]) -> str:
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return message.content if isinstance(message.content, str) else str(message.content)
+    return ""
+
+
+@dataclass
+class RouteDecision:
+    label: str
+    confidence: float
+    source: str  # "cache", "classifier" or "keywords"
+    confident: bool
+
+
+class FastRouter:
+    """
+    Local routing pre-stage in front of an LLM router.
+
+    A question is routed from, in order, an exact-match cache of past LLM decisions, a
+    hashed bag-of-words centroid classifier trained on the logged LLM decisions, and seed
+    keyword weights. Only confident predictions are acted on, everything else goes to the
+    LLM router, whose decision is logged, learned online, and used to score the local
+    prediction in shadow mode (reported by `stats()`).
+
+    Follow ups that refer back to the conversation are never routed locally nor learned,
+    and questions under `cache_min_tokens` words never use the exact-match cache. The log
+    is compacted to the last `max_log_examples` decisions per router past `max_log_bytes`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        keywords: Dict[str, Dict[str, float]],
+        min_confidence: float = 0.8,
+        min_examples: int = 5,
+        min_similarity: float = 0.35,
+        min_tokens: int = 2,
+        cache_min_tokens: int = 4,
+        cache_size: int = 2048,
+        feature_dim: int = 4096,
+        log_path: str | Path | None = None,
+        max_log_examples: int = 5000,
+        max_log_bytes: int = 5 * 2**20,
+    ) -> None:
+        self.name = name
+        self.keywords = keywords
+        self.labels = list(keywords)
+        self.min_confidence = min_confidence
+        self.min_examples = min_examples
+        self.min_similarity = min_similarity
+        self.min_tokens = min_tokens
+        self.cache_min_tokens = cache_min_tokens
+        self.cache_size = cache_size
+        self.feature_dim = feature_dim
+        self.log_path = Path(log_path) if log_path else None
+        self.max_log_examples = max_log_examples
+        self.max_log_bytes = max_log_bytes
+
+        self._centroids = np.zeros((len(self.labels), feature_dim), dtype=np.float32)
+        self._examples = np.zeros(len(self.labels), dtype=np.int64)
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "requests": 0, "fast_routes": 0, "llm_routes": 0,
+            "shadow_evaluated": 0, "shadow_agree": 0, "shadow_confident": 0, "shadow_confident_agree": 0,
+        }
+        self._llm_latency_total = 0.0
+
+        if self.log_path is not None and self.log_path.exists():
+            self._train(self._read_log(max_log_examples))
+
+    # ---- features ----------------------------------------------------------------------
+
+    @staticmethod
+    def _cache_key(tokens: List[str]) -> str:
+        return " ".join(t for t in tokens if " " not in t)
+
+    def _cacheable(self, tokens: List[str]) -> bool:
+        return len([t for t in tokens if " " not in t]) >= self.cache_min_tokens
+
+    def is_follow_up(self, question: str) -> bool:
+        """Too short, or referring back to the conversation: only the router LLM can route it."""
+        return is_follow_up(question, self.min_tokens)
+
+    def _vectorize(self, tokens: Iterable[str]) -> np.ndarray:
+        vector = np.zeros(self.feature_dim, dtype=np.float32)
+        for token in tokens:
+            vector[zlib.crc32(token.encode()) % self.feature_dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _learn(self, tokens: List[str], label: str) -> None:
+        if label not in self.labels:
+            return
+        index = self.labels.index(label)
+        self._centroids[index] += self._vectorize(tokens)
+        self._examples[index] += 1
+        if not self._cacheable(tokens):
+            return
+        self._cache[self._cache_key(tokens)] = label
+        self._cache.move_to_end(self._cache_key(tokens))
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _train(self, examples: List[Tuple[str, str]]) -> None:
+        with self._lock:
+            for question, label in examples:
+                if not self.is_follow_up(question):
+                    self._learn(tokenize(question), label)
+        print(f"Fast router '{self.name}' trained on {len(examples)} logged decisions")
+
+    def _read_log(self, limit: int) -> List[Tuple[str, str]]:
+        examples = []
+        with _LOG_LOCK, open(self.log_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("router") == self.name:
+                    examples.append((record["question"], record["label"]))
+        return examples[-limit:]
+
+    # ---- prediction --------------------------------------------------------------------
+
+    def _classify(self, tokens: List[str]) -> Tuple[str, float] | None:
+        trained = self._examples >= self.min_examples
+        if trained.sum() < 2:
+            return None
+        centroids = self._centroids[trained]
+        centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+        similarity = centroids @ self._vectorize(tokens)
+        # Questions unlike anything logged so far are left to the keywords / LLM router.
+        if similarity.max() < self.min_similarity:
+            return None
+        # Softmax with a sharp temperature turns cosine similarities into a confidence.
+        weights = np.exp((similarity - similarity.max()) / 0.1)
+        best = int(np.argmax(weights))
+        label = [l for l, t in zip(self.labels, trained) if t][best]
+        return label, float(weights[best] / weights.sum())
+
+    def _match_keywords(self, tokens: List[str]) -> Tuple[str, float] | None:
+        scores = {label: sum(words.get(t, 0.0) for t in tokens) for label, words in self.keywords.items()}
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        label, score = ranked[0]
+        if score <= 0:
+            return None
+        # Competing keyword evidence lowers the confidence.
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        return label, (score - runner_up) / (score + 1)
+
+    def predict(self, question: str) -> RouteDecision | None:
+        """Best local guess for `question`, with whether it is confident enough to act on."""
+        if self.is_follow_up(question):
+            return None
+        tokens = tokenize(question)
+
+        with self._lock:
+            cached = self._cache.get(self._cache_key(tokens)) if self._cacheable(tokens) else None
+            if cached is not None:
+                return RouteDecision(cached, 1.0, "cache", True)
+            classified = self._classify(tokens)
+
+        candidates = []
+        if classified is not None:
+            candidates.append(RouteDecision(*classified, "classifier", classified[1] >= self.min_confidence))
+        matched = self._match_keywords(tokens)
+        if matched is not None:
+            candidates.append(RouteDecision(*matched, "keywords", matched[1] >= self.min_confidence))
+        if not candidates:
+            return None
+
+        best = max(candidates, key=lambda d: (d.confident, d.confidence))
+        if any(d.confident and d.label != best.label for d in candidates):
+            best.confident = False
+        return best
+
+    def route(self, question: str, allowed: Iterable[str]) -> str | None:
+        """The label to dispatch `question` to without the LLM router, if there is a confident one."""
+        decision = self.predict(question)
+        with self._lock:
+            self._counters["requests"] += 1
+            if decision is None or not decision.confident or decision.label not in allowed:
+                return None
+            self._counters["fast_routes"] += 1
+        return decision.label
+
+    # ---- feedback ----------------------------------------------------------------------
+
+    def record(self, question: str, label: str, latency: float) -> None:
+        """Logs and learns a decision made by the LLM router, scoring the local guess against it."""
+        prediction = self.predict(question)
+        tokens = tokenize(question)
+        with self._lock:
+            self._counters["llm_routes"] += 1
+            self._llm_latency_total += latency
+            if prediction is not None:
+                self._counters["shadow_evaluated"] += 1
+                self._counters["shadow_agree"] += prediction.label == label
+                if prediction.confident:
+                    self._counters["shadow_confident"] += 1
+                    self._counters["shadow_confident_agree"] += prediction.label == label
+            if not self.is_follow_up(question):
+                self._learn(tokens, label)
+
+        if self.log_path is not None:
+            record = {"router": self.name, "question": question, "label": label, "latency": round(latency, 3), "ts": time.time()}
+            with _LOG_LOCK:
+                self.log_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.log_path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+                    size = f.tell()
+                if size > self.max_log_bytes:
+                    self._compact_log()
+
+    def _compact_log(self) -> None:
+        """Rewrites the log with the last `max_log_examples` decisions of each router (caller holds _LOG_LOCK)."""
+        kept: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self.max_log_examples))
+        order = []
+        with open(self.log_path) as f:
+            for line in f:
+                try:
+                    router = json.loads(line).get("router", "")
+                except json.JSONDecodeError:
+                    continue
+                kept[router].append(len(order))
+                order.append(line)
+        keep = {i for lines in kept.values() for i in lines}
+        temp = self.log_path.with_suffix(self.log_path.suffix + ".tmp")
+        with open(temp, "w") as f:
+            f.writelines(line for i, line in enumerate(order) if i in keep)
+        os.replace(temp, self.log_path)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            counters = dict(self._counters)
+            avg_llm_latency = self._llm_latency_total / counters["llm_routes"] if counters["llm_routes"] else 0.0
+            return {
+                **counters,
+                "shadow_accuracy": counters["shadow_agree"] / counters["shadow_evaluated"] if counters["shadow_evaluated"] else 0.0,
+                "fast_path_precision": counters["shadow_confident_agree"] / counters["shadow_confident"] if counters["shadow_confident"] else 0.0,
+                "avg_llm_latency": avg_llm_latency,
+                "latency_saved": avg_llm_latency * counters["fast_routes"],
+                "cached_decisions": len(self._cache),
+                **{f"examples_{label}": int(n) for label, n in zip(self.labels, self._examples)},
+            }
+
+
+ROUTERS: Dict[str, FastRouter] = {}
+
+
+def load_fast_router(name: str, keywords: Dict[str, Dict[str, float]]) -> FastRouter | None:
+    """Creates (once) the fast router `name` from the config, None when disabled."""
+    if not TOOLS_CFG.fast_router_enabled:
+        return None
+    if name not in ROUTERS:
+        ROUTERS[name] = FastRouter(
+            name,
+            keywords,
+            min_confidence=TOOLS_CFG.fast_router_min_confidence,
+            min_examples=TOOLS_CFG.fast_router_min_examples,
+            min_tokens=TOOLS_CFG.fast_router_min_tokens,
+            cache_min_tokens=TOOLS_CFG.fast_router_cache_min_tokens,
+            cache_size=TOOLS_CFG.fast_router_cache_size,
+            feature_dim=TOOLS_CFG.fast_router_feature_dim,
+            log_path=here(TOOLS_CFG.fast_router_log_path) if TOOLS_CFG.fast_router_log_path else None,
+            max_log_examples=TOOLS_CFG.fast_router_max_log_examples,
+            max_log_bytes=TOOLS_CFG.fast_router_max_log_bytes,
+        )
+    return ROUTERS[name]
+
+
+def make_fast_route_node(router: FastRouter, agent_names: List[str], fallback: str) -> RunnableCallable:
+    """Graph node sending the question straight to an agent when the fast router is confident."""
+    def fast_route(state: dict) -> Command:
+        question = last_human_message(state["messages"])
+        agent_name = router.route(question, agent_names)
+        return Command(goto=agent_name or fallback)
+
+    return RunnableCallable(fast_route, name="fast_router")
+
+
+def make_recording_call_router(router_agent: Pregel, router: FastRouter) -> RunnableCallable:
+    """
+    Graph node calling the LLM `router_agent` and feeding its decision back to `router`.
+
+    The handoff tools leave the router with a `ParentCommand`, whose target is the chosen
+    agent (or the sub task `Send`s of a fan-out, not recorded); a normal return means the
+    router answered by itself.
+    """
+    def _record(state: dict, goto, started: float) -> None:
+        if isinstance(goto, (list, tuple)) and goto:
+            # A fan-out to several agents (`Send`s) is not a single route to learn.
+            return
+        label = goto if isinstance(goto, str) else END
+        router.record(last_human_message(state["messages"]), label, time.perf_counter() - started)
+
+    def call_router(state: dict, config: RunnableConfig) -> dict:
+        started = time.perf_counter()
+        try:
+            output = router_agent.invoke(state, config)
+        except ParentCommand as exc:
+            _record(state, exc.args[0].goto, started)
+            raise
+        _record(state, END, started)
+        return {"messages": output["messages"]}
+
+    async def acall_router(state: dict, config: RunnableConfig) -> dict:
+        started = time.perf_counter()
+        try:
+            output = await router_agent.ainvoke(state, config)
+        except ParentCommand as exc:
+            _record(state, exc.args[0].goto, started)
+            raise
+        _record(state, END, started)
+        return {"messages": output["messages"]}
+
+    return RunnableCallable(call_router, acall_router, name=router_agent.name)
@@ -1,38 +1,85 @@
-from langgraph.graph import StateGraph, MessagesState, START, END
-from langgraph_supervisor.supervisor import _make_call_agent
+from langgraph.graph import StateGraph, START, END
 from langgraph_supervisor.handoff import create_handoff_tool
 from langgraph.prebuilt import create_react_agent, ToolNode
 from langchain_core.prompts import ChatPromptTemplate
 from langgraph.graph.state import CompiledStateGraph
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_ollama.chat_models import ChatOllama
+from langchain_core.language_models import BaseChatModel
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.errors import GraphRecursionError
 from langchain_core.messages import AnyMessage
-from langchain_groq import ChatGroq
+from langchain_core.tools import BaseTool
+from pyprojroot import here
 
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 import os
 
 from ..prompts.web_search import SYSTEM_PROMPT as WEB_SEARCH_SYS_PROMPT
 from ..prompts.spark_sql import SYSTEM_PROMPT as SPARK_SQL_SYS_PROMPT
 from ..prompts.router import SYSTEM_PROMPT as ROUTER_PROMPT
+from ..prompts.rag import SYSTEM_PROMPT as RAG_SYS_PROMPT
 from .tools.spark_sql import get_spark_sql_tools, SparkSQLResponse
-from .tools.tavily_search import load_tavily_search_tool
+from .tools.tavily_search import load_tavily_search_tool, load_web_search_tool
 from .tools.rag import load_supabase_retriever_tool
-from ..load_config import LoadToolsConfig
+from ..utils.llm_gateway import get_chat_model
+from ..load_config import get_tools_config
+from .fast_router import (
+    load_fast_router, make_fast_route_node, make_recording_call_router,
+    SPARK_SQL_KEYWORDS, WEB_SEARCH_KEYWORDS, RETRIEVER_KEYWORDS, DIRECT_KEYWORDS,
+)
+from .planner import SYNTHESIZER, SupervisorState, create_dispatch_tool, make_subtask_node, make_synthesis_node, subtask_node_name
+from .history import make_compacting_call_agent
+from .checkpoint import BoundedCheckpointSaver
 from .backend import plot_agent_schema
 
-TOOLS_CFG = LoadToolsConfig()
+TOOLS_CFG = get_tools_config()
 
 CATALOG = os.environ.get("UC_CATALOG_NAME", "tpch")
 SCHEMA = os.environ.get("UC_SCHEMA_NAME", "bronze")
 
 
-def build_graph() -> CompiledStateGraph:
-    """Builds a graph with multi-agent supervisor architecture"""
-
-    web_search_agent_llm = ChatGroq(model=TOOLS_CFG.web_search_agent_llm, temperature=TOOLS_CFG.web_search_agent_llm_temperature)
-    # web_search_agent_llm = ChatOllama(model="gpt-oss:120b-cloud", temperature=TOOLS_CFG.web_search_agent_llm_temperature) #NOTE local dev only
-    search_tool = load_tavily_search_tool(TOOLS_CFG.tavily_search_max_results)
+def build_graph(
+    web_search_agent_llm: BaseChatModel | None = None,
+    spark_sql_agent_llm: BaseChatModel | None = None,
+    router_llm: BaseChatModel | None = None,
+    rag_agent_llm: BaseChatModel | None = None,
+    search_tool: BaseTool | None = None,
+    spark_sql_tools: List[BaseTool] | None = None,
+    retriever_tool: BaseTool | None = None,
+    checkpointer: BaseCheckpointSaver | None = None,
+    plot: bool = False,
+) -> CompiledStateGraph:
+    """
+    Builds a graph with multi-agent supervisor architecture
+
+    LLMs, tools and the checkpointer left as None are created from the config (Groq, Tavily,
+    Databricks, Supabase); passing stand-ins builds the same graph offline (see `src.benchmark`).
+    The config LLMs share the `llm_gateway` rate limits, router calls are served first.
+    With `startup.parallel_init` the Databricks, Supabase and Tavily clients connect concurrently.
+    With `fan_out.enabled` the router can also split a compound question into sub tasks run
+    by several agents in parallel, merged by a synthesis node.
+    The diagram is only rendered with `plot=True` (see `python -m src.agents`).
+    """
+
+    if web_search_agent_llm is None:
+        web_search_agent_llm = get_chat_model(TOOLS_CFG.web_search_agent_llm, TOOLS_CFG.web_search_agent_llm_temperature)
+    if spark_sql_agent_llm is None:
+        spark_sql_agent_llm = get_chat_model(TOOLS_CFG.spark_sql_agent_llm, TOOLS_CFG.spark_sql_agent_llm_temperature)
+    if router_llm is None:
+        router_llm = get_chat_model(TOOLS_CFG.router_agent_llm, TOOLS_CFG.router_agent_llm_temperature, priority=TOOLS_CFG.llm_gateway_router_priority)
+    if rag_agent_llm is None:
+        rag_agent_llm = get_chat_model(TOOLS_CFG.rag_agent_llm, TOOLS_CFG.rag_agent_llm_temperature)
+
+    # The tool clients are network bound (Databricks session, Supabase, Tavily), so connect them side by side.
+    with ThreadPoolExecutor(max_workers=3 if TOOLS_CFG.startup_parallel_init else 1, thread_name_prefix="graph-init") as pool:
+        search_future = pool.submit(load_tavily_search_tool, TOOLS_CFG.tavily_search_max_results) if search_tool is None else None
+        spark_sql_future = pool.submit(get_spark_sql_tools, spark_sql_agent_llm) if spark_sql_tools is None else None
+        retriever_future = pool.submit(load_supabase_retriever_tool) if retriever_tool is None else None
+        search_tool = search_future.result() if search_future is not None else search_tool
+        spark_sql_tools = spark_sql_future.result() if spark_sql_future is not None else spark_sql_tools
+        retriever_tool = retriever_future.result() if retriever_future is not None else retriever_tool
+    # Stand-in search tools get the same batching, caching and dedup layer, with a private cache.
+    search_tool = load_web_search_tool(search_tool, shared_cache=search_future is not None)
 
     web_search_agent_prompt = ChatPromptTemplate([
             ("system", WEB_SEARCH_SYS_PROMPT),
@@ -47,9 +94,7 @@ def build_graph() -> CompiledStateGraph:
         name=TOOLS_CFG.web_search_agent_name
     )
 
-    spark_sql_agent_llm = ChatGroq(model=TOOLS_CFG.spark_sql_agent_llm, temperature=TOOLS_CFG.spark_sql_agent_llm_temperature)
-    # spark_sql_agent_llm = ChatOllama(model="gpt-oss:120b-cloud", temperature=TOOLS_CFG.spark_sql_agent_llm_temperature) #NOTE local dev only
-    spark_sql_tools = get_spark_sql_tools(spark_sql_agent_llm) + [SparkSQLResponse]
+    spark_sql_tools = spark_sql_tools + [SparkSQLResponse]
 
     spark_sql_agent_prompt = ChatPromptTemplate([
             ("system", SPARK_SQL_SYS_PROMPT.format(**{"CATALOG_NAME": CATALOG, "SCHEMA_NAME": SCHEMA})),
@@ -64,12 +109,26 @@ def build_graph() -> CompiledStateGraph:
         name=TOOLS_CFG.spark_sql_agent_name
     )
 
-    router_llm = ChatGroq(model=TOOLS_CFG.router_agent_llm, temperature=TOOLS_CFG.router_agent_llm_temperature)
-    # router_llm = ChatOllama(model="gpt-oss:120b-cloud", temperature=TOOLS_CFG.router_agent_llm_temperature) #NOTE local dev only
-    retriever_tool = load_supabase_retriever_tool()
+    rag_agent_prompt = ChatPromptTemplate([
+            ("system", RAG_SYS_PROMPT),
+            ("placeholder", "{messages}"),
+            ("placeholder", "{agent_scratchpad}"),
+    ])
 
-    agents = [spark_sql_agent, web_search_agent]
+    rag_agent = create_react_agent(
+        model=rag_agent_llm,
+        tools=[retriever_tool],
+        prompt=rag_agent_prompt,
+        name=TOOLS_CFG.rag_agent_name
+    )
+
+    agents = [spark_sql_agent, web_search_agent, rag_agent]
     agent_names = [agent.name for agent in agents]
+    history_token_budgets = {
+        spark_sql_agent.name: TOOLS_CFG.spark_sql_agent_history_token_budget,
+        web_search_agent.name: TOOLS_CFG.web_search_agent_history_token_budget,
+        rag_agent.name: TOOLS_CFG.rag_agent_history_token_budget,
+    }
     
     handoff_tools = [
         create_handoff_tool(
@@ -78,6 +137,10 @@ def build_graph() -> CompiledStateGraph:
         )
         for agent_name in agent_names
     ]
+    router_destinations = tuple(agent_names) + (END,)
+    if TOOLS_CFG.fan_out_enabled:
+        handoff_tools.append(create_dispatch_tool(agent_names, max_subtasks=TOOLS_CFG.fan_out_max_subtasks))
+        router_destinations += tuple(subtask_node_name(agent_name) for agent_name in agent_names)
     tool_node = ToolNode(handoff_tools)
 
     router_agent = create_react_agent(
@@ -87,23 +150,52 @@ def build_graph() -> CompiledStateGraph:
         name=TOOLS_CFG.router_agent_name,
     )
 
-    builder = StateGraph(MessagesState)
-    builder.add_node(router_agent, destinations=tuple(agent_names) + (END,))
-    builder.add_edge(START, router_agent.name)
+    builder = StateGraph(SupervisorState)
+    fast_router = load_fast_router(router_agent.name, {
+        spark_sql_agent.name: SPARK_SQL_KEYWORDS,
+        web_search_agent.name: WEB_SEARCH_KEYWORDS,
+        rag_agent.name: RETRIEVER_KEYWORDS,
+        END: DIRECT_KEYWORDS,
+    })
+    if fast_router is None:
+        builder.add_node(router_agent, destinations=router_destinations)
+        builder.add_edge(START, router_agent.name)
+    else:
+        # Obvious questions skip the router LLM, the rest go through it and train the fast router.
+        builder.add_node("fast_router", make_fast_route_node(fast_router, agent_names, router_agent.name), destinations=tuple(agent_names) + (router_agent.name,))
+        builder.add_node(router_agent.name, make_recording_call_router(router_agent, fast_router), destinations=router_destinations)
+        builder.add_edge(START, "fast_router")
     for agent in agents:
         builder.add_node(
             agent.name,
-            _make_call_agent(
+            make_compacting_call_agent(
                 agent,
-                "full_history", #NOTE "full_history" or "last_message"
-                add_handoff_back_messages=False,
-                supervisor_name=router_agent.name,
+                token_budget=history_token_budgets[agent.name],
+                keep_recent_turns=TOOLS_CFG.history_keep_recent_turns,
+                summary_chars=TOOLS_CFG.history_summary_chars,
             ),
         )
         builder.add_edge(agent.name, END)
 
-    memory = MemorySaver()
-    graph = builder.compile(checkpointer=memory)
+    if TOOLS_CFG.fan_out_enabled:
+        # Sub tasks get only their own instruction, so their branches skip history compaction;
+        # all branches of a question run in one step and meet in the synthesis node.
+        for agent in agents:
+            builder.add_node(subtask_node_name(agent.name), make_subtask_node(agent))
+            builder.add_edge(subtask_node_name(agent.name), SYNTHESIZER)
+        builder.add_node(SYNTHESIZER, make_synthesis_node(router_llm))
+        builder.add_edge(SYNTHESIZER, END)
+
+    if checkpointer is None:
+        checkpointer = BoundedCheckpointSaver(
+            max_threads=TOOLS_CFG.checkpointer_max_threads,
+            idle_ttl=TOOLS_CFG.checkpointer_idle_ttl,
+            keep_checkpoints=TOOLS_CFG.checkpointer_keep_checkpoints,
+            sqlite_path=here(TOOLS_CFG.checkpointer_sqlite_path) if TOOLS_CFG.checkpointer_sqlite_path else None,
+            disk_ttl=TOOLS_CFG.checkpointer_disk_ttl,
+        )
+    graph = builder.compile(checkpointer=checkpointer)
     
-    plot_agent_schema(graph, "router_agent")
+    if plot:
+        plot_agent_schema(graph, "router_agent")
     return graph
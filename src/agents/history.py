@@ -0,0 +1,138 @@
+from langchain_core.messages import AnyMessage, AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph._internal._runnable import RunnableCallable
+from langgraph.pregel import Pregel
+
+from typing import Dict, List, Tuple
+import threading
+import re
+
+from ..utils.tokens import estimate_tokens
+
+_RESULT_HANDLE_RE = re.compile(r"Result handle: `(\w+)`")
+
+
+def message_tokens(message: AnyMessage) -> int:
+    """Estimated prompt tokens of a message, including its tool call arguments."""
+    tokens = estimate_tokens(message.content if isinstance(message.content, str) else str(message.content))
+    if isinstance(message, AIMessage):
+        tokens += sum(estimate_tokens(str(call["args"])) for call in message.tool_calls)
+    return tokens
+
+
+def _split_turns(messages: List[AnyMessage]) -> List[List[AnyMessage]]:
+    """Groups messages into turns, each starting at a human message."""
+    turns: List[List[AnyMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _summarize(message: AnyMessage, max_chars: int) -> AnyMessage:
+    """Replaces a long tool output (or agent text) by a short reference to it."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    if len(content) <= max_chars:
+        return message
+
+    if isinstance(message, ToolMessage):
+        handle = _RESULT_HANDLE_RE.search(content)
+        reference = f" Full result handle: `{handle.group(1)}`." if handle else ""
+        head = content[:max_chars].rsplit("\n", 1)[0]
+        summary = f"[Earlier `{message.name}` output elided ({len(content)} chars).{reference} Begins with:]\n{head}"
+    else:
+        summary = content[:max_chars] + " [...]"
+    # The copy keeps the message id; the calling node only returns the agent's new messages.
+    return message.model_copy(update={"content": summary})
+
+
+def compact_history(
+    messages: List[AnyMessage],
+    token_budget: int,
+    keep_recent_turns: int = 2,
+    summary_chars: int = 200,
+) -> Tuple[List[AnyMessage], Dict[str, int]]:
+    """
+    Shrinks a conversation to fit `token_budget` before it is handed to an agent.
+
+    The last `keep_recent_turns` turns are kept verbatim. In older turns, tool outputs and
+    long agent replies are cut to `summary_chars` characters, keeping any result handle so
+    the agent can still refer to it. If that is not enough, whole turns are dropped oldest
+    first, the latest turn always stays. Tool calls and their outputs are kept or dropped
+    together so the history stays valid for the model APIs.
+
+    Returns the compacted messages and a report of tokens before/after.
+    """
+    before = sum(message_tokens(m) for m in messages)
+    report = {"tokens_before": before, "tokens_after": before, "dropped_turns": 0}
+    if before <= token_budget:
+        return messages, report
+
+    turns = _split_turns(messages)
+    recent = turns[-keep_recent_turns:] if keep_recent_turns > 0 else turns[-1:]
+    older = [[_summarize(m, summary_chars) for m in turn] for turn in turns[:len(turns) - len(recent)]]
+
+    compacted_turns = older + recent
+    tokens = sum(message_tokens(m) for turn in compacted_turns for m in turn)
+    while tokens > token_budget and len(compacted_turns) > 1:
+        tokens -= sum(message_tokens(m) for m in compacted_turns.pop(0))
+        report["dropped_turns"] += 1
+
+    report["tokens_after"] = tokens
+    return [m for turn in compacted_turns for m in turn], report
+
+
+class HistoryCompactionStats:
+    """Running totals of tokens saved by history compaction, per agent."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, int]] = {}
+
+    def record(self, agent_name: str, report: Dict[str, int]) -> None:
+        with self._lock:
+            totals = self._totals.setdefault(agent_name, {"requests": 0, "tokens_before": 0, "tokens_after": 0})
+            totals["requests"] += 1
+            totals["tokens_before"] += report["tokens_before"]
+            totals["tokens_after"] += report["tokens_after"]
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                name: {**totals, "tokens_saved": totals["tokens_before"] - totals["tokens_after"]}
+                for name, totals in self._totals.items()
+            }
+
+
+COMPACTION_STATS = HistoryCompactionStats()
+
+
+def make_compacting_call_agent(
+    agent: Pregel,
+    token_budget: int,
+    keep_recent_turns: int = 2,
+    summary_chars: int = 200,
+) -> RunnableCallable:
+    """
+    Graph node calling `agent` on a compacted copy of the conversation.
+
+    Only the messages the agent adds are written back to the graph state, the stored
+    history itself is never rewritten.
+    """
+    def _prepare(state: dict) -> Tuple[dict, int]:
+        messages, report = compact_history(state["messages"], token_budget, keep_recent_turns, summary_chars)
+        COMPACTION_STATS.record(agent.name, report)
+        return {**state, "messages": messages}, len(messages)
+
+    def call_agent(state: dict, config: RunnableConfig) -> dict:
+        agent_input, n_input = _prepare(state)
+        output = agent.invoke(agent_input, config)
+        return {"messages": output["messages"][n_input:]}
+
+    async def acall_agent(state: dict, config: RunnableConfig) -> dict:
+        agent_input, n_input = _prepare(state)
+        output = await agent.ainvoke(agent_input, config)
+        return {"messages": output["messages"][n_input:]}
+
+    return RunnableCallable(call_agent, acall_agent, name=agent.name)
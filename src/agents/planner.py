@@ -0,0 +1,136 @@
+from langchain_core.messages import AnyMessage, AIMessage, HumanMessage, SystemMessage
+from langchain_core.tools import BaseTool, tool
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import RunnableConfig
+from langgraph._internal._runnable import RunnableCallable
+from langgraph.errors import GraphBubbleUp
+from langgraph.graph import MessagesState
+from langgraph.types import Command, Send
+from langgraph.pregel import Pregel
+from pydantic import BaseModel, Field
+
+from typing import Annotated, Dict, List
+
+from ..prompts.router import SYNTHESIS_PROMPT
+from ..utils.instrumentation import METRICS
+from .fast_router import last_human_message
+
+SYNTHESIZER = "synthesizer"
+
+
+def merge_subtask_results(left: List[Dict[str, str]] | None, right: List[Dict[str, str]] | None) -> List[Dict[str, str]]:
+    """Reducer of `subtask_results`: parallel branches append, None clears it for the next question."""
+    if right is None:
+        return []
+    return (left or []) + right
+
+
+class SupervisorState(MessagesState):
+    subtask_results: Annotated[List[Dict[str, str]], merge_subtask_results]
+
+
+def subtask_node_name(agent_name: str) -> str:
+    return f"{agent_name}_subtask"
+
+
+class SubTask(BaseModel):
+    agent: str = Field(..., description="Name of the agent doing this sub task.")
+    task: str = Field(..., description="Self-contained instruction for the agent, it does not see the conversation.")
+
+
+def create_dispatch_tool(agent_names: List[str], max_subtasks: int = 4) -> BaseTool:
+    """
+    Router tool fanning a compound question out to several agents at once.
+
+    Each sub task is `Send` to the agent's sub task node, so all of them run in the same
+    graph step and the answers meet in the synthesis node.
+    """
+    class DispatchSubtasksInput(BaseModel):
+        subtasks: List[SubTask] = Field(..., description=f"Independent sub tasks (at most {max_subtasks}), agent is one of: {', '.join(agent_names)}.")
+
+    @tool(
+        "dispatch_subtasks",
+        description="Run independent parts of a compound question in parallel on different agents, their answers are merged for the user.",
+        args_schema=DispatchSubtasksInput,
+    )
+    def dispatch_subtasks(subtasks: List[SubTask]) -> Command | str:
+        unknown = sorted({subtask.agent for subtask in subtasks} - set(agent_names))
+        if unknown:
+            return f"Error: unknown agents {unknown}, use one of {agent_names}."
+        if not subtasks or len(subtasks) > max_subtasks:
+            return f"Error: give between 1 and {max_subtasks} sub tasks."
+        METRICS.inc("fan_outs")
+        for subtask in subtasks:
+            METRICS.inc("fan_out_subtasks", agent=subtask.agent)
+        return Command(
+            graph=Command.PARENT,
+            update={"subtask_results": None},
+            goto=[
+                Send(subtask_node_name(subtask.agent), {"messages": [HumanMessage(subtask.task)], "subtask": subtask.task})
+                for subtask in subtasks
+            ],
+        )
+
+    return dispatch_subtasks
+
+
+def _final_answer(messages: List[AnyMessage]) -> str:
+    """The agent's answer: its structured SQL response, else its last non-empty reply."""
+    for message in reversed(messages):
+        if not isinstance(message, AIMessage):
+            continue
+        for tool_call in message.tool_calls:
+            if tool_call["name"] == "SparkSQLResponse":
+                return f"{tool_call['args'].get('response', '')}\n\n```sql\n{tool_call['args'].get('query', '')}\n```"
+        if message.content:
+            return message.content if isinstance(message.content, str) else str(message.content)
+    return "No answer."
+
+
+def make_subtask_node(agent: Pregel) -> RunnableCallable:
+    """Graph node running `agent` on one dispatched sub task, its answer goes to `subtask_results`."""
+    def _result(state: dict, answer: str) -> dict:
+        return {"subtask_results": [{"agent": agent.name, "task": state["subtask"], "answer": answer}]}
+
+    # A failed branch is reported to the synthesis node instead of failing its siblings.
+    def call_agent(state: dict, config: RunnableConfig) -> dict:
+        try:
+            return _result(state, _final_answer(agent.invoke({"messages": state["messages"]}, config)["messages"]))
+        except GraphBubbleUp:
+            raise
+        except Exception as e:
+            return _result(state, f"Error: {e}")
+
+    async def acall_agent(state: dict, config: RunnableConfig) -> dict:
+        try:
+            return _result(state, _final_answer((await agent.ainvoke({"messages": state["messages"]}, config))["messages"]))
+        except GraphBubbleUp:
+            raise
+        except Exception as e:
+            return _result(state, f"Error: {e}")
+
+    return RunnableCallable(call_agent, acall_agent, name=subtask_node_name(agent.name))
+
+
+def make_synthesis_node(llm: BaseChatModel) -> RunnableCallable:
+    """Graph node merging the sub task answers into one reply to the user's question."""
+    def _prompt(state: dict) -> List[AnyMessage]:
+        answers = "\n\n".join(
+            f"### Agent `{result['agent']}`\nTask: {result['task']}\n\nAnswer:\n{result['answer']}"
+            for result in state.get("subtask_results", [])
+        )
+        return [
+            SystemMessage(SYNTHESIS_PROMPT),
+            HumanMessage(f"User question: {last_human_message(state['messages'])}\n\n{answers}"),
+        ]
+
+    def _update(response: AIMessage) -> dict:
+        return {"messages": [AIMessage(response.content, name=SYNTHESIZER, id=response.id)], "subtask_results": None}
+
+    def synthesize(state: dict, config: RunnableConfig) -> dict:
+        return _update(llm.invoke(_prompt(state), config))
+
+    async def asynthesize(state: dict, config: RunnableConfig) -> dict:
+        return _update(await llm.ainvoke(_prompt(state), config))
+
+    return RunnableCallable(synthesize, asynthesize, name=SYNTHESIZER)
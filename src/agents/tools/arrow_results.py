@@ -0,0 +1,256 @@
+from pyspark.sql import DataFrame, SparkSession
+import pyarrow.csv as pa_csv
+import pyarrow as pa
+
+from typing import Deque, Dict, Iterable, Iterator, List, Tuple
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+import tempfile
+import threading
+import uuid
+import time
+import os
+
+from ...utils.instrumentation import record_timing
+from ...utils.tokens import CHARS_PER_TOKEN
+
+
+@dataclass
+class QueryResult:
+    """A bounded query result kept as an Arrow table behind a short handle id."""
+    handle: str
+    query: str
+    table: pa.Table
+    truncated: bool
+    session: str = ""
+    created_at: float = field(default_factory=time.time)
+    csv_path: str | None = None
+
+    @property
+    def num_rows(self) -> int:
+        return self.table.num_rows
+
+
+def _to_arrow(df: DataFrame) -> pa.Table:
+    if hasattr(df, "toArrow"):
+        return df.toArrow()
+    # Classic PySpark < 4.0 has no public toArrow().
+    return pa.Table.from_pandas(df.toPandas(), preserve_index=False)
+
+
+def _arrow_chunks(df: DataFrame) -> Iterator[pa.Table]:
+    """
+    Arrow tables of `df` as the warehouse streams them. Spark Connect (Databricks) sends
+    the result in chunks; classic sessions (local runs) have no streaming Arrow API and
+    collect the (row limited) result at once.
+    """
+    client = getattr(getattr(df, "sparkSession", None), "client", None)
+    if not hasattr(client, "to_table_as_iterator"):
+        yield _to_arrow(df)
+        return
+    schema = None
+    for item in client.to_table_as_iterator(df._plan.to_proto(client), df._plan.observations):
+        if isinstance(item, pa.Table):
+            yield item
+        else:
+            schema = item
+    if schema is not None:
+        from pyspark.sql.pandas.types import to_arrow_schema
+        yield to_arrow_schema(schema).empty_table()
+
+
+def _bound_batches(tables: Iterable[pa.Table], max_rows: int, max_bytes: int) -> Tuple[pa.Table, bool]:
+    kept: List[pa.RecordBatch] = []
+    rows = size = 0
+    truncated = False
+    schema = None
+    for table in tables:
+        schema = schema or table.schema
+        for batch in table.to_batches():
+            if rows + batch.num_rows > max_rows:
+                batch = batch.slice(0, max_rows - rows)
+                truncated = True
+            if size + batch.nbytes > max_bytes:
+                per_row = max(batch.nbytes // max(batch.num_rows, 1), 1)
+                batch = batch.slice(0, max((max_bytes - size) // per_row, 0))
+                truncated = True
+            if batch.num_rows:
+                kept.append(batch)
+                rows += batch.num_rows
+                size += batch.nbytes
+            if truncated:
+                return pa.Table.from_batches(kept, schema=schema), True
+    return pa.Table.from_batches(kept, schema=schema or pa.schema([])), False
+
+
+def fetch_bounded(df: DataFrame, max_rows: int, max_bytes: int) -> Tuple[pa.Table, bool]:
+    """
+    Pulls at most `max_rows` rows / `max_bytes` Arrow bytes of `df`, (table, whether it was cut).
+
+    The row limit is pushed down to the warehouse (one extra row tells whether the result
+    was cut); the byte budget is applied chunk by chunk while the result streams in, and
+    the stream is dropped once it is reached, so a wide result never materializes beyond
+    it in the app container.
+    """
+    chunks = _arrow_chunks(df.limit(max_rows + 1))
+    try:
+        return _bound_batches(chunks, max_rows, max_bytes)
+    finally:
+        chunks.close()
+
+
+def bound_table(table: pa.Table, max_rows: int, max_bytes: int) -> Tuple[pa.Table, bool]:
+    """Cuts a fetched table to `max_rows` rows / `max_bytes` bytes, (table, whether it was cut)."""
+    return _bound_batches([table], max_rows, max_bytes)
+
+
+def _remove_csv(result: QueryResult) -> None:
+    if result.csv_path is not None:
+        try:
+            os.remove(result.csv_path)
+        except OSError:
+            pass
+
+
+def _cell(value) -> str:
+    return "NULL" if value is None else str(value).replace("|", "\\|").replace("\n", " ")
+
+
+def render_markdown(table: pa.Table, max_tokens: int) -> Tuple[str, int]:
+    """Markdown table of the leading rows of `table` cut at `max_tokens`; returns (text, rows shown)."""
+    header = "| " + " | ".join(table.column_names) + " |"
+    lines = [header, "|" + "---|" * table.num_columns]
+    budget = max_tokens * CHARS_PER_TOKEN - len(header) - len(lines[1])
+
+    shown = 0
+    for batch in table.to_batches():
+        for row in batch.to_pylist():
+            line = "| " + " | ".join(_cell(v) for v in row.values()) + " |"
+            if budget - len(line) < 0 and shown:
+                return "\n".join(lines), shown
+            budget -= len(line) + 1
+            lines.append(line)
+            shown += 1
+    return "\n".join(lines), shown
+
+
+class QueryResultStore:
+    """
+    Runs queries into bounded Arrow results and keeps the last `max_handles` of them so the
+    UI can page through or download a result without re-running the query.
+
+    Each session's last `session_results` results are also indexed, so follow-up questions
+    can query them in-process (see `ResultSQLEngine`) instead of the warehouse.
+    """
+
+    def __init__(
+        self,
+        max_rows: int = 10_000,
+        max_bytes: int = 16 * 1024 * 1024,
+        preview_tokens: int = 1500,
+        page_size: int = 50,
+        max_handles: int = 64,
+        session_results: int = 5,
+    ) -> None:
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.preview_tokens = preview_tokens
+        self.page_size = page_size
+        self.max_handles = max_handles
+        self.session_results = session_results
+        self._results: "OrderedDict[str, QueryResult]" = OrderedDict()
+        self._sessions: "OrderedDict[str, Deque[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def execute(self, spark: SparkSession, query: str, session: str = "") -> QueryResult:
+        """
+        Runs `query` within the row/byte budget and registers the result under a new handle
+        (and in the recent results of `session`).
+
+        Timed as the "exec" Spark phase (warehouse execution and the bounded Arrow transfer,
+        see `fetch_bounded` for the budget).
+        """
+        started = time.perf_counter()
+        table, truncated = fetch_bounded(spark.sql(query), self.max_rows, self.max_bytes)
+        record_timing("spark", "exec", time.perf_counter() - started, rows=table.num_rows, bytes=table.nbytes)
+        return self.add(query, table, truncated, session)
+
+    def add(self, query: str, table: pa.Table, truncated: bool, session: str = "") -> QueryResult:
+        """Registers an already bounded result under a new handle."""
+        result = QueryResult(handle=uuid.uuid4().hex[:12], query=query, table=table, truncated=truncated, session=session)
+        with self._lock:
+            self._results[result.handle] = result
+            while len(self._results) > self.max_handles:
+                _remove_csv(self._results.popitem(last=False)[1])
+            self._remember(session, result.handle)
+        return result
+
+    def _remember(self, session: str, handle: str) -> None:
+        recent = self._sessions.pop(session, None) or deque(maxlen=self.session_results)
+        if handle in recent:
+            recent.remove(handle)
+        recent.append(handle)
+        self._sessions[session] = recent
+        while len(self._sessions) > self.max_handles:
+            self._sessions.popitem(last=False)
+
+    def attach(self, handle: str, session: str = "") -> QueryResult | None:
+        """Makes a stored result (e.g. behind a cached preview) the most recent one of `session`."""
+        with self._lock:
+            result = self._results.get(handle)
+            if result is not None:
+                self._results.move_to_end(handle)
+                self._remember(session, handle)
+            return result
+
+    def recent(self, session: str = "") -> List[QueryResult]:
+        """The session's recent results still in the store, newest first."""
+        with self._lock:
+            handles = self._sessions.get(session, ())
+            return [self._results[h] for h in reversed(handles) if h in self._results]
+
+    def get(self, handle: str) -> QueryResult | None:
+        with self._lock:
+            result = self._results.get(handle.strip())
+            if result is not None:
+                self._results.move_to_end(result.handle)
+            return result
+
+    def preview(self, result: QueryResult) -> str:
+        """Token budgeted markdown preview of a result for the agent."""
+        text, shown = render_markdown(result.table, self.preview_tokens)
+        total = f"{result.num_rows}+" if result.truncated else str(result.num_rows)
+        return f"{text}\n\n_Showing {shown} of {total} rows. Result handle: `{result.handle}`._"
+
+    def page(self, handle: str, page: int, page_size: int | None = None) -> pa.Table:
+        """Rows of page `page` (0 based) of a stored result."""
+        result = self.get(handle)
+        if result is None:
+            raise KeyError(f"Result handle '{handle}' has expired, re-run the query.")
+        page_size = page_size or self.page_size
+        return result.table.slice(max(page, 0) * page_size, page_size)
+
+    def to_csv(self, handle: str) -> str:
+        """
+        Writes a stored result to a temporary CSV file and returns its path. The file is
+        reused by later downloads and deleted once the result leaves the store.
+        """
+        result = self.get(handle)
+        if result is None:
+            raise KeyError(f"Result handle '{handle}' has expired, re-run the query.")
+        if result.csv_path is not None and os.path.exists(result.csv_path):
+            return result.csv_path
+        with tempfile.NamedTemporaryFile(prefix=f"query_{result.handle}_", suffix=".csv", delete=False) as file:
+            path = file.name
+        pa_csv.write_csv(result.table, path)
+        result.csv_path = path
+        return path
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "handles": len(self._results),
+                "sessions": len(self._sessions),
+                "bytes": sum(r.table.nbytes for r in self._results.values()),
+                "truncated": sum(r.truncated for r in self._results.values()),
+            }
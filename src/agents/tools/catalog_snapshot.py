@@ -0,0 +1,228 @@
+from pyspark.sql import SparkSession
+
+from typing import Callable, Dict, List, Tuple
+from dataclasses import dataclass, asdict
+from pathlib import Path
+import threading
+import json
+import time
+import os
+
+
+@dataclass(slots=True)
+class TableSnapshot:
+    """DDL, column types and sample rows of a single table, as shown to the agent."""
+    name: str
+    ddl: str
+    sample: str
+    columns: List[Tuple[str, str]]
+    version: str = ""
+
+    def info(self) -> str:
+        """Same layout as `SparkSQL.get_table_info` for one table."""
+        if not self.sample:
+            return self.ddl
+        return f"{self.ddl}\n\n/*\n{self.sample}\n*/"
+
+
+def fetch_table_versions(spark: SparkSession, catalog: str, schema: str) -> Dict[str, str]:
+    """
+    {table: last_altered} for every table in the schema with a single information_schema
+    query, falling back to SHOW TABLES (no version info) where that view is unavailable.
+    """
+    try:
+        rows = spark.sql(
+            f"SELECT table_name, last_altered FROM {catalog}.information_schema.tables "
+            f"WHERE table_schema = '{schema}'"
+        ).collect()
+        return {row.table_name: str(row.last_altered) for row in rows}
+    except Exception:
+        rows = spark.sql(f"SHOW TABLES IN {catalog}.{schema}").collect()
+        return {row.tableName: "" for row in rows if not getattr(row, "isTemporary", False)}
+
+
+def fetch_table_snapshot(spark: SparkSession, catalog: str, schema: str, table: str, sample_rows: int = 3, version: str = "") -> TableSnapshot:
+    """Loads DDL and `sample_rows` rows of one table."""
+    fqn = f"{catalog}.{schema}.{table}"
+    statement = spark.sql(f"SHOW CREATE TABLE {fqn}").collect()[0].createtab_stmt
+    # Ignore the data source provider and options to reduce the number of tokens.
+    using_clause_index = statement.find("USING")
+    ddl = (statement[:using_clause_index] if using_clause_index >= 0 else statement).rstrip() + ";"
+
+    df = spark.sql(f"SELECT * FROM {fqn} LIMIT {sample_rows}")
+    columns = [(f.name, f.dataType.simpleString()) for f in df.schema.fields]
+    sample = ""
+    if sample_rows:
+        try:
+            rows = ["\t".join(map(str, row.asDict().values())) for row in df.collect()]
+        except Exception:
+            rows = []
+        header = "\t".join(name for name, _ in columns)
+        sample = f"{sample_rows} rows from {table} table:\n{header}\n" + "\n".join(rows)
+    return TableSnapshot(name=table, ddl=ddl, sample=sample, columns=columns, version=version)
+
+
+class CatalogSnapshot:
+    """
+    In-process snapshot of table names, DDL and sample rows for one catalog/schema.
+
+    The snapshot is loaded once through `run`, a callable that executes a function on a
+    SparkSession (e.g. the session pool's `execute`), optionally persisted to
+    `persist_path` so restarts start warm, and refreshed incrementally by a background
+    thread: only tables whose `last_altered` changed are re-read.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[Callable[[SparkSession], object]], object],
+        catalog: str,
+        schema: str,
+        sample_rows: int = 3,
+        refresh_interval: float = 300.0,
+        persist_path: str | Path | None = None,
+    ) -> None:
+        self.run = run
+        self.catalog = catalog
+        self.schema = schema
+        self.sample_rows = sample_rows
+        self.refresh_interval = refresh_interval
+        self.persist_path = Path(persist_path) if persist_path else None
+
+        self._tables: Dict[str, TableSnapshot] = {}
+        self._loaded = threading.Event()
+        self._lock = threading.Lock()
+        self._refresher: threading.Thread | None = None
+        self._closed = threading.Event()
+        self.refreshed_at: float | None = None
+        self._counters = {"refreshes": 0, "tables_reloaded": 0, "hits": 0, "misses": 0}
+
+    def _load_from_disk(self) -> bool:
+        if self.persist_path is None or not self.persist_path.exists():
+            return False
+        try:
+            payload = json.loads(self.persist_path.read_text())
+        except (OSError, ValueError):
+            return False
+        if payload.get("catalog") != self.catalog or payload.get("schema") != self.schema:
+            return False
+        tables = {}
+        for table in payload["tables"]:
+            table["columns"] = [tuple(column) for column in table["columns"]]
+            tables[table["name"]] = TableSnapshot(**table)
+        with self._lock:
+            self._tables = tables
+        self._loaded.set()
+        return True
+
+    def _save_to_disk(self) -> None:
+        if self.persist_path is None:
+            return
+        with self._lock:
+            payload = {
+                "catalog": self.catalog,
+                "schema": self.schema,
+                "tables": [asdict(table) for table in self._tables.values()],
+            }
+        self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.persist_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(payload))
+        os.replace(tmp_path, self.persist_path)
+
+    def refresh(self) -> List[str]:
+        """Re-reads new or altered tables, drops removed ones and returns the changed names."""
+        def _refresh(spark: SparkSession) -> Tuple[Dict[str, str], Dict[str, TableSnapshot]]:
+            versions = fetch_table_versions(spark, self.catalog, self.schema)
+            with self._lock:
+                known = {name: table.version for name, table in self._tables.items()}
+            reloaded = {
+                name: fetch_table_snapshot(spark, self.catalog, self.schema, name, self.sample_rows, version)
+                for name, version in versions.items()
+                # Without version info only new tables are (re)loaded.
+                if name not in known or (version and known[name] != version)
+            }
+            return versions, reloaded
+
+        versions, reloaded = self.run(_refresh)
+        with self._lock:
+            removed = [name for name in self._tables if name not in versions]
+            for name in removed:
+                del self._tables[name]
+            self._tables.update(reloaded)
+            self._counters["refreshes"] += 1
+            self._counters["tables_reloaded"] += len(reloaded)
+        self.refreshed_at = time.time()
+        self._loaded.set()
+
+        changed = sorted(reloaded) + removed
+        if changed or not (self.persist_path and self.persist_path.exists()):
+            self._save_to_disk()
+        return changed
+
+    def _refresh_loop(self) -> None:
+        if not self._loaded.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Catalog snapshot load failed: {e}")
+        while not self._closed.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Catalog snapshot refresh failed: {e}")
+
+    def start(self) -> None:
+        """Loads the persisted snapshot (if any) and starts the background refresher."""
+        with self._lock:
+            if self._refresher is not None:
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop, name="catalog-snapshot", daemon=True)
+        self._load_from_disk()
+        self._refresher.start()
+
+    def close(self) -> None:
+        self._closed.set()
+
+    def _ensure_loaded(self, timeout: float | None) -> bool:
+        if self._loaded.is_set():
+            return True
+        self.start()
+        return self._loaded.wait(timeout)
+
+    def table_names(self, timeout: float | None = None) -> List[str] | None:
+        """Sorted table names, or None when the snapshot is not loaded within `timeout`."""
+        if not self._ensure_loaded(timeout):
+            return None
+        with self._lock:
+            self._counters["hits"] += 1
+            return sorted(self._tables)
+
+    def table(self, name: str) -> TableSnapshot | None:
+        with self._lock:
+            return self._tables.get(name.strip().split(".")[-1].strip("`").lower()) or self._tables.get(name.strip())
+
+    def columns(self, timeout: float | None = None) -> Dict[str, List[str]] | None:
+        """{table: column names} of every table, or None when the snapshot is not loaded within `timeout`."""
+        if not self._ensure_loaded(timeout):
+            return None
+        with self._lock:
+            self._counters["hits"] += 1
+            return {name: [column for column, _ in table.columns] for name, table in self._tables.items()}
+
+    def table_info(self, table_names: List[str], timeout: float | None = None) -> str | None:
+        """
+        Schema and sample rows for `table_names`, or None when any of them is not in the
+        snapshot (yet), so the caller can fall back to the warehouse.
+        """
+        if not self._ensure_loaded(timeout):
+            return None
+        tables = [self.table(name) for name in table_names]
+        with self._lock:
+            if any(table is None for table in tables):
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+        return "\n\n".join(table.info() for table in tables)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {**self._counters, "tables": len(self._tables), "refreshed_at": self.refreshed_at or 0.0}
@@ -0,0 +1,204 @@
+from langchain_core.documents import Document
+
+from typing import Any, Dict, List, Tuple
+from dataclasses import dataclass, field
+import threading
+import time
+import re
+
+from ...utils.instrumentation import record_timing
+from ...utils.tokens import estimate_tokens
+from .hybrid_retriever import is_identifier, tokenize
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9(\"'])|\n\s*\n")
+_WORD_RE = re.compile(r"\w+")
+# Longer "sentences" (tables, code listings without punctuation) are cut into pieces of this size.
+_MAX_SENTENCE_CHARS = 600
+# Longest chunk overlap looked for when stitching adjacent chunks (ingestion uses 100 characters).
+_MAX_OVERLAP_CHARS = 400
+
+
+def _source(doc: Document) -> str:
+    metadata = doc.metadata
+    return str(metadata.get("document_id") or metadata.get("file_path") or metadata.get("source") or "")
+
+
+def _shingles(text: str, size: int = 5) -> set:
+    words = _WORD_RE.findall(text.lower())
+    return {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+
+
+def _stitch(left: str, right: str) -> str:
+    """`left` + `right` without the text the chunk splitter repeated at the start of `right`."""
+    for n in range(min(len(left), len(right), _MAX_OVERLAP_CHARS), 19, -1):
+        if left.endswith(right[:n]):
+            return left + right[n:]
+    return f"{left}\n{right}"
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences = []
+    for part in _SENTENCE_RE.split(text):
+        part = " ".join(part.split())
+        while len(part) > _MAX_SENTENCE_CHARS:
+            cut = part.rfind(" ", 0, _MAX_SENTENCE_CHARS)
+            cut = cut if cut > 0 else _MAX_SENTENCE_CHARS
+            sentences.append(part[:cut])
+            part = part[cut:].lstrip()
+        if part:
+            sentences.append(part)
+    return sentences
+
+
+@dataclass
+class _Segment:
+    """Adjacent chunks of one document, stitched together; `rank` is the best rank of its chunks."""
+    rank: int
+    metadata: Dict[str, Any]
+    text: str
+    pages: List[Any] = field(default_factory=list)
+    sentences: List[str] = field(default_factory=list)
+
+    def label(self, number: int) -> str:
+        name = self.metadata.get("file_name") or self.metadata.get("source") or ""
+        pages = sorted({p for p in self.pages if p is not None})
+        if pages:
+            name += f", p. {pages[0]}" if len(pages) == 1 else f", pp. {pages[0]}-{pages[-1]}"
+        return f"[{number}] {name}".rstrip()
+
+
+class ContextCompressor:
+    """
+    Shrinks retrieved chunks to what the question needs before they reach the agent.
+
+    Chunks repeating an earlier one (shingle overlap above `duplicate_threshold`) are
+    dropped, consecutive chunks of one document (`chunk_order` metadata) are stitched into
+    one passage without the splitter's overlap, and only the sentences sharing the most
+    query terms (exact identifiers like `l_discount` or `Q17` weigh double) are kept, in
+    reading order, within `token_budget`. Sentences scoring below `min_score` are left
+    out unless nothing scores higher, so a vague question still gets the top passages.
+    """
+
+    def __init__(self, token_budget: int = 800, min_score: float = 0.2, duplicate_threshold: float = 0.8) -> None:
+        self.token_budget = token_budget
+        self.min_score = min_score
+        self.duplicate_threshold = duplicate_threshold
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "chunks": 0, "duplicate_chunks": 0, "merged_chunks": 0, "input_tokens": 0, "output_tokens": 0}
+        self._seconds = 0.0
+
+    def _dedupe(self, documents: List[Document]) -> List[Document]:
+        kept, seen = [], []
+        for doc in documents:
+            shingles = _shingles(doc.page_content)
+            if any(len(shingles & other) / max(min(len(shingles), len(other)), 1) >= self.duplicate_threshold for other in seen):
+                continue
+            seen.append(shingles)
+            kept.append(doc)
+        return kept
+
+    def _segments(self, documents: List[Document]) -> List[_Segment]:
+        """Chunks in rank order, consecutive chunks of the same document merged into one segment."""
+        groups: Dict[str, List[Tuple[int, Document]]] = {}
+        segments = []
+        for rank, doc in enumerate(documents):
+            source = _source(doc)
+            if source and doc.metadata.get("chunk_order") is not None:
+                groups.setdefault(source, []).append((rank, doc))
+            else:
+                segments.append(_Segment(rank, doc.metadata, doc.page_content, [doc.metadata.get("page")]))
+        for chunks in groups.values():
+            chunks.sort(key=lambda item: int(item[1].metadata["chunk_order"]))
+            current, last_order = None, None
+            for rank, doc in chunks:
+                order = int(doc.metadata["chunk_order"])
+                if current is not None and order == last_order + 1:
+                    current.text = _stitch(current.text, doc.page_content)
+                    current.rank = min(current.rank, rank)
+                    current.pages.append(doc.metadata.get("page"))
+                else:
+                    current = _Segment(rank, doc.metadata, doc.page_content, [doc.metadata.get("page")])
+                    segments.append(current)
+                last_order = order
+        return sorted(segments, key=lambda segment: segment.rank)
+
+    def _score(self, terms: Dict[str, float], sentence: str) -> float:
+        if not terms:
+            return 0.0
+        found = set(tokenize(sentence))
+        return sum(weight for term, weight in terms.items() if term in found) / sum(terms.values())
+
+    def _select(self, query: str, segments: List[_Segment]) -> Dict[int, List[int]]:
+        """{segment index: sentence indexes} of the best sentences that fit the budget."""
+        terms = {term: 2.0 if is_identifier(term) else 1.0 for term in tokenize(query)}
+        candidates = []
+        seen = set()
+        for i, segment in enumerate(segments):
+            for j, sentence in enumerate(segment.sentences):
+                normalized = sentence.lower()
+                if normalized in seen:
+                    continue
+                seen.add(normalized)
+                candidates.append((self._score(terms, sentence), segment.rank, i, j, sentence))
+        relevant = [c for c in candidates if c[0] >= self.min_score]
+        if relevant:
+            candidates = relevant
+        candidates.sort(key=lambda c: (-c[0], c[1], c[3]))
+
+        chosen: Dict[int, List[int]] = {}
+        budget = self.token_budget
+        for _, _, i, j, sentence in candidates:
+            cost = estimate_tokens(sentence) + 1 + (0 if i in chosen else estimate_tokens(segments[i].label(len(segments))) + 1)
+            if cost > budget:
+                continue
+            budget -= cost
+            chosen.setdefault(i, []).append(j)
+        return chosen
+
+    def compress(self, query: str, documents: List[Document]) -> str:
+        started = time.perf_counter()
+        input_tokens = sum(estimate_tokens(doc.page_content) for doc in documents)
+        unique = self._dedupe(documents)
+        segments = self._segments(unique)
+        for segment in segments:
+            segment.sentences = split_sentences(segment.text)
+        chosen = self._select(query, segments)
+
+        passages = []
+        for i, segment in enumerate(segments):
+            if i not in chosen:
+                continue
+            indexes = sorted(chosen[i])
+            parts = [segment.sentences[indexes[0]]]
+            for previous, j in zip(indexes, indexes[1:]):
+                parts.append(("... " if j > previous + 1 else "") + segment.sentences[j])
+            passages.append(f"{segment.label(len(passages) + 1)}\n{' '.join(parts)}")
+        context = "\n\n".join(passages)
+
+        output_tokens = estimate_tokens(context)
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self._counters["calls"] += 1
+            self._counters["chunks"] += len(documents)
+            self._counters["duplicate_chunks"] += len(documents) - len(unique)
+            self._counters["merged_chunks"] += len(unique) - len(segments)
+            self._counters["input_tokens"] += input_tokens
+            self._counters["output_tokens"] += output_tokens
+            self._seconds += seconds
+        record_timing(
+            "retrieval", "compress", seconds,
+            chunks=len(documents), input_tokens=input_tokens, output_tokens=output_tokens,
+            ratio=round(input_tokens / output_tokens, 2) if output_tokens else None,
+        )
+        return context
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            counters = dict(self._counters)
+            seconds = self._seconds
+        calls, output_tokens = counters["calls"], counters["output_tokens"]
+        return {
+            **counters,
+            "compression_ratio": round(counters["input_tokens"] / output_tokens, 2) if output_tokens else 0.0,
+            "avg_ms": round(1000 * seconds / calls, 2) if calls else 0.0,
+        }
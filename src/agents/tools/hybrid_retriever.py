@@ -0,0 +1,220 @@
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from langchain_core.documents import Document
+from pydantic import ConfigDict, PrivateAttr
+import numpy as np
+
+from typing import Any, Callable, Dict, List, Tuple
+from collections import Counter, defaultdict
+import threading
+import hashlib
+import asyncio
+import time
+import math
+import re
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:
+    CrossEncoder = None
+
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how in is it of on or that the this to "
+    "was what when where which who why with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase terms for lexical matching. Identifiers are kept whole and also split on
+    underscores, so `L_EXTENDEDPRICE` matches both itself and `extendedprice`.
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        terms.append(token)
+        if "_" in token:
+            terms.extend(part for part in token.split("_") if len(part) > 1)
+    return terms
+
+
+def is_identifier(term: str) -> bool:
+    """Terms like `l_extendedprice` or `q17` that should match exactly."""
+    return "_" in term or (any(c.isdigit() for c in term) and any(c.isalpha() for c in term))
+
+
+def doc_key(doc: Document) -> str:
+    return doc.id or hashlib.sha1(doc.page_content.encode()).hexdigest()
+
+
+class BM25Index:
+    """In-process Okapi BM25 inverted index, exact identifiers weigh `identifier_boost` times more."""
+
+    def __init__(self, documents: List[Document], k1: float = 1.2, b: float = 0.75, identifier_boost: float = 2.0) -> None:
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        self.identifier_boost = identifier_boost
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        lengths = np.zeros(len(documents), dtype=np.float32)
+        for i, doc in enumerate(documents):
+            terms = Counter(tokenize(doc.page_content))
+            lengths[i] = sum(terms.values())
+            for term, tf in terms.items():
+                postings[term].append((i, tf))
+        self.postings = {
+            term: (np.array([i for i, _ in hits], dtype=np.int64), np.array([tf for _, tf in hits], dtype=np.float32))
+            for term, hits in postings.items()
+        }
+        self.lengths = lengths
+        self.avg_length = float(lengths.mean()) if len(documents) else 0.0
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _matches(self, filter: Dict[str, Any]) -> np.ndarray:
+        return np.array([all(doc.metadata.get(k) == v for k, v in filter.items()) for doc in self.documents], dtype=bool)
+
+    def search(self, query: str, k: int, filter: Dict[str, Any] | None = None) -> List[Tuple[Document, float]]:
+        """Top-k documents by BM25 score; `filter` (metadata equality) is applied before ranking."""
+        if not self.documents:
+            return []
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        n = len(self.documents)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            ids, tf = self.postings[term]
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            if is_identifier(term):
+                idf *= self.identifier_boost
+            norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[ids] / self.avg_length)
+            scores[ids] += idf * tf * (self.k1 + 1) / norm
+        if filter:
+            scores[~self._matches(filter)] = 0
+        top = np.argsort(-scores)[:k]
+        return [(self.documents[i], float(scores[i])) for i in top if scores[i] > 0]
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], weights: List[float], rrf_k: int = 60) -> List[Tuple[Document, float]]:
+    """Fuses ranked lists with weighted RRF: score = sum(weight / (rrf_k + rank))."""
+    scores: Dict[str, float] = defaultdict(float)
+    documents: Dict[str, Document] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc in enumerate(ranking, start=1):
+            key = doc_key(doc)
+            scores[key] += weight / (rrf_k + rank)
+            documents.setdefault(key, doc)
+    return sorted(((documents[key], score) for key, score in scores.items()), key=lambda item: item[1], reverse=True)
+
+
+def lexical_rerank(query: str, candidates: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
+    """
+    Cheap local reranker: the fused score plus the share of query terms, and of exact
+    identifiers (column names, query numbers), found in the chunk.
+    """
+    if not candidates:
+        return []
+    terms = set(tokenize(query))
+    identifiers = {t for t in terms if is_identifier(t)}
+    top_score = max(score for _, score in candidates) or 1.0
+    reranked = []
+    for doc, score in candidates:
+        doc_terms = set(tokenize(doc.page_content))
+        coverage = len(terms & doc_terms) / len(terms) if terms else 0.0
+        exact = len(identifiers & doc_terms) / len(identifiers) if identifiers else 0.0
+        reranked.append((doc, 0.5 * score / top_score + 0.3 * coverage + 0.2 * exact))
+    return sorted(reranked, key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Lexical (BM25) + vector retrieval fused with reciprocal rank fusion, then reranked.
+
+    The BM25 index is built in process from `load_corpus` and rebuilt in the background
+    every `refresh_interval` seconds. Metadata filters are pushed down to both the vector
+    store query and the BM25 ranking. The reranker is "none", "lexical" or
+    "cross-encoder" (needs `sentence-transformers`, otherwise lexical is used).
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vector_store: VectorStore
+    load_corpus: Callable[[], List[Document]]
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+    bm25_weight: float = 1.0
+    vector_weight: float = 1.0
+    reranker: str = "lexical"
+    cross_encoder_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    refresh_interval: float = 600.0
+
+    _index: BM25Index | None = PrivateAttr(default=None)
+    _built_at: float = PrivateAttr(default=0.0)
+    _refreshing: bool = PrivateAttr(default=False)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _cross_encoder: Any = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        if self.reranker == "cross-encoder":
+            if CrossEncoder is None:
+                print("sentence-transformers is not installed, the hybrid retriever uses the lexical reranker.")
+                self.reranker = "lexical"
+            else:
+                self._cross_encoder = CrossEncoder(self.cross_encoder_model)
+
+    def _build(self) -> None:
+        started = time.perf_counter()
+        try:
+            index = BM25Index(self.load_corpus())
+        except Exception as e:
+            print(f"BM25 index build failed: {e}")
+            index = None
+        with self._lock:
+            if index is not None:
+                self._index = index
+                print(f"BM25 index built over {len(index)} chunks in {time.perf_counter() - started:.2f}s")
+            self._built_at = time.monotonic()
+            self._refreshing = False
+
+    def bm25(self) -> BM25Index | None:
+        """The current index, built on first use and refreshed in the background once stale."""
+        if self._index is None:
+            with self._lock:
+                first = not self._refreshing and self._index is None
+                self._refreshing = self._refreshing or first
+            if first:
+                self._build()
+        elif time.monotonic() - self._built_at > self.refresh_interval:
+            with self._lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                threading.Thread(target=self._build, name="bm25-refresh", daemon=True).start()
+        return self._index
+
+    def _fuse(self, query: str, vector_docs: List[Document], filter: Dict[str, Any] | None) -> List[Document]:
+        index = self.bm25()
+        lexical_docs = [doc for doc, _ in index.search(query, self.fetch_k, filter)] if index is not None else []
+        fused = reciprocal_rank_fusion([lexical_docs, vector_docs], [self.bm25_weight, self.vector_weight], self.rrf_k)
+        candidates = fused[:self.fetch_k]
+
+        if self.reranker == "lexical":
+            candidates = lexical_rerank(query, candidates)
+        elif self.reranker == "cross-encoder":
+            scores = self._cross_encoder.predict([(query, doc.page_content) for doc, _ in candidates]) if candidates else []
+            candidates = sorted(zip([doc for doc, _ in candidates], map(float, scores)), key=lambda item: item[1], reverse=True)
+        return [doc for doc, _ in candidates[:self.k]]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun, filter: Dict[str, Any] | None = None, **kwargs: Any) -> List[Document]:
+        vector_docs = self.vector_store.similarity_search(query, k=self.fetch_k, filter=filter)
+        return self._fuse(query, vector_docs, filter)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun, filter: Dict[str, Any] | None = None, **kwargs: Any) -> List[Document]:
+        vector_docs = await self.vector_store.asimilarity_search(query, k=self.fetch_k, filter=filter)
+        # BM25 scoring and reranking are CPU bound, a cross-encoder especially.
+        return await asyncio.to_thread(self._fuse, query, vector_docs, filter)
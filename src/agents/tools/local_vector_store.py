@@ -0,0 +1,451 @@
+from langchain_core.vectorstores import VectorStore
+from langchain_core.embeddings import Embeddings
+from langchain_core.documents import Document
+import pyarrow.compute
+import pyarrow as pa
+import numpy as np
+
+from typing import Any, Dict, Iterable, List, Tuple
+from dataclasses import dataclass
+from pathlib import Path
+import threading
+import json
+import uuid
+import os
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+_VECTORS_FILE = "vectors.npy"
+_METADATA_FILE = "metadata.arrow"
+_MANIFEST_FILE = "manifest.json"
+_IVF_FILE = "ivf.npz"
+_HNSW_FILE = "hnsw.bin"
+_DATA_FILES = (_VECTORS_FILE, _METADATA_FILE, _IVF_FILE, _HNSW_FILE)
+
+# Rows scored per matrix product in a flat scan, bounds the float32 upcast of a float16 matrix.
+_SCAN_BLOCK = 65536
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the `k` highest scores, best first."""
+    if len(scores) <= k:
+        return np.argsort(-scores)
+    top = np.argpartition(-scores, k)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def _write_atomic(path: Path, write) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _generation_file(name: str, generation: int | None) -> str:
+    """`vectors.npy` of generation 3 is `vectors.3.npy`; None is the unversioned layout of older stores."""
+    if generation is None:
+        return name
+    stem, suffix = name.split(".", 1)
+    return f"{stem}.{generation}.{suffix}"
+
+
+@dataclass
+class _State:
+    """The files of the store as loaded together; replaced as a whole, never modified."""
+    generation: int | None = None
+    vectors: np.ndarray | None = None
+    table: pa.Table | None = None
+    ivf: Tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+    hnsw: Any = None
+    metadata: List[Dict[str, Any]] | None = None
+
+    def __len__(self) -> int:
+        return 0 if self.vectors is None else len(self.vectors)
+
+    def row_metadata(self) -> List[Dict[str, Any]]:
+        if self.metadata is None:
+            self.metadata = [json.loads(m) for m in self.table.column("metadata").to_pylist()]
+        return self.metadata
+
+
+def train_ivf(vectors: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Spherical k-means inverted file over normalized `vectors`.
+
+    Returns the list centroids, the row ids ordered by list and the start offset of each
+    list in that order (plus the end offset).
+    """
+    rng = np.random.default_rng(seed)
+    sample = vectors[np.sort(rng.choice(len(vectors), min(len(vectors), n_lists * 64), replace=False))].astype(np.float32)
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(n_lists):
+            members = sample[assignment == c]
+            if len(members):
+                centroids[c] = _normalize(members.sum(axis=0))
+
+    assignment = np.concatenate([
+        np.argmax(vectors[start:start + _SCAN_BLOCK].astype(np.float32) @ centroids.T, axis=1)
+        for start in range(0, len(vectors), _SCAN_BLOCK)
+    ])
+    order = np.argsort(assignment, kind="stable")
+    offsets = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+    return centroids, order, offsets
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store kept in a directory of memory-mapped files.
+
+    - `vectors.<n>.npy`: the normalized embedding matrix (float32 or float16), opened with
+      `mmap_mode="r"` so loading is near zero copy and pages are read on demand.
+    - `metadata.<n>.arrow`: Arrow IPC side table (id, content, metadata as JSON) read through a
+      memory map.
+    - `ivf.<n>.npz` / `hnsw.<n>.bin`: optional approximate index (`index="ivf"` or `"hnsw"`, the
+      latter needs `hnswlib`) built once the store has `index_min_rows` rows; smaller
+      stores use an exact batched NumPy scan.
+    - `manifest.json`: the current generation `<n>`.
+
+    Every write creates the files of a new generation and commits it by atomically replacing
+    the manifest, so a crash mid-write leaves the previous generation in place; older
+    generations are removed afterwards. Writes rewrite the whole store (O(rows) per call), so
+    batch them: `update` deletes and adds in one rewrite. Searches read one consistent
+    snapshot of the loaded vectors, metadata and index, swapped in together.
+
+    Scores are cosine similarities, like the Supabase `match_documents` RPC.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        embedding: Embeddings,
+        dtype: str = "float16",
+        index: str = "flat",
+        index_min_rows: int = 20_000,
+        n_probe: int = 8,
+        hnsw_ef: int = 64,
+    ) -> None:
+        self.path = Path(path)
+        self._embedding = embedding
+        self.dtype = np.dtype(dtype)
+        self.index = index
+        self.index_min_rows = index_min_rows
+        self.n_probe = n_probe
+        self.hnsw_ef = hnsw_ef
+
+        # `_lock` serializes writers, `_state_lock` guards the swap of the loaded state.
+        self._lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._state = _State()
+        if index == "hnsw" and hnswlib is None:
+            print("hnswlib is not installed, the local vector store uses an IVF index instead.")
+            self.index = "ivf"
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def __len__(self) -> int:
+        return len(self._snapshot())
+
+    # ---- storage -----------------------------------------------------------------------
+
+    def _snapshot(self) -> _State:
+        with self._state_lock:
+            return self._state
+
+    def _file(self, name: str, generation: int | None) -> Path:
+        return self.path / _generation_file(name, generation)
+
+    def _load(self) -> None:
+        manifest_path = self.path / _MANIFEST_FILE
+        manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+        generation = manifest.get("generation")
+        vectors_path = self._file(_VECTORS_FILE, generation)
+        if not vectors_path.exists():
+            return
+        state = _State(
+            generation=generation,
+            vectors=np.load(vectors_path, mmap_mode="r"),
+            table=pa.ipc.open_file(pa.memory_map(str(self._file(_METADATA_FILE, generation)))).read_all(),
+        )
+
+        ivf_path, hnsw_path = self._file(_IVF_FILE, generation), self._file(_HNSW_FILE, generation)
+        if self.index == "ivf" and ivf_path.exists():
+            with np.load(ivf_path) as ivf:
+                state.ivf = (ivf["centroids"], ivf["order"], ivf["offsets"])
+        elif self.index == "hnsw" and hnsw_path.exists():
+            state.hnsw = hnswlib.Index(space="ip", dim=state.vectors.shape[1])
+            state.hnsw.load_index(str(hnsw_path), max_elements=len(state.vectors))
+            state.hnsw.set_ef(self.hnsw_ef)
+        with self._state_lock:
+            self._state = state
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        vectors: np.ndarray | List[List[float]],
+        metadatas: List[Dict[str, Any]] | None = None,
+        ids: List[str] | None = None,
+    ) -> List[str]:
+        """
+        Appends pre-computed embeddings. The store is rewritten as a new generation, so add
+        in large batches; readers keep their old memory maps until the swap.
+        """
+        return self.update(texts, vectors, metadatas, ids)
+
+    def delete(self, ids: List[str] | None = None, **kwargs: Any) -> bool | None:
+        """Removes the rows with the given ids (rewriting the store, like `add_embeddings`)."""
+        if not ids or not len(self):
+            return None
+        with self._lock:
+            keep = self._keep(self._snapshot(), ids)
+            if keep is None:
+                return False
+            self._rewrite(keep, None, None)
+        return True
+
+    def update(
+        self,
+        texts: List[str],
+        vectors: np.ndarray | List[List[float]],
+        metadatas: List[Dict[str, Any]] | None = None,
+        ids: List[str] | None = None,
+        delete_ids: List[str] | None = None,
+    ) -> List[str]:
+        """Removes the rows of `delete_ids` and appends the new embeddings in a single rewrite."""
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        new_rows = None
+        if len(texts):
+            vectors = _normalize(vectors).astype(self.dtype)
+            metadatas = metadatas or [{} for _ in texts]
+            new_rows = pa.table({
+                "id": pa.array(ids, pa.string()),
+                "content": pa.array(texts, pa.string()),
+                "metadata": pa.array([json.dumps(m) for m in metadatas], pa.string()),
+            })
+
+        with self._lock:
+            state = self._snapshot()
+            if new_rows is not None and len(state) and state.vectors.shape[1] != vectors.shape[1]:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the store ({state.vectors.shape[1]}).")
+            keep = self._keep(state, delete_ids) if delete_ids and len(state) else None
+            if new_rows is not None or keep is not None:
+                self._rewrite(keep, vectors if new_rows is not None else None, new_rows)
+        return ids
+
+    @staticmethod
+    def _keep(state: _State, ids: List[str]) -> np.ndarray | None:
+        """Rows not in `ids`, None when none of `ids` is stored."""
+        drop = pa.compute.is_in(state.table.column("id"), value_set=pa.array(ids, pa.string()))
+        keep = np.flatnonzero(~np.asarray(drop.to_numpy(zero_copy_only=False)))
+        return None if len(keep) == len(state) else keep
+
+    def _rewrite(self, keep: np.ndarray | None, vectors: np.ndarray | None, rows: pa.Table | None) -> None:
+        """
+        Writes the kept rows (all when `keep` is None) plus the new ones, and their index, as
+        the next generation, commits it in the manifest and swaps it in. Callers hold `_lock`.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        state = self._snapshot()
+        generation = (state.generation or 0) + 1
+        old_rows = len(state) if keep is None else len(keep)
+        dim = vectors.shape[1] if vectors is not None else state.vectors.shape[1]
+        new_count = 0 if vectors is None else len(vectors)
+        # Leftovers of a write that crashed before its commit, e.g. an index this write may not rebuild.
+        for name in _DATA_FILES:
+            self._file(name, generation).unlink(missing_ok=True)
+
+        out = np.lib.format.open_memmap(self._file(_VECTORS_FILE, generation), mode="w+", dtype=self.dtype, shape=(old_rows + new_count, dim))
+        for start in range(0, old_rows, _SCAN_BLOCK):
+            block = state.vectors[start:start + _SCAN_BLOCK] if keep is None else state.vectors[keep[start:start + _SCAN_BLOCK]]
+            out[start:start + len(block)] = block
+        if vectors is not None:
+            out[old_rows:] = vectors
+        out.flush()
+
+        tables = []
+        if state.table is not None:
+            tables.append(state.table if keep is None else state.table.take(keep))
+        if rows is not None:
+            tables.append(rows)
+        table = pa.concat_tables(tables)
+        with pa.OSFile(str(self._file(_METADATA_FILE, generation)), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+        if self.index != "flat" and len(out) >= self.index_min_rows:
+            self._build_index(out, generation)
+        manifest = {"generation": generation, "rows": len(out), "dim": int(dim), "dtype": self.dtype.name, "index": self.index}
+        del out
+        # The commit point: until the manifest is replaced, loads still see the previous generation.
+        _write_atomic(self.path / _MANIFEST_FILE, lambda tmp: tmp.write_text(json.dumps(manifest)))
+        self._load()
+        self._remove_stale(generation)
+
+    def _remove_stale(self, generation: int) -> None:
+        """Deletes the files of other generations (superseded, or left behind by a crashed write)."""
+        current = {_generation_file(name, generation) for name in _DATA_FILES}
+        for name in _DATA_FILES:
+            stem, suffix = name.split(".", 1)
+            for path in [self.path / name, *self.path.glob(f"{stem}.*.{suffix}"), *self.path.glob(f"{stem}*.tmp")]:
+                if path.name not in current:
+                    try:
+                        path.unlink(missing_ok=True)
+                    except OSError:
+                        # Still memory mapped elsewhere (Windows), removed by a later write.
+                        pass
+
+    def _build_index(self, vectors: np.ndarray, generation: int) -> None:
+        if self.index == "ivf":
+            centroids, order, offsets = train_ivf(vectors, n_lists=max(int(np.sqrt(len(vectors))), 1))
+            with open(self._file(_IVF_FILE, generation), "wb") as f:
+                np.savez(f, centroids=centroids, order=order, offsets=offsets)
+        elif self.index == "hnsw":
+            index = hnswlib.Index(space="ip", dim=vectors.shape[1])
+            index.init_index(max_elements=len(vectors), ef_construction=200, M=16)
+            for start in range(0, len(vectors), _SCAN_BLOCK):
+                block = vectors[start:start + _SCAN_BLOCK].astype(np.float32)
+                index.add_items(block, np.arange(start, start + len(block)))
+            index.save_index(str(self._file(_HNSW_FILE, generation)))
+        print(f"Built {self.index} index over {len(vectors)} vectors")
+
+    # ---- search ------------------------------------------------------------------------
+
+    @staticmethod
+    def _filter_rows(state: _State, filter: Dict[str, Any]) -> np.ndarray:
+        """Row ids whose metadata contains every `filter` key/value (like jsonb `@>`)."""
+        return np.array([
+            i for i, metadata in enumerate(state.row_metadata())
+            if all(metadata.get(key) == value for key, value in filter.items())
+        ], dtype=np.int64)
+
+    @staticmethod
+    def _scan(state: _State, queries: np.ndarray, k: int, rows: np.ndarray | None = None) -> List[List[Tuple[int, float]]]:
+        """Exact top-k of every query over all rows, or over the row ids `rows`."""
+        n = len(state) if rows is None else len(rows)
+        scores = np.empty((len(queries), n), dtype=np.float32)
+        for start in range(0, n, _SCAN_BLOCK):
+            block = state.vectors[start:start + _SCAN_BLOCK] if rows is None else state.vectors[rows[start:start + _SCAN_BLOCK]]
+            scores[:, start:start + len(block)] = queries @ block.astype(np.float32).T
+        results = []
+        for query_scores in scores:
+            top = _top_k(query_scores, k)
+            ids = top if rows is None else rows[top]
+            results.append([(int(i), float(s)) for i, s in zip(ids, query_scores[top])])
+        return results
+
+    def _search_ivf(self, state: _State, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        centroids, order, offsets = state.ivf
+        lists = _top_k(centroids @ query, self.n_probe)
+        rows = np.sort(np.concatenate([order[offsets[c]:offsets[c + 1]] for c in lists]))
+        return self._scan(state, query[None, :], k, rows)[0]
+
+    @staticmethod
+    def _search_hnsw(state: _State, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        labels, distances = state.hnsw.knn_query(query[None, :], k=min(k, len(state)))
+        return [(int(i), 1.0 - float(d)) for i, d in zip(labels[0], distances[0])]
+
+    def _search(self, state: _State, vectors: np.ndarray | List[List[float]], k: int, filter: Dict[str, Any] | None) -> List[List[Tuple[int, float]]]:
+        if not len(state):
+            return [[] for _ in vectors]
+        queries = _normalize(np.atleast_2d(vectors))
+        if filter:
+            # Filtered searches are exact over the matching rows.
+            rows = self._filter_rows(state, filter)
+            return self._scan(state, queries, k, rows) if len(rows) else [[] for _ in queries]
+        if state.ivf is not None:
+            return [self._search_ivf(state, query, k) for query in queries]
+        if state.hnsw is not None:
+            return [self._search_hnsw(state, query, k) for query in queries]
+        return self._scan(state, queries, k)
+
+    def search_by_vectors(
+        self,
+        vectors: np.ndarray | List[List[float]],
+        k: int = 4,
+        filter: Dict[str, Any] | None = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """Batched top-k (row id, cosine similarity) for each query vector."""
+        return self._search(self._snapshot(), vectors, k, filter)
+
+    @staticmethod
+    def _documents(state: _State, hits: List[Tuple[int, float]]) -> List[Tuple[Document, float]]:
+        if not hits:
+            return []
+        rows = state.table.take([i for i, _ in hits]).to_pylist()
+        return [
+            (Document(id=row["id"], page_content=row["content"], metadata=json.loads(row["metadata"])), score)
+            for row, (_, score) in zip(rows, hits)
+        ]
+
+    @staticmethod
+    def _rows_of(state: _State, ids: List[str]) -> np.ndarray:
+        if not len(state):
+            return np.array([], dtype=np.int64)
+        positions = {id_: i for i, id_ in enumerate(state.table.column("id").to_pylist())}
+        return np.array([positions[id_] for id_ in ids if id_ in positions], dtype=np.int64)
+
+    def get_where(self, filter: Dict[str, Any]) -> List[Document]:
+        """All documents whose metadata contains every `filter` key/value."""
+        state = self._snapshot()
+        if not len(state):
+            return []
+        return [doc for doc, _ in self._documents(state, [(int(i), 0.0) for i in self._filter_rows(state, filter)])]
+
+    def get_vectors(self, ids: List[str]) -> np.ndarray:
+        """Stored (normalized) embeddings of `ids`, in the store's row order."""
+        state = self._snapshot()
+        return np.asarray(state.vectors[np.sort(self._rows_of(state, ids))], dtype=np.float32)
+
+    # ---- VectorStore -------------------------------------------------------------------
+
+    def get_by_ids(self, ids: List[str], /) -> List[Document]:
+        state = self._snapshot()
+        return [doc for doc, _ in self._documents(state, [(int(i), 0.0) for i in np.sort(self._rows_of(state, ids))])]
+
+    def add_texts(self, texts: Iterable[str], metadatas: List[dict] | None = None, ids: List[str] | None = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        return self.add_embeddings(texts, self._embedding.embed_documents(texts), metadatas, ids)
+
+    async def aadd_texts(self, texts: Iterable[str], metadatas: List[dict] | None = None, ids: List[str] | None = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        return self.add_embeddings(texts, await self._embedding.aembed_documents(texts), metadatas, ids)
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4, filter: Dict[str, Any] | None = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        state = self._snapshot()
+        return self._documents(state, self._search(state, [embedding], k, filter)[0])
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Dict[str, Any] | None = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Dict[str, Any] | None = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Dict[str, Any] | None = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4, filter: Dict[str, Any] | None = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        # Only the embedding call does I/O, the search itself takes milliseconds in process.
+        return self.similarity_search_by_vector_with_score(await self._embedding.aembed_query(query), k, filter)
+
+    async def asimilarity_search(self, query: str, k: int = 4, filter: Dict[str, Any] | None = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: List[dict] | None = None, ids: List[str] | None = None, path: str | Path = ".cache/vector_store", **kwargs: Any) -> "LocalVectorStore":
+        store = cls(path, embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids)
+        return store
@@ -0,0 +1,211 @@
+from pyspark.sql import SparkSession
+
+from typing import Callable, Dict, Iterator, List
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import threading
+import uuid
+import re
+
+from .sql_parsing import tokenize_sql
+
+_STATS_RE = re.compile(r"Statistics\(sizeInBytes=([\d.]+)\s*([KMGTPE]i)?B(?:,\s*rowCount=([\d.E+]+))?")
+_RELATION_RE = re.compile(r"(?:HiveTableRelation\s*\[|Relation\s+)([`\w.]+)")
+_AGGREGATE_RE = re.compile(r"\bgroup\s+by\b|\b(?:count|sum|avg|min|max|approx_count_distinct|percentile\w*)\s*\(", re.IGNORECASE)
+_UNITS = {None: 1, "Ki": 2**10, "Mi": 2**20, "Gi": 2**30, "Ti": 2**40, "Pi": 2**50, "Ei": 2**60}
+# Spark reports Long.MaxValue (8.0 EiB) when it has no size estimate.
+_UNKNOWN_SIZE = 2**62
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if size < 1024 or unit == "TiB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+
+@dataclass
+class PlanCost:
+    """Optimizer estimates of an `EXPLAIN COST` plan: the result and each scanned table."""
+    output_bytes: int | None
+    output_rows: int | None
+    scans: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def scan_bytes(self) -> int | None:
+        return sum(self.scans.values()) if self.scans else self.output_bytes
+
+
+def parse_cost(plan: str) -> PlanCost | None:
+    """Reads the optimized logical plan section of `EXPLAIN COST` output, None without statistics."""
+    sizes = []
+    scans: Dict[str, int] = {}
+    for line in plan.splitlines():
+        stats = _STATS_RE.search(line)
+        if stats is None:
+            continue
+        size = int(float(stats.group(1)) * _UNITS[stats.group(2)])
+        rows = int(float(stats.group(3))) if stats.group(3) else None
+        size = None if size >= _UNKNOWN_SIZE else size
+        sizes.append((size, rows))
+        relation = _RELATION_RE.search(line)
+        if relation is not None and size is not None:
+            name = relation.group(1).replace("`", "").lower()
+            scans[name] = max(scans.get(name, 0), size)
+    if not sizes:
+        return None
+    # The first statistics line is the plan root, i.e. the query result.
+    return PlanCost(output_bytes=sizes[0][0], output_rows=sizes[0][1], scans=scans)
+
+
+class QueryGuardError(Exception):
+    """A query the guard refuses to run, the message tells the agent how to narrow it down."""
+
+
+class QueryTimeoutError(TimeoutError):
+    """A query interrupted on the warehouse after its time budget."""
+
+
+@dataclass
+class GuardDecision:
+    query: str
+    actions: List[str]
+    cost: PlanCost | None = None
+
+    def note(self) -> str:
+        """Markdown line telling the agent what the guard changed, empty when nothing."""
+        return f"_Query guard: {'; '.join(self.actions)}._" if self.actions else ""
+
+
+def _is_exploratory(query: str) -> bool:
+    """A SELECT / WITH statement without aggregation or a final LIMIT (comments ignored)."""
+    tokens = tokenize_sql(query)
+    if not tokens or tokens[0].text not in ("select", "with"):
+        return False
+    if len(tokens) >= 2 and tokens[-2].text == "limit" and tokens[-1].kind == "number":
+        return False
+    return not _AGGREGATE_RE.search(" ".join(token.text for token in tokens))
+
+
+def _sample_table(query: str, table: str, percent: float) -> str:
+    """Adds `TABLESAMPLE (percent PERCENT)` to the FROM / JOIN references of `table`."""
+    name = re.escape(table.split(".")[-1])
+    pattern = re.compile(rf"(\b(?:from|join)\s+)((?:`?\w+`?\.){{0,2}}`?{name}`?)(?![\w`.])(?!\s+tablesample)", re.IGNORECASE)
+    return pattern.sub(rf"\g<1>\g<2> TABLESAMPLE ({percent:g} PERCENT)", query)
+
+
+class QueryGuard:
+    """
+    Cost check of agent generated queries before they run on the warehouse.
+
+    `explain_cost(query, timeout)` returns the `EXPLAIN COST` text of a query. From its estimates:
+    - a SELECT / WITH query without aggregation or LIMIT that returns more than `exploratory_limit` rows
+      (or an unknown number) gets `LIMIT exploratory_limit`;
+    - an exploratory query scanning more than `max_scan_bytes` reads a TABLESAMPLE of its
+      largest tables when `sample` is set; aggregates (whose sampled SUM / COUNT would be
+      silently off) and every query when `sample` is unset are rejected with a `QueryGuardError`.
+    Every change is listed in the returned decision so the agent can refine the query.
+    """
+
+    def __init__(
+        self,
+        explain_cost: Callable[[str, float | None], str],
+        max_scan_bytes: int = 10 * 2**30,
+        exploratory_limit: int = 1000,
+        sample: bool = True,
+        min_sample_percent: float = 0.1,
+    ) -> None:
+        self.explain_cost = explain_cost
+        self.max_scan_bytes = max_scan_bytes
+        self.exploratory_limit = exploratory_limit
+        self.sample = sample
+        self.min_sample_percent = min_sample_percent
+
+    def plan(self, query: str, timeout: float | None = None) -> GuardDecision:
+        """Decision for `query`; `EXPLAIN COST` gets at most `timeout` seconds, the query runs unchecked after that."""
+        query = query.strip().rstrip(";").strip()
+        actions: List[str] = []
+        try:
+            cost = parse_cost(self.explain_cost(query, timeout))
+        except Exception as e:
+            print(f"Query guard: no cost estimate ({type(e).__name__}: {e})")
+            cost = None
+
+        if cost is not None and cost.scan_bytes is not None and cost.scan_bytes > self.max_scan_bytes:
+            budget, estimate = format_bytes(self.max_scan_bytes), format_bytes(cost.scan_bytes)
+            if not self.sample or not _is_exploratory(query):
+                raise QueryGuardError(
+                    f"Estimated scan of {estimate} exceeds the {budget} budget. Add selective filters "
+                    f"(e.g. on date columns) or read fewer tables / columns."
+                )
+            sampled = query
+            # Sample the largest tables until the rest of the scan fits the budget.
+            remaining = cost.scan_bytes
+            for table, size in sorted(cost.scans.items(), key=lambda item: -item[1]):
+                if remaining <= self.max_scan_bytes:
+                    break
+                percent = max(round(100 * self.max_scan_bytes / len(cost.scans) / size, 2), self.min_sample_percent)
+                if percent >= 100:
+                    continue
+                rewritten = _sample_table(sampled, table, percent)
+                if rewritten != sampled:
+                    sampled = rewritten
+                    remaining -= size * (1 - percent / 100)
+                    actions.append(f"sampled `{table}` at {percent:g}% (estimated scan {estimate} > {budget}), rows are a sample, add filters for the full result")
+            if sampled == query:
+                raise QueryGuardError(f"Estimated scan of {estimate} exceeds the {budget} budget and the query could not be sampled. Add selective filters.")
+            query = sampled
+
+        if _is_exploratory(query) and (cost is None or cost.output_rows is None or cost.output_rows > self.exploratory_limit):
+            rows = f"~{cost.output_rows} rows estimated" if cost is not None and cost.output_rows is not None else "row count unknown"
+            query = f"{query}\nLIMIT {self.exploratory_limit}"
+            actions.append(f"added LIMIT {self.exploratory_limit} ({rows}), aggregate or filter for complete answers")
+        return GuardDecision(query=query, actions=actions, cost=cost)
+
+
+@contextmanager
+def interruptible(spark: SparkSession, timeout: float | None) -> Iterator[None]:
+    """
+    Interrupts the Spark operations started in the block once `timeout` seconds passed.
+
+    Spark Connect operations are tagged and cancelled with `interruptTag`; classic sessions
+    (local runs) use a cancellable job group. An interrupted block raises QueryTimeoutError.
+    """
+    if timeout is None:
+        yield
+        return
+    if timeout <= 0:
+        raise QueryTimeoutError("The step time budget was used up before the query could start.")
+
+    tag = f"query-guard-{uuid.uuid4().hex[:12]}"
+    if hasattr(spark, "addTag"):
+        spark.addTag(tag)
+        cancel, cleanup = (lambda: spark.interruptTag(tag)), (lambda: spark.removeTag(tag))
+    else:
+        context = spark.sparkContext
+        context.setJobGroup(tag, "query guard", interruptOnCancel=True)
+        cancel, cleanup = (lambda: context.cancelJobGroup(tag)), context.clearJobGroup
+
+    fired = threading.Event()
+
+    def on_timeout() -> None:
+        fired.set()
+        try:
+            cancel()
+        except Exception as e:
+            print(f"Could not interrupt query {tag}: {e}")
+
+    timer = threading.Timer(timeout, on_timeout)
+    timer.daemon = True
+    timer.start()
+    try:
+        yield
+    except Exception as e:
+        if fired.is_set():
+            raise QueryTimeoutError(
+                f"The query was interrupted after {timeout:g}s. Narrow it down (filters, aggregation, LIMIT) and try again."
+            ) from e
+        raise
+    finally:
+        timer.cancel()
+        cleanup()
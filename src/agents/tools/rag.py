@@ -1,47 +1,185 @@
 from langchain_community.vectorstores import SupabaseVectorStore
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain.tools.retriever import create_retriever_tool
+from langchain_core.vectorstores import VectorStore, InMemoryVectorStore
 from langchain_core.prompts import ChatPromptTemplate
-from supabase.client import Client, create_client
+from supabase.client import Client, AsyncClient, create_client, acreate_client
+from langchain_core.documents import Document
 from langgraph.graph import MessagesState
 from pydantic import BaseModel, Field
-from langchain_groq import ChatGroq
-from langchain.tools import Tool
+from langchain_core.tools import BaseTool, StructuredTool
+from pyprojroot import here
 
 from dotenv import load_dotenv
-from typing import Literal
+from typing import Any, Dict, List, Literal, Optional
+import asyncio
+import time
 import os
 
+from .local_vector_store import LocalVectorStore
+from .hybrid_retriever import HybridRetriever
+from .context_compression import ContextCompressor
+from ..fast_router import load_fast_router, RETRIEVER_KEYWORDS, WEB_SEARCH_KEYWORDS
 from ...prompts.router import RAG_ROUTER_PROMPT
-from ...load_config import LoadToolsConfig
+from ...utils.embedding_cache import FixedDimensionEmbeddings, get_embeddings
+from ...utils.llm_gateway import get_chat_model
+from ...utils.scheduler import SCHEDULER
+from ...load_config import get_tools_config
 
 
 load_dotenv()
 
-TOOLS_CFG = LoadToolsConfig()
+TOOLS_CFG = get_tools_config()
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 
-def load_supabase_retriever_tool() -> Tool:
-    """Creates the supabase document retriever tool"""
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    embeddings = GoogleGenerativeAIEmbeddings(model=TOOLS_CFG.rag_agent_embedding)
+CONTEXT_COMPRESSOR = ContextCompressor(
+    token_budget=TOOLS_CFG.rag_agent_compression_token_budget,
+    min_score=TOOLS_CFG.rag_agent_compression_min_score,
+    duplicate_threshold=TOOLS_CFG.rag_agent_compression_duplicate_threshold,
+) if TOOLS_CFG.rag_agent_compression_enabled else None
+
+class AsyncSupabaseVectorStore(SupabaseVectorStore):
+    """
+    SupabaseVectorStore with a native async similarity search.
+
+    The base class only has a sync RPC path, so its async methods fall back to a thread.
+    Here the query is embedded with `aembed_query` and matched through the async
+    Supabase client, keeping retrieval off the worker threads.
+    """
+
+    def __init__(self, *args, supabase_url: str, supabase_key: str, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._supabase_url = supabase_url
+        self._supabase_key = supabase_key
+        self._async_client: AsyncClient | None = None
+        self._async_client_lock = asyncio.Lock()
+
+    async def _get_async_client(self) -> AsyncClient:
+        async with self._async_client_lock:
+            if self._async_client is None:
+                self._async_client = await acreate_client(self._supabase_url, self._supabase_key)
+        return self._async_client
+
+    async def asimilarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Document]:
+        vector = await self._embedding.aembed_query(query)
+        client = await self._get_async_client()
+
+        query_builder = client.rpc(self.query_name, self.match_args(vector, filter))
+        query_builder.params = query_builder.params.set("limit", k)
+        res = await query_builder.execute()
+
+        return [
+            Document(metadata=search.get("metadata", {}), page_content=search.get("content", ""))
+            for search in res.data
+            if search.get("content")
+        ]
+
 
-    vector_store = SupabaseVectorStore(
-        embedding=embeddings,
+def load_vector_store() -> VectorStore:
+    """Creates the document vector store selected by `rag_agent.vs_backend` ("supabase" or "local")."""
+    embeddings = get_embeddings()
+
+    if TOOLS_CFG.rag_agent_vs_backend == "local":
+        return LocalVectorStore(
+            path=here(TOOLS_CFG.rag_agent_local_vs_path),
+            embedding=embeddings,
+            dtype=TOOLS_CFG.rag_agent_local_vs_dtype,
+            index=TOOLS_CFG.rag_agent_local_vs_index,
+            index_min_rows=TOOLS_CFG.rag_agent_local_vs_index_min_rows,
+            n_probe=TOOLS_CFG.rag_agent_local_vs_n_probe,
+        )
+
+    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return AsyncSupabaseVectorStore(
+        supabase_url=SUPABASE_URL,
+        supabase_key=SUPABASE_KEY,
+        # The same dimension the ingestion pipeline embeds the chunks at.
+        embedding=FixedDimensionEmbeddings(embeddings, TOOLS_CFG.ingestion_embedding_dim),
         client=supabase,
         table_name=TOOLS_CFG.rag_agent_vs_table,
         query_name=TOOLS_CFG.rag_agent_vs_query,
     )
-    retriever = vector_store.as_retriever()
 
-    retriever_tool = create_retriever_tool(
-        retriever,
-        "retrieve_docs",
-        "Search and return information from the vector store.",
+
+def load_corpus(vector_store: VectorStore) -> List[Document]:
+    """All stored chunks (content + metadata), the corpus of the in-process BM25 index."""
+    if isinstance(vector_store, LocalVectorStore):
+        return vector_store.get_where({})
+    if isinstance(vector_store, InMemoryVectorStore):
+        return [Document(id=id_, page_content=row["text"], metadata=row["metadata"]) for id_, row in vector_store.store.items()]
+
+    # Paged by row offset (not by kept documents, rows without content are skipped) in id order.
+    documents, offset, page_size = [], 0, 1000
+    while True:
+        rows = (
+            vector_store._client.table(vector_store.table_name)
+            .select("id, content, metadata")
+            .order("id")
+            .range(offset, offset + page_size - 1)
+            .execute()
+            .data
+        )
+        offset += len(rows)
+        documents += [Document(id=str(row["id"]), page_content=row["content"], metadata=row.get("metadata") or {}) for row in rows if row.get("content")]
+        if len(rows) < page_size:
+            return documents
+
+
+class RetrieveDocsInput(BaseModel):
+    query: str = Field(..., description="query to look up in the document store")
+    filter: Optional[Dict[str, Any]] = Field(None, description="Optional exact match on chunk metadata fields, e.g. {\"page\": 12}")
+
+
+def load_supabase_retriever_tool(vector_store: VectorStore | None = None) -> BaseTool:
+    """Creates the document retriever tool on `vector_store`, by default the configured vector store backend"""
+    if vector_store is None:
+        vector_store = load_vector_store()
+    if not TOOLS_CFG.rag_agent_hybrid_enabled and CONTEXT_COMPRESSOR is None:
+        return create_retriever_tool(
+            vector_store.as_retriever(),
+            "retrieve_docs",
+            "Search and return information from the vector store.",
+        )
+
+    if TOOLS_CFG.rag_agent_hybrid_enabled:
+        retriever = HybridRetriever(
+            vector_store=vector_store,
+            load_corpus=lambda: load_corpus(vector_store),
+            k=TOOLS_CFG.rag_agent_hybrid_k,
+            fetch_k=TOOLS_CFG.rag_agent_hybrid_fetch_k,
+            rrf_k=TOOLS_CFG.rag_agent_hybrid_rrf_k,
+            bm25_weight=TOOLS_CFG.rag_agent_hybrid_bm25_weight,
+            vector_weight=TOOLS_CFG.rag_agent_hybrid_vector_weight,
+            reranker=TOOLS_CFG.rag_agent_hybrid_reranker,
+            cross_encoder_model=TOOLS_CFG.rag_agent_hybrid_cross_encoder_model,
+            refresh_interval=TOOLS_CFG.rag_agent_hybrid_refresh_interval,
+        )
+    else:
+        retriever = vector_store.as_retriever()
+
+    def render(query: str, documents: List[Document]) -> str:
+        if CONTEXT_COMPRESSOR is None:
+            return "\n\n".join(doc.page_content for doc in documents)
+        return CONTEXT_COMPRESSOR.compress(query, documents)
+
+    def retrieve_docs(query: str, filter: Optional[Dict[str, Any]] = None) -> str:
+        with SCHEDULER.slot("retrieval"):
+            documents = retriever.invoke(query, **({"filter": filter} if filter else {}))
+        return render(query, documents)
+
+    async def aretrieve_docs(query: str, filter: Optional[Dict[str, Any]] = None) -> str:
+        async with SCHEDULER.aslot("retrieval"):
+            documents = await retriever.ainvoke(query, **({"filter": filter} if filter else {}))
+        return render(query, documents)
+
+    return StructuredTool.from_function(
+        func=retrieve_docs,
+        coroutine=aretrieve_docs,
+        name="retrieve_docs",
+        description="Search and return information from the vector store. Exact identifiers (column names, query numbers like Q17) are matched literally.",
+        args_schema=RetrieveDocsInput,
     )
-    return retriever_tool
 
 
 class RouteQuery(BaseModel):
@@ -60,22 +198,30 @@ def route_question(state: MessagesState):
         str: Next node to call
     """
     print("---ROUTE QUESTION---")
-    router_llm = ChatGroq(model=TOOLS_CFG.supervisor_agent_llm, temperature=TOOLS_CFG.supervisor_agent_llm_temperature)
-    router_llm = router_llm.with_structured_output(RouteQuery, method="function_calling")
-
-    route_prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", RAG_ROUTER_PROMPT),
-            ("human", "{question}"),
-        ]
-    )
-    question_router = route_prompt | router_llm
     question = state["messages"][0].content
-    source: RouteQuery = question_router.invoke({"question": question})
-    if source.datasource == "web_search":
+    fast_router = load_fast_router("rag_router", {"retriever": RETRIEVER_KEYWORDS, "web_search": WEB_SEARCH_KEYWORDS})
+    datasource = fast_router.route(question, ("retriever", "web_search")) if fast_router else None
+
+    if datasource is None:
+        router_llm = get_chat_model(TOOLS_CFG.router_agent_llm, TOOLS_CFG.router_agent_llm_temperature, priority=TOOLS_CFG.llm_gateway_router_priority)
+        router_llm = router_llm.with_structured_output(RouteQuery, method="function_calling")
+
+        route_prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", RAG_ROUTER_PROMPT),
+                ("human", "{question}"),
+            ]
+        )
+        question_router = route_prompt | router_llm
+        started = time.perf_counter()
+        source: RouteQuery = question_router.invoke({"question": question})
+        datasource = source.datasource
+        if fast_router is not None:
+            fast_router.record(question, datasource, time.perf_counter() - started)
+
+    if datasource == "web_search":
         print("---ROUTE QUESTION TO WEB SEARCH---")
         return "web_search"
-    elif source.datasource == "retriever":
+    elif datasource == "retriever":
         print("---ROUTE QUESTION TO RETRIEVER---")
         return "retriever"
-
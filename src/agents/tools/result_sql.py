@@ -0,0 +1,88 @@
+import pyarrow as pa
+
+from typing import Dict, List
+import time
+import re
+
+from ...utils.instrumentation import record_timing
+from .arrow_results import QueryResult, QueryResultStore, bound_table
+from .sql_parsing import is_read_only
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+LAST_RESULT = "last_result"
+_RESULT_TABLE_RE = re.compile(rf"\b(?:{LAST_RESULT}|result_[0-9a-f]{{12}})\b", re.IGNORECASE)
+
+
+def result_table_name(result: QueryResult) -> str:
+    return f"result_{result.handle}"
+
+
+def references_results(query: str) -> bool:
+    """True when `query` reads session results (`last_result` / `result_<handle>`), not warehouse tables."""
+    return bool(_RESULT_TABLE_RE.search(query))
+
+
+class ResultSQLEngine:
+    """
+    Runs DuckDB SQL in-process over a session's recent results in `store`.
+
+    The session's newest result is the table `last_result`, every recent one is also
+    `result_<handle>` (the handle shown under its preview). Results are registered as
+    Arrow tables without copying; the connection is in-memory, lives for one query and
+    cannot read or write files. The answer is bounded and stored like a warehouse result,
+    so it can be paged in the UI and refined again.
+    """
+
+    def __init__(self, store: QueryResultStore, threads: int = 2) -> None:
+        if duckdb is None:
+            raise ImportError("Querying recent results needs duckdb, install it with `pip install duckdb`")
+        self.store = store
+        self.threads = threads
+
+    def tables(self, session: str = "") -> Dict[str, QueryResult]:
+        recent = self.store.recent(session)
+        tables = {result_table_name(result): result for result in recent}
+        if recent:
+            tables[LAST_RESULT] = recent[0]
+        return tables
+
+    def describe(self, session: str = "") -> str:
+        """One line per queryable result: table name, columns and row count."""
+        lines = []
+        for name, result in self.tables(session).items():
+            columns = ", ".join(f"{field.name} {field.type}" for field in result.table.schema)
+            rows = f"{result.num_rows}+ (truncated)" if result.truncated else str(result.num_rows)
+            lines.append(f"- `{name}` ({rows} rows): {columns}")
+        return "\n".join(lines)
+
+    def run(self, query: str, session: str = "") -> QueryResult:
+        query = query.strip().rstrip(";").strip()
+        if not is_read_only(query):
+            raise ValueError("Only a single SELECT / WITH query can run over the recent results.")
+        tables = self.tables(session)
+        if not tables:
+            raise LookupError("There are no earlier results in this conversation, query the warehouse with `query_sql_db`.")
+
+        started = time.perf_counter()
+        connection = duckdb.connect(config={"enable_external_access": False, "threads": self.threads})
+        try:
+            for name, result in tables.items():
+                connection.register(name, result.table)
+            relation = connection.execute(query)
+            fetch = getattr(relation, "to_arrow_table", None) or relation.fetch_arrow_table
+            table: pa.Table = fetch()
+        finally:
+            connection.close()
+        table, truncated = bound_table(table, self.store.max_rows, self.store.max_bytes)
+        record_timing("local_sql", "query", time.perf_counter() - started, rows=table.num_rows)
+        return self.store.add(query, table, truncated, session)
+
+    def sources(self, query: str, session: str = "") -> List[QueryResult]:
+        """The recent results `query` reads."""
+        lowered = query.lower()
+        read = {result.handle: result for name, result in self.tables(session).items() if re.search(rf"\b{name}\b", lowered)}
+        return list(read.values())
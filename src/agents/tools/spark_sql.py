@@ -1,5 +1,4 @@
 from langchain_core.language_models.base import BaseLanguageModel
-from langchain_community.utilities.spark_sql import SparkSQL
 from langchain_community.tools.spark_sql.tool import (
     QuerySparkSQLTool,
     InfoSparkSQLTool,
@@ -8,19 +7,210 @@ from langchain_community.tools.spark_sql.tool import (
 )
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
+from pyprojroot import here
 from dotenv import load_dotenv
 
-from typing import List
+from typing import Dict, List, Tuple
+from collections import OrderedDict
+import threading
+import asyncio
+import time
+import re
 import os
 
-from ...utils.app_utils import get_spark_session_sync
+from ...utils.spark_pool import PooledSparkSession, is_connection_error
+from ...utils.app_utils import get_spark_pool, run_blocking
+from ...utils.scheduler import SCHEDULER, current_session
+from ...utils.instrumentation import record_timing
+from ...load_config import get_tools_config
+from .catalog_snapshot import CatalogSnapshot
+from .arrow_results import QueryResult, QueryResultStore
+from .result_sql import LAST_RESULT, ResultSQLEngine
+from .sql_cache import SQLResultCache
+from .sql_validator import SQLValidator
+from .query_guard import QueryGuard, QueryTimeoutError, interruptible
 
 load_dotenv()
 
+TOOLS_CFG = get_tools_config()
+
 CATALOG = os.environ.get("UC_CATALOG_NAME", "tpch")
 SCHEMA = os.environ.get("UC_SCHEMA_NAME", "bronze")
 
 
+def get_table_versions(tables: List[str], timeout: float | None = None) -> Dict[str, str]:
+    """
+    Latest Delta version and commit timestamp of each table, empty for non-Delta tables.
+    With `timeout`, waiting for a session and the lookups together stop after that many seconds.
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+
+    def lookup(pooled: PooledSparkSession) -> Dict[str, str]:
+        versions = {}
+        with interruptible(pooled.session, deadline - time.monotonic() if deadline is not None else None):
+            for table in tables:
+                try:
+                    row = pooled.session.sql(f"DESCRIBE HISTORY {table} LIMIT 1").collect()[0]
+                    versions[table] = f"{row.version}@{row.timestamp}"
+                except Exception as exc:
+                    if is_connection_error(exc) or isinstance(exc, QueryTimeoutError):
+                        raise
+                    versions[table] = ""
+        return versions
+
+    return get_spark_pool().execute(lookup, timeout=timeout)
+
+
+SQL_RESULT_CACHE = SQLResultCache(
+    version_lookup=get_table_versions,
+    catalog=CATALOG,
+    schema=SCHEMA,
+    ttl=TOOLS_CFG.sql_cache_ttl,
+    max_entries=TOOLS_CFG.sql_cache_max_entries,
+    max_bytes=TOOLS_CFG.sql_cache_max_bytes,
+    version_check_interval=TOOLS_CFG.sql_cache_version_check_interval,
+) if TOOLS_CFG.sql_cache_enabled else None
+
+CATALOG_SNAPSHOT = CatalogSnapshot(
+    run=lambda fn: get_spark_pool().execute(lambda pooled: fn(pooled.session)),
+    catalog=CATALOG,
+    schema=SCHEMA,
+    sample_rows=TOOLS_CFG.catalog_snapshot_sample_rows,
+    refresh_interval=TOOLS_CFG.catalog_snapshot_refresh_interval,
+    persist_path=here(TOOLS_CFG.catalog_snapshot_persist_path) if TOOLS_CFG.catalog_snapshot_persist_path else None,
+) if TOOLS_CFG.catalog_snapshot_enabled else None
+
+_PLANS: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+_PLANS_LOCK = threading.Lock()
+_PLAN_TTL = 60.0
+_MAX_PLANS = 64
+
+
+def explain_query(query: str, timeout: float | None = None) -> str:
+    """
+    Plan text of `EXPLAIN COST <query>` on a pooled session, Spark analyzes the query and
+    estimates its size without running it. Plans are kept for a minute, so the validator
+    and the query guard share one round trip for the same query. With `timeout`, waiting
+    for a session and planning together stop after that many seconds.
+    """
+    query = query.strip().rstrip(";").strip()
+    with _PLANS_LOCK:
+        cached = _PLANS.get(query)
+        if cached is not None and time.monotonic() - cached[0] < _PLAN_TTL:
+            return cached[1]
+
+    deadline = time.monotonic() + timeout if timeout is not None else None
+
+    def explain(pooled: PooledSparkSession) -> str:
+        started = time.perf_counter()
+        with interruptible(pooled.session, deadline - time.monotonic() if deadline is not None else None):
+            plan = pooled.session.sql(f"EXPLAIN COST {query}").collect()[0][0]
+        record_timing("spark", "explain", time.perf_counter() - started)
+        return plan
+
+    plan = get_spark_pool().execute(explain, timeout=timeout)
+    with _PLANS_LOCK:
+        _PLANS[query] = (time.monotonic(), plan)
+        _PLANS.move_to_end(query)
+        while len(_PLANS) > _MAX_PLANS:
+            _PLANS.popitem(last=False)
+    return plan
+
+
+SQL_VALIDATOR = SQLValidator(
+    catalog=CATALOG,
+    schema=SCHEMA,
+    # Never waits for the first snapshot load, EXPLAIN resolves the names meanwhile.
+    tables=lambda: CATALOG_SNAPSHOT.columns(timeout=0) if CATALOG_SNAPSHOT is not None else None,
+    explain=explain_query if TOOLS_CFG.sql_validator_explain else None,
+) if TOOLS_CFG.sql_validator_enabled else None
+
+QUERY_GUARD = QueryGuard(
+    explain_cost=explain_query,
+    max_scan_bytes=TOOLS_CFG.query_guard_max_scan_bytes,
+    exploratory_limit=TOOLS_CFG.query_guard_exploratory_limit,
+    sample=TOOLS_CFG.query_guard_sample,
+    min_sample_percent=TOOLS_CFG.query_guard_min_sample_percent,
+) if TOOLS_CFG.query_guard_enabled else None
+
+QUERY_RESULTS = QueryResultStore(
+    max_rows=TOOLS_CFG.query_results_max_rows,
+    max_bytes=TOOLS_CFG.query_results_max_bytes,
+    preview_tokens=TOOLS_CFG.query_results_preview_tokens,
+    page_size=TOOLS_CFG.query_results_page_size,
+    max_handles=TOOLS_CFG.query_results_max_handles,
+    session_results=TOOLS_CFG.query_results_session_results,
+)
+
+_HANDLE_RE = re.compile(r"Result handle: `([0-9a-f]{12})`")
+
+
+def _load_result_sql() -> ResultSQLEngine | None:
+    if not TOOLS_CFG.query_results_local_sql:
+        return None
+    try:
+        return ResultSQLEngine(QUERY_RESULTS, threads=TOOLS_CFG.query_results_local_sql_threads)
+    except ImportError as e:
+        print(f"{e}; follow-up questions are answered from the warehouse.")
+        return None
+
+
+RESULT_SQL = _load_result_sql()
+
+
+def run_query(query: str, session: str | None = None) -> str:
+    """
+    Runs `query` on a pooled session (or serves it from SQL_RESULT_CACHE) and returns its preview.
+    The result becomes the newest of `session` (default: the current chat session) in QUERY_RESULTS.
+
+    QUERY_GUARD may add a LIMIT / TABLESAMPLE (noted above the preview) or refuse the query.
+    Planning, waiting for a session and running share the `spark_sql_agent.step_timeout`
+    budget; the query itself also stops after `query_guard.query_timeout`. Both interrupt
+    the running Spark operation and raise, so the agent gets an error instead of hanging.
+    """
+    session = current_session() if session is None else session
+    deadline = time.monotonic() + TOOLS_CFG.spark_sql_agent_step_timeout
+
+    def remaining() -> float:
+        return deadline - time.monotonic()
+
+    def run() -> str:
+        started = time.perf_counter()
+        decision = QUERY_GUARD.plan(query, timeout=remaining()) if QUERY_GUARD is not None else None
+        if decision is not None:
+            record_timing("spark", "guard", time.perf_counter() - started, actions=decision.actions)
+        queued = time.perf_counter()
+
+        def execute(pooled: PooledSparkSession) -> QueryResult:
+            # Waiting for a pooled session is the "queue" phase of the query.
+            record_timing("spark", "queue", time.perf_counter() - queued)
+            with interruptible(pooled.session, min(TOOLS_CFG.query_guard_query_timeout, remaining())):
+                return QUERY_RESULTS.execute(pooled.session, decision.query if decision is not None else query, session=session)
+
+        preview = QUERY_RESULTS.preview(get_spark_pool().execute(execute, timeout=remaining()))
+        note = decision.note() if decision is not None else ""
+        return f"{note}\n\n{preview}" if note else preview
+
+    if SQL_RESULT_CACHE is None:
+        return run()
+    preview = SQL_RESULT_CACHE.get_or_run(query, run, timeout=remaining())
+    if not _attach_preview(preview, session):
+        # The preview outlived its Arrow result: run again, else `last_result` would be an older result.
+        SQL_RESULT_CACHE.discard(query)
+        preview = SQL_RESULT_CACHE.get_or_run(query, run, timeout=remaining())
+        _attach_preview(preview, session)
+    return preview
+
+
+def _attach_preview(preview: str, session: str) -> bool:
+    """
+    Makes the result behind a (possibly cached) preview the newest of `session`, a cached
+    preview's result may come from another session. False when the store evicted it.
+    """
+    handle = _HANDLE_RE.search(preview)
+    return handle is None or QUERY_RESULTS.attach(handle.group(1), session) is not None
+
+
 class SparkSQLResponse(BaseModel):
     """Should always use this tool to structure your response to the user."""
     # question: str = Field(..., description="The user question.")
@@ -29,54 +219,145 @@ class SparkSQLResponse(BaseModel):
 
 
 class DynamicQuerySparkSQLTool(QuerySparkSQLTool):
-    """Dynamic variant of QuerySparkSQLTool with auto-refreshing SparkSession."""
+    """
+    Dynamic variant of QuerySparkSQLTool that runs on a leased pooled SparkSession.
+
+    Rows are fetched as a bounded Arrow result kept in QUERY_RESULTS; the agent only gets
+    a token budgeted markdown preview plus the result handle. Previews are served from
+    SQL_RESULT_CACHE while the tables they read are unchanged. Queries wait for a `spark`
+    slot of the scheduler, a busy warehouse is reported to the agent as an error.
+    """
+
+    def _run(self, query: str, **kwargs):
+        try:
+            with SCHEDULER.slot("spark"):
+                return run_query(query)
+        except Exception as e:
+            return f"Error: {e}"
+
+    async def _arun(self, query: str, **kwargs):
+        # The scheduler slot is awaited on the event loop, not on an executor thread.
+        try:
+            async with SCHEDULER.aslot("spark"):
+                return await run_blocking(run_query, query)
+        except Exception as e:
+            return f"Error: {e}"
+
+
+class RecentResultsSQLInput(BaseModel):
+    query: str = Field(..., description=f"DuckDB SQL over `{LAST_RESULT}` (the newest result) or `result_<handle>` tables, e.g. `SELECT * FROM {LAST_RESULT} ORDER BY n_name`.")
+
+
+class RecentResultsSQLTool(BaseTool):
+    """
+    Runs SQL over the conversation's recent query results in-process with RESULT_SQL, so
+    refinements of an earlier result (sort, filter, aggregate, top N) skip the warehouse.
+    """
+    name: str = "query_recent_results"
+    description: str = (
+        "Run a DuckDB SQL query over results already returned by `query_sql_db` in this conversation, "
+        f"without querying the warehouse. The newest result is the table `{LAST_RESULT}`, earlier ones are "
+        "`result_<handle>` (the handle shown under each result). Use it to sort, filter, aggregate or rank "
+        "rows you already have; query the warehouse when other columns or rows are needed."
+    )
+    args_schema: type[BaseModel] = RecentResultsSQLInput
 
     def _run(self, query: str, **kwargs):
-        _spark = get_spark_session_sync()
-        self.db = SparkSQL(spark_session=_spark, catalog=CATALOG, schema=SCHEMA)
-        return super()._run(query, **kwargs)
+        session = current_session()
+        try:
+            # Resolved before running: the answer becomes the session's new `last_result`.
+            sources = RESULT_SQL.sources(query, session)
+            result = RESULT_SQL.run(query, session)
+        except Exception as e:
+            available = RESULT_SQL.describe(session)
+            return f"Error: {e}" + (f"\n\nQueryable results:\n{available}" if available else "")
+        notes = [f"_Computed locally from {', '.join(f'`{source.handle}`' for source in sources) or 'earlier results'}, no warehouse query._"]
+        notes += [
+            f"_`{source.handle}` was cut at {source.num_rows} rows, so this only covers those rows; query the warehouse for complete results._"
+            for source in sources if source.truncated
+        ]
+        return "\n".join(notes) + f"\n\n{QUERY_RESULTS.preview(result)}"
+
+    async def _arun(self, query: str, **kwargs):
+        # DuckDB answers in milliseconds, no need for the bounded Spark executor.
+        return await asyncio.to_thread(self._run, query)
 
 
 class DynamicInfoSparkSQLTool(InfoSparkSQLTool):
-    """Dynamic variant of InfoSparkSQLTool."""
+    """Dynamic variant of InfoSparkSQLTool answering from CATALOG_SNAPSHOT when possible."""
 
     def _run(self, table_names: str, **kwargs):
-        _spark = get_spark_session_sync()
-        self.db = SparkSQL(spark_session=_spark, catalog=CATALOG, schema=SCHEMA)
-        return super()._run(table_names, **kwargs)
+        names = [name.strip() for name in table_names.split(",") if name.strip()]
+        if CATALOG_SNAPSHOT is not None:
+            info = CATALOG_SNAPSHOT.table_info(names, timeout=TOOLS_CFG.spark_pool_lease_timeout)
+            if info is not None:
+                return info
+        try:
+            return get_spark_pool().execute(lambda pooled: pooled.db.get_table_info(names))
+        except Exception as e:
+            return f"Error: {e}"
+
+    async def _arun(self, table_names: str, **kwargs):
+        return await run_blocking(self._run, table_names)
 
 
 class DynamicListSparkSQLTool(ListSparkSQLTool):
-    """Dynamic variant of ListSparkSQLTool."""
+    """Dynamic variant of ListSparkSQLTool answering from CATALOG_SNAPSHOT when possible."""
 
     def _run(self, tool_input: str = "", **kwargs):
-        _spark = get_spark_session_sync()
-        self.db = SparkSQL(spark_session=_spark, catalog=CATALOG, schema=SCHEMA)
-        return super()._run(tool_input, **kwargs)
+        if CATALOG_SNAPSHOT is not None:
+            names = CATALOG_SNAPSHOT.table_names(timeout=TOOLS_CFG.spark_pool_lease_timeout)
+            if names is not None:
+                return ", ".join(names)
+        return get_spark_pool().execute(lambda pooled: ", ".join(pooled.db.get_usable_table_names()))
+
+    async def _arun(self, tool_input: str = "", **kwargs):
+        return await run_blocking(self._run, tool_input)
 
 
 class DynamicQueryCheckerTool(QueryCheckerTool):
-    """Dynamic variant of QueryCheckerTool."""
+    """
+    Dynamic variant of QueryCheckerTool validating queries with SQL_VALIDATOR.
 
-    def _run(self, query: str, **kwargs):
-        _spark = get_spark_session_sync()
-        self.db = SparkSQL(spark_session=_spark, catalog=CATALOG, schema=SCHEMA)
-        return super()._run(query, **kwargs)
+    Syntax, table and column names and an `EXPLAIN` are checked without an LLM call; the
+    LLM check (natively async through `_arun`) only runs when neither the catalog snapshot
+    nor the warehouse could be consulted.
+    """
 
-    async def _arun(self, query: str, **kwargs):
-        _spark = get_spark_session_sync()
-        self.db = SparkSQL(spark_session=_spark, catalog=CATALOG, schema=SCHEMA)
-        return await super()._arun(query, **kwargs)
+    def _validate(self, query: str) -> str | None:
+        result = SQL_VALIDATOR.validate(query) if SQL_VALIDATOR is not None else None
+        if result is None:
+            return None
+        record_timing("sql_validator", "valid" if result.ok else "invalid", result.seconds, checks=result.checks)
+        return result.render()
+
+    def _run(self, query: str, run_manager=None, **kwargs):
+        checked = self._validate(query)
+        if checked is not None:
+            return checked
+        return super()._run(query, run_manager=run_manager)
+
+    async def _arun(self, query: str, run_manager=None, **kwargs):
+        checked = await run_blocking(self._validate, query)
+        if checked is not None:
+            return checked
+        return await super()._arun(query, run_manager=run_manager)
 
 
 def get_spark_sql_tools(llm_model: BaseLanguageModel) -> List[BaseTool]:
     """Initiate all Dynamic Spark SQL tools and return them in a list"""
-    spark = get_spark_session_sync()
-    spark_sql = SparkSQL(spark_session=spark, catalog=CATALOG, schema=SCHEMA)
+    if CATALOG_SNAPSHOT is not None:
+        CATALOG_SNAPSHOT.start()
+
+    with get_spark_pool().lease() as pooled:
+        spark_sql = pooled.db
 
     query_spark_tool = DynamicQuerySparkSQLTool(db=spark_sql)
     info_spark_tool = DynamicInfoSparkSQLTool(db=spark_sql)
     list_spark_tool = DynamicListSparkSQLTool(db=spark_sql)
     check_spark_tool = DynamicQueryCheckerTool(db=spark_sql, llm=llm_model)
     
-    return [query_spark_tool, info_spark_tool, list_spark_tool, check_spark_tool]
+    tools = [query_spark_tool, info_spark_tool, list_spark_tool, check_spark_tool]
+    if RESULT_SQL is not None:
+        tools.append(RecentResultsSQLTool())
+    return tools
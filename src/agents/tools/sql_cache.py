@@ -0,0 +1,171 @@
+from typing import Callable, Dict, List, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
+import threading
+import hashlib
+import time
+
+from .sql_parsing import normalize_sql, referenced_tables, is_read_only, is_deterministic
+
+
+@dataclass
+class CachedResult:
+    result: str
+    table_versions: Dict[str, str]
+    created_at: float
+    size: int
+
+
+class SQLResultCache:
+    """
+    LRU cache of Spark SQL query results keyed by normalized SQL text.
+
+    Every entry remembers the Delta version of each table the query read. A lookup only
+    hits when all those versions are unchanged, and a changed version drops every cached
+    entry that references that table. Entries also expire after `ttl` seconds and the
+    cache is bounded by both `max_entries` and `max_bytes`.
+
+    Table versions are fetched through `version_lookup`, a callable taking a list of fully
+    qualified table names (and an optional `timeout` keyword) and returning {table: version}. Lookups are memoized for
+    `version_check_interval` seconds so a burst of queries costs a single metadata call.
+    """
+
+    def __init__(
+        self,
+        version_lookup: Callable[[List[str]], Dict[str, str]],
+        catalog: str | None = None,
+        schema: str | None = None,
+        ttl: float = 900.0,
+        max_entries: int = 256,
+        max_bytes: int = 32 * 1024 * 1024,
+        version_check_interval: float = 30.0,
+    ) -> None:
+        self.version_lookup = version_lookup
+        self.catalog = catalog
+        self.schema = schema
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version_check_interval = version_check_interval
+
+        self._entries: "OrderedDict[str, CachedResult]" = OrderedDict()
+        self._versions: Dict[str, Tuple[str, float]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "bypassed": 0, "version_errors": 0, "evictions": 0, "invalidations": 0, "bytes_saved": 0}
+
+    @staticmethod
+    def make_key(query: str) -> str:
+        return hashlib.sha256(normalize_sql(query).encode()).hexdigest()
+
+    def table_versions(self, tables: List[str], timeout: float | None = None) -> Dict[str, str]:
+        """
+        Current version of each table, memoized for `version_check_interval` seconds.
+        `timeout` bounds the lookup of the versions that are not memoized.
+        """
+        now = time.monotonic()
+        with self._lock:
+            fresh = {t: v for t, (v, seen) in self._versions.items() if t in tables and now - seen < self.version_check_interval}
+        missing = [t for t in tables if t not in fresh]
+        if missing:
+            looked_up = self.version_lookup(missing) if timeout is None else self.version_lookup(missing, timeout=timeout)
+            with self._lock:
+                for table in missing:
+                    version = str(looked_up.get(table, ""))
+                    self._versions[table] = (version, now)
+                    fresh[table] = version
+        return fresh
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _invalidate_stale(self, current: Dict[str, str]) -> None:
+        stale = [
+            key for key, entry in self._entries.items()
+            if any(table in current and current[table] != version for table, version in entry.table_versions.items())
+        ]
+        for key in stale:
+            self._drop(key)
+        self._counters["invalidations"] += len(stale)
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)))
+            self._counters["evictions"] += 1
+
+    def get_or_run(self, query: str, run: Callable[[], str], timeout: float | None = None) -> str:
+        """
+        Returns the cached result of `query` if still valid, otherwise calls `run` and caches it.
+        `timeout` bounds the table version check; when the check fails or times out the query
+        runs uncached.
+        """
+        if not (is_read_only(query) and is_deterministic(query)):
+            with self._lock:
+                self._counters["bypassed"] += 1
+            return run()
+
+        key = self.make_key(query)
+        tables = referenced_tables(query, self.catalog, self.schema)
+        try:
+            current = self.table_versions(tables, timeout) if tables else {}
+        except Exception:
+            with self._lock:
+                self._counters["version_errors"] += 1
+            return run()
+
+        with self._lock:
+            self._invalidate_stale(current)
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created_at > self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                self._counters["bytes_saved"] += entry.size
+                return entry.result
+            self._counters["misses"] += 1
+
+        result = run()
+        size = len(result.encode())
+        if size > self.max_bytes:
+            return result
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = CachedResult(result=result, table_versions=current, created_at=time.monotonic(), size=size)
+            self._bytes += size
+            self._evict()
+        return result
+
+    def discard(self, query: str) -> None:
+        """Drops the entry of `query`, if any."""
+        key = self.make_key(query)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def invalidate(self, table: str | None = None) -> None:
+        """Drops every entry, or only the entries reading `table`."""
+        with self._lock:
+            keys = [k for k, e in self._entries.items() if table is None or table in e.table_versions]
+            for key in keys:
+                self._drop(key)
+            self._counters["invalidations"] += len(keys)
+            if table is None:
+                self._versions.clear()
+            else:
+                self._versions.pop(table, None)
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters, hit ratio, bytes saved and current size."""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_ratio": self._counters["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
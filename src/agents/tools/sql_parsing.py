@@ -0,0 +1,187 @@
+from typing import List, NamedTuple
+import re
+
+
+_TOKEN_RE = re.compile(
+    r"""
+      (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.)*")
+    | (?P<quoted>`(?:[^`]|``)*`)
+    | (?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?[lLdD]?)
+    | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+    | (?P<op><=>|<>|!=|<=|>=|==|\|\||::|\S)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Words that can follow a table reference and therefore are never table aliases.
+_CLAUSE_KEYWORDS = {
+    "where", "join", "inner", "left", "right", "full", "outer", "cross", "semi", "anti",
+    "natural", "on", "using", "group", "order", "sort", "cluster", "distribute", "having",
+    "limit", "offset", "union", "intersect", "except", "minus", "window", "lateral",
+    "tablesample", "pivot", "unpivot", "qualify", "as", "select", "from", "with",
+}
+
+NON_DETERMINISTIC_FUNCTIONS = {
+    "rand", "randn", "random", "uuid", "now", "current_timestamp", "current_date", "current_user",
+    "localtimestamp", "unix_timestamp", "shuffle", "monotonically_increasing_id",
+}
+# Also valid without parentheses (`o_orderdate > current_date - INTERVAL 30 DAYS`).
+NON_DETERMINISTIC_KEYWORDS = {"current_date", "current_timestamp", "current_user", "localtimestamp", "now"}
+
+
+class SQLToken(NamedTuple):
+    kind: str
+    text: str
+
+
+def tokenize_sql(query: str) -> List[SQLToken]:
+    """Splits a Spark SQL statement into tokens, dropping comments and whitespace."""
+    tokens = []
+    for match in _TOKEN_RE.finditer(query):
+        kind = match.lastgroup
+        if kind == "comment":
+            continue
+        text = match.group()
+        if kind in ("word", "quoted"):
+            # Spark SQL identifiers and keywords are case insensitive.
+            text = text.lower()
+        tokens.append(SQLToken(kind, text))
+    return tokens
+
+
+def _is_literal(token: SQLToken) -> bool:
+    return token.kind in ("string", "number") or (token.kind == "word" and token.text in ("null", "true", "false"))
+
+
+def _sort_in_lists(tokens: List[SQLToken]) -> List[SQLToken]:
+    """Sorts literal-only `IN (...)` lists so that `IN (2, 1)` and `IN (1, 2)` normalize alike."""
+    out: List[SQLToken] = []
+    i = 0
+    while i < len(tokens):
+        out.append(tokens[i])
+        if tokens[i] == ("word", "in") and i + 1 < len(tokens) and tokens[i + 1].text == "(":
+            items = []
+            j = i + 2
+            while j < len(tokens) and _is_literal(tokens[j]):
+                items.append(tokens[j])
+                j += 1
+                if j < len(tokens) and tokens[j].text == ",":
+                    j += 1
+                    continue
+                break
+            if items and j < len(tokens) and tokens[j].text == ")":
+                out.append(tokens[i + 1])
+                for k, item in enumerate(sorted(set(items), key=lambda t: (t.kind, t.text))):
+                    if k:
+                        out.append(SQLToken("op", ","))
+                    out.append(item)
+                out.append(tokens[j])
+                i = j + 1
+                continue
+        i += 1
+    return out
+
+
+def normalize_sql(query: str) -> str:
+    """
+    Canonical text of a query for cache keys: comments and redundant whitespace removed,
+    identifiers and keywords lower-cased, trailing semicolons dropped and literal `IN`
+    lists sorted. String literals keep their original case.
+    """
+    tokens = tokenize_sql(query)
+    while tokens and tokens[-1].text == ";":
+        tokens.pop()
+    return " ".join(token.text for token in _sort_in_lists(tokens))
+
+
+def is_read_only(query: str) -> bool:
+    """True for a single SELECT/WITH/VALUES statement, possibly parenthesized."""
+    tokens = tokenize_sql(query)
+    while tokens and tokens[-1].text == ";":
+        tokens.pop()
+    if not tokens or any(token.text == ";" for token in tokens):
+        return False
+    first = next((token for token in tokens if token.text != "("), None)
+    return first is not None and first.kind == "word" and first.text in ("select", "with", "values")
+
+
+def is_deterministic(query: str) -> bool:
+    """False when the query calls functions (or reads keywords) whose result changes between runs."""
+    tokens = tokenize_sql(query)
+    for i, token in enumerate(tokens):
+        if token.kind != "word" or (i and tokens[i - 1].text == "."):
+            continue
+        called = i + 1 < len(tokens) and tokens[i + 1].text == "("
+        if token.text in (NON_DETERMINISTIC_FUNCTIONS if called else NON_DETERMINISTIC_KEYWORDS):
+            return False
+    return True
+
+
+def _cte_names(tokens: List[SQLToken]) -> set:
+    names = set()
+    for i in range(len(tokens) - 2):
+        if tokens[i].kind in ("word", "quoted") and tokens[i + 1] == ("word", "as") and tokens[i + 2].text == "(":
+            names.add(tokens[i].text.strip("`"))
+    return names
+
+
+def _read_name(tokens: List[SQLToken], i: int) -> tuple:
+    """Reads a dotted identifier starting at `i`, returns (name, next index)."""
+    parts = []
+    while i < len(tokens) and tokens[i].kind in ("word", "quoted"):
+        parts.append(tokens[i].text.strip("`"))
+        if i + 1 < len(tokens) and tokens[i + 1].text == ".":
+            i += 2
+            continue
+        i += 1
+        break
+    return ".".join(parts), i
+
+
+def referenced_tables(query: str, catalog: str | None = None, schema: str | None = None) -> List[str]:
+    """
+    Best effort list of the tables a query reads from, in order of appearance.
+
+    Unqualified names are qualified with `catalog`/`schema` when given; CTE names and
+    sub-queries are skipped.
+    """
+    tokens = tokenize_sql(query)
+    ctes = _cte_names(tokens)
+    tables: List[str] = []
+
+    # One entry per open parenthesis: True when it encloses a query rather than an
+    # expression, so that `EXTRACT(YEAR FROM o_orderdate)` is not read as a table.
+    in_query = [True]
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token.text == "(":
+            nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+            in_query.append(nxt is not None and nxt.kind == "word" and nxt.text in ("select", "with"))
+        elif token.text == ")" and len(in_query) > 1:
+            in_query.pop()
+        elif token.kind == "word" and token.text in ("from", "join") and in_query[-1]:
+            i += 1
+            while i < len(tokens) and tokens[i].kind in ("word", "quoted") and tokens[i].text not in _CLAUSE_KEYWORDS:
+                name, i = _read_name(tokens, i)
+                if name not in ctes:
+                    parts = name.split(".")
+                    if len(parts) == 1 and catalog and schema:
+                        name = f"{catalog}.{schema}.{name}".lower()
+                    elif len(parts) == 2 and catalog:
+                        name = f"{catalog}.{name}".lower()
+                    if name not in tables:
+                        tables.append(name)
+                # Skip an optional alias, then continue through comma separated FROM lists.
+                if i < len(tokens) and tokens[i] == ("word", "as"):
+                    i += 1
+                if i < len(tokens) and tokens[i].kind in ("word", "quoted") and tokens[i].text not in _CLAUSE_KEYWORDS:
+                    i += 1
+                if i < len(tokens) and tokens[i].text == ",":
+                    i += 1
+                    continue
+                break
+            continue
+        i += 1
+    return tables
@@ -0,0 +1,206 @@
+from pyspark.errors import AnalysisException
+
+from typing import Callable, Dict, List, Set
+from dataclasses import dataclass, field
+import difflib
+import time
+import re
+
+try:
+    import sqlglot
+    from sqlglot import exp
+except ImportError:
+    sqlglot = None
+
+_READ_ONLY_RE = re.compile(r"^\s*(\(\s*)*(select|with|show|describe|desc|explain|values)\b", re.IGNORECASE)
+_TABLE_REF_RE = re.compile(r"\b(?:from|join)\s+([`\w]+(?:\s*\.\s*[`\w]+){0,2})", re.IGNORECASE)
+_EXPLAIN_ERROR = "Error occurred during query planning"
+
+
+@dataclass(slots=True)
+class ValidationIssue:
+    kind: str
+    message: str
+    suggestions: List[str] = field(default_factory=list)
+
+    def render(self) -> str:
+        hint = f" Did you mean: {', '.join(f'`{s}`' for s in self.suggestions)}?" if self.suggestions else ""
+        return f"- [{self.kind}] {self.message}{hint}"
+
+
+@dataclass(slots=True)
+class ValidationResult:
+    """Outcome of `SQLValidator.validate`: the issues found and the checks that ran."""
+    issues: List[ValidationIssue]
+    checks: List[str]
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.issues
+
+    def render(self) -> str:
+        checks = ", ".join(self.checks)
+        if self.ok:
+            return f"The query is valid (checked: {checks}). Execute it with `query_sql_db`."
+        issues = "\n".join(issue.render() for issue in self.issues)
+        return f"The query is invalid (checked: {checks}), fix these issues and check it again:\n{issues}"
+
+
+def _first_lines(message: str, max_chars: int = 600) -> str:
+    """The error itself, without the JVM stack trace / query context."""
+    lines = []
+    for line in message.strip().splitlines():
+        if line.lstrip().startswith(("at ", "JVM stacktrace", "== SQL")):
+            break
+        lines.append(line.strip())
+    return " ".join(lines)[:max_chars]
+
+
+def _suggest(name: str, candidates: List[str]) -> List[str]:
+    return difflib.get_close_matches(name.lower(), candidates, n=3, cutoff=0.6)
+
+
+class SQLValidator:
+    """
+    Checks a Spark SQL query without an LLM.
+
+    1. parse: one read-only statement, parsed in the Databricks dialect (needs `sqlglot`);
+    2. catalog: table and column names resolved against the cached catalog metadata
+       (`tables()` returns {table: [columns]}, None while it is not loaded);
+    3. explain: `EXPLAIN <query>` through `explain`, which returns the plan text; Spark
+       analyzes the query there without running it.
+
+    `validate` returns None when neither the catalog nor EXPLAIN could be consulted, so
+    the caller can fall back to the LLM checker.
+    """
+
+    def __init__(
+        self,
+        catalog: str,
+        schema: str,
+        tables: Callable[[], Dict[str, List[str]] | None],
+        explain: Callable[[str], str] | None = None,
+        dialect: str = "databricks",
+    ) -> None:
+        self.catalog = catalog.lower()
+        self.schema = schema.lower()
+        self.tables = tables
+        self.explain = explain
+        self.dialect = dialect
+
+    def validate(self, query: str) -> ValidationResult | None:
+        started = time.perf_counter()
+        query = query.strip().rstrip(";").strip()
+        issues: List[ValidationIssue] = []
+        checks: List[str] = []
+
+        if not _READ_ONLY_RE.match(query):
+            issues.append(ValidationIssue("read_only", "Only read-only SELECT / WITH / SHOW / DESCRIBE queries can be executed."))
+            return ValidationResult(issues, ["statement"], time.perf_counter() - started)
+
+        tree = None
+        if sqlglot is not None:
+            checks.append("parse")
+            try:
+                statements = [s for s in sqlglot.parse(query, read=self.dialect) if s is not None]
+            except sqlglot.errors.ParseError as e:
+                error = e.errors[0] if e.errors else {}
+                where = f" (line {error.get('line')}, column {error.get('col')})" if error.get("line") else ""
+                issues.append(ValidationIssue("syntax", f"{error.get('description', str(e))}{where}."))
+                return ValidationResult(issues, checks, time.perf_counter() - started)
+            if len(statements) != 1:
+                issues.append(ValidationIssue("syntax", "Pass exactly one SQL statement."))
+                return ValidationResult(issues, checks, time.perf_counter() - started)
+            tree = statements[0]
+
+        tables = self.tables()
+        if tables is not None:
+            checks.append("catalog")
+            issues += self._resolve(query, tree, tables)
+            if issues:
+                # Wrong names are cheaper to report than to send to the warehouse.
+                return ValidationResult(issues, checks, time.perf_counter() - started)
+
+        if self.explain is not None:
+            try:
+                plan = self.explain(query)
+            except AnalysisException as e:
+                # Also covers ParseException; the query is wrong, not the warehouse.
+                checks.append("explain")
+                issues.append(ValidationIssue("analysis", _first_lines(str(e))))
+            except Exception as e:
+                # A broken session or lease timeout only means EXPLAIN is unavailable.
+                print(f"EXPLAIN unavailable: {type(e).__name__}: {e}")
+            else:
+                checks.append("explain")
+                # Spark reports analysis errors of EXPLAIN in the plan text instead of raising.
+                if plan.lstrip().startswith(_EXPLAIN_ERROR):
+                    issues.append(ValidationIssue("analysis", _first_lines(plan.strip().split("\n", 1)[-1])))
+
+        if "catalog" not in checks and "explain" not in checks:
+            return None
+        return ValidationResult(issues, checks, time.perf_counter() - started)
+
+    def _check_table(self, parts: List[str], tables: Dict[str, List[str]]) -> ValidationIssue | None:
+        """`parts` is [catalog, schema, table] (shorter when not fully qualified)."""
+        name = ".".join(parts)
+        if len(parts) != 3:
+            return ValidationIssue("not_qualified", f"Table `{name}` must be fully qualified as `{self.catalog}.{self.schema}.<table>`.")
+        catalog, schema, table = (part.lower() for part in parts)
+        if (catalog, schema) != (self.catalog, self.schema):
+            return ValidationIssue("unknown_table", f"Table `{name}` is outside `{self.catalog}.{self.schema}`.", [f"{self.catalog}.{self.schema}.{table}"])
+        if table not in tables:
+            return ValidationIssue("unknown_table", f"Table `{name}` does not exist.", [f"{self.catalog}.{self.schema}.{t}" for t in _suggest(table, list(tables))])
+        return None
+
+    def _resolve(self, query: str, tree, tables: Dict[str, List[str]]) -> List[ValidationIssue]:
+        tables = {name.lower(): [c.lower() for c in columns] for name, columns in tables.items()}
+        if tree is None:
+            # No parser: only the FROM / JOIN table references are checked.
+            issues = []
+            for ref in _TABLE_REF_RE.findall(query):
+                parts = [p.strip().strip("`") for p in ref.split(".")]
+                issue = self._check_table(parts, tables)
+                if issue is not None and not (len(parts) == 1 and issue.kind == "not_qualified"):
+                    issues.append(issue)
+            return issues
+
+        issues: List[ValidationIssue] = []
+        ctes = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+        aliases: Dict[str, str] = {}
+        for table in tree.find_all(exp.Table):
+            if not table.name or (not table.db and table.name.lower() in ctes):
+                continue
+            parts = [p for p in (table.catalog, table.db, table.name) if p]
+            issue = self._check_table(parts, tables)
+            if issue is not None:
+                issues.append(issue)
+                continue
+            aliases[(table.alias or table.name).lower()] = table.name.lower()
+        if issues:
+            return issues
+
+        # Column checks only where they are unambiguous: qualified by a base table alias, or
+        # unqualified in a query reading base tables only (no CTEs / derived tables).
+        derived = bool(ctes) or tree.find(exp.Lateral) is not None or any(isinstance(s.this, exp.Subquery) for s in tree.find_all(exp.From, exp.Join))
+        output_names: Set[str] = {select.alias.lower() for select in tree.find_all(exp.Alias)}
+        reported: Set[str] = set()
+        for column in tree.find_all(exp.Column):
+            name = column.name.lower()
+            if not name or name in reported or isinstance(column.this, exp.Star) or column.find_ancestor(exp.Lambda):
+                continue
+            qualifier = column.table.lower()
+            if qualifier:
+                if qualifier not in aliases:
+                    continue
+                candidates = tables[aliases[qualifier]]
+            elif derived or name in output_names:
+                continue
+            else:
+                candidates = [c for source in set(aliases.values()) for c in tables[source]]
+            if candidates and name not in candidates:
+                reported.add(name)
+                where = f"table `{aliases[qualifier]}`" if qualifier else f"tables {sorted(set(aliases.values()))}"
+                issues.append(ValidationIssue("unknown_column", f"Column `{column.sql(dialect=self.dialect)}` does not exist in {where}.", _suggest(name, candidates)))
+        return issues
@@ -1,4 +1,33 @@
 from langchain_tavily.tavily_search import TavilySearch
+from langchain_core.tools import BaseTool
+from pyprojroot import here
+
+from typing import Any, Dict
+
+from ...utils.instrumentation import METRICS
+from ...utils.scheduler import SCHEDULER
+from ...load_config import get_tools_config
+from .web_search import BatchedWebSearch, SearchCache, create_web_search_tool
+
+TOOLS_CFG = get_tools_config()
+
+SEARCH_CACHE = SearchCache(
+    ttl=TOOLS_CFG.web_search_cache_ttl,
+    max_entries=TOOLS_CFG.web_search_cache_size,
+    path=here(TOOLS_CFG.web_search_disk_path) if TOOLS_CFG.web_search_disk_path else None,
+) if TOOLS_CFG.web_search_enabled else None
+
+
+class ScheduledTavilySearch(TavilySearch):
+    """TavilySearch whose calls wait for a `search` slot of the scheduler."""
+
+    def _run(self, query: str, **kwargs) -> Dict[str, Any]:
+        with SCHEDULER.slot("search"):
+            return super()._run(query, **kwargs)
+
+    async def _arun(self, query: str, **kwargs) -> Dict[str, Any]:
+        async with SCHEDULER.aslot("search"):
+            return await super()._arun(query, **kwargs)
 
 
 def load_tavily_search_tool(tavily_search_max_results: int):
@@ -13,4 +42,25 @@ def load_tavily_search_tool(tavily_search_max_results: int):
     Returns:
         TavilySearchResults: A configured instance of the Tavily search tool with the specified `max_results`.
     """
-    return TavilySearch(max_results=tavily_search_max_results)
+    return ScheduledTavilySearch(max_results=tavily_search_max_results)
+
+
+def load_web_search_tool(search_tool: BaseTool, shared_cache: bool = True) -> BaseTool:
+    """
+    Wraps a single-query search tool (Tavily or a stand-in) in the batched, cached and
+    deduplicating search layer of `web_search`; returns it unchanged when disabled.
+    Stand-ins pass `shared_cache=False` so their results never reach SEARCH_CACHE.
+    """
+    if not TOOLS_CFG.web_search_enabled:
+        return search_tool
+    search = BatchedWebSearch(
+        backend=search_tool,
+        cache=SEARCH_CACHE if shared_cache else SearchCache(ttl=TOOLS_CFG.web_search_cache_ttl, max_entries=TOOLS_CFG.web_search_cache_size),
+        max_queries=TOOLS_CFG.web_search_max_queries,
+        concurrency=TOOLS_CFG.web_search_concurrency,
+        digest_tokens=TOOLS_CFG.web_search_digest_tokens,
+        snippet_chars=TOOLS_CFG.web_search_snippet_chars,
+        near_duplicate_threshold=TOOLS_CFG.web_search_near_duplicate_threshold,
+    )
+    METRICS.register_stats("web_search", search.stats)
+    return create_web_search_tool(search, name=search_tool.name)
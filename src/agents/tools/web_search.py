@@ -0,0 +1,282 @@
+from langchain_core.tools import BaseTool, StructuredTool
+from pydantic import BaseModel, Field
+
+from typing import Any, Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from collections import OrderedDict
+from pathlib import Path
+import threading
+import asyncio
+import sqlite3
+import json
+import time
+import re
+
+from ...utils.instrumentation import record_timing
+from ...utils.tokens import estimate_tokens
+
+_WORD_RE = re.compile(r"[\w.+#-]+")
+_STOP_WORDS = frozenset("a an and are for in is of on or the to what which who with how does do".split())
+_TRACKING_PARAM_RE = re.compile(r"^(utm_\w+|ref|fbclid|gclid)=", re.IGNORECASE)
+# Never passed to the wrapped tool: backend calls are timed here, not as nested tool runs.
+_UNTRACED = {"callbacks": []}
+
+
+def normalize_query(query: str) -> str:
+    """
+    Cache / dedup key of a query: its lower case content words in order ("paris to london"
+    and "london to paris" stay different searches).
+    """
+    words = [w.strip(".-") for w in _WORD_RE.findall(query.lower())]
+    words = [w for w in words if w and w not in _STOP_WORDS]
+    return " ".join(words) or " ".join(query.lower().split())
+
+
+def canonical_url(url: str) -> str:
+    """URL without scheme, `www.`, fragment, tracking parameters and trailing slash."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    query = "&".join(p for p in parts.query.split("&") if p and not _TRACKING_PARAM_RE.match(p))
+    return f"{host}{parts.path.rstrip('/')}" + (f"?{query}" if query else "")
+
+
+def _shingles(text: str, size: int = 5) -> set:
+    words = _WORD_RE.findall(text.lower())
+    return {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+
+
+class SearchCache:
+    """
+    TTL cache of search results per normalized query: an in-memory LRU of `max_entries`
+    plus an optional SQLite tier at `path` shared by restarts (and users).
+    """
+
+    def __init__(self, ttl: float = 3600.0, max_entries: int = 512, path: str | Path | None = None) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._db = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS search_results (key TEXT PRIMARY KEY, created REAL, results TEXT)")
+            self._db.commit()
+
+    def get(self, key: str) -> List[Dict[str, Any]] | None:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return entry[1]
+            self._entries.pop(key, None)
+            row = self._db.execute("SELECT created, results FROM search_results WHERE key = ?", (key,)).fetchone() if self._db else None
+            if row is not None and now - row[0] <= self.ttl:
+                results = json.loads(row[1])
+                self._remember(key, row[0], results)
+                self._counters["disk_hits"] += 1
+                return results
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, key: str, results: List[Dict[str, Any]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, results)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO search_results VALUES (?, ?, ?)", (key, now, json.dumps(results)))
+                self._db.execute("DELETE FROM search_results WHERE created < ?", (now - self.ttl,))
+                self._db.commit()
+
+    def _remember(self, key: str, created: float, results: List[Dict[str, Any]]) -> None:
+        self._entries[key] = (created, results)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries)}
+
+
+class BatchedWebSearch:
+    """
+    Search layer in front of a single-query search tool (`TavilySearch`, or the offline
+    fake of `src.benchmark`) taking `{"query": ...}` and returning Tavily shaped results.
+
+    A batch of queries is normalized and deduplicated, answered from `cache` where possible
+    and the rest searched concurrently (`concurrency` at a time). Results of all queries
+    are merged: the same page (canonical URL) or near-identical content (shingle overlap
+    above `near_duplicate_threshold`) is kept once, best score first, and rendered as a
+    numbered digest within `digest_tokens`.
+    """
+
+    def __init__(
+        self,
+        backend: BaseTool,
+        cache: SearchCache | None = None,
+        max_queries: int = 5,
+        concurrency: int = 4,
+        digest_tokens: int = 1500,
+        snippet_chars: int = 500,
+        near_duplicate_threshold: float = 0.8,
+    ) -> None:
+        self.backend = backend
+        self.cache = cache
+        self.max_queries = max_queries
+        self.concurrency = max(1, concurrency)
+        self.digest_tokens = digest_tokens
+        self.snippet_chars = snippet_chars
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self._lock = threading.Lock()
+        self._counters = {"batches": 0, "queries": 0, "duplicate_queries": 0, "backend_calls": 0, "backend_errors": 0, "duplicate_results": 0}
+
+    def _count(self, **amounts: int) -> None:
+        with self._lock:
+            for key, amount in amounts.items():
+                self._counters[key] += amount
+
+    def _plan(self, queries: List[str]) -> Tuple[Dict[str, str], Dict[str, List[Dict[str, Any]]]]:
+        """({key: query} of the unique queries, {key: results} of those in the cache)."""
+        queries = [query.strip() for query in queries[:self.max_queries] if query.strip()]
+        unique: Dict[str, str] = {}
+        for query in queries:
+            unique.setdefault(normalize_query(query), query)
+        self._count(batches=1, queries=len(queries), duplicate_queries=len(queries) - len(unique))
+        cached = {}
+        if self.cache is not None:
+            cached = {key: results for key in unique if (results := self.cache.get(key)) is not None}
+        return unique, cached
+
+    def _parse(self, key: str, response: Any) -> List[Dict[str, Any]] | None:
+        if isinstance(response, str):
+            try:
+                response = json.loads(response)
+            except ValueError:
+                response = {"error": response}
+        if not isinstance(response, dict) or "error" in response:
+            # Counted in the stats and listed in the digest, the agent retries or rephrases.
+            self._count(backend_errors=1)
+            return None
+        results = [
+            {"title": r.get("title", ""), "url": r.get("url", ""), "content": r.get("content", ""), "score": float(r.get("score") or 0.0)}
+            for r in response.get("results", [])
+        ]
+        if self.cache is not None:
+            self.cache.put(key, results)
+        return results
+
+    def search(self, queries: List[str]) -> str:
+        started = time.perf_counter()
+        unique, found = self._plan(queries)
+        missing = {key: query for key, query in unique.items() if key not in found}
+        if missing:
+            self._count(backend_calls=len(missing))
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(missing)), thread_name_prefix="web-search") as pool:
+                responses = pool.map(self._call, missing.values())
+                found.update({key: self._parse(key, response) for key, response in zip(missing, responses)})
+        return self._digest(unique, found, started)
+
+    def _call(self, query: str) -> Any:
+        try:
+            return self.backend.invoke({"query": query}, _UNTRACED)
+        except Exception as e:
+            return {"error": e}
+
+    async def asearch(self, queries: List[str]) -> str:
+        started = time.perf_counter()
+        unique, found = self._plan(queries)
+        missing = {key: query for key, query in unique.items() if key not in found}
+        if missing:
+            self._count(backend_calls=len(missing))
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def call(query: str) -> Any:
+                async with semaphore:
+                    try:
+                        return await self.backend.ainvoke({"query": query}, _UNTRACED)
+                    except Exception as e:
+                        return {"error": e}
+
+            responses = await asyncio.gather(*(call(query) for query in missing.values()))
+            found.update({key: self._parse(key, response) for key, response in zip(missing, responses)})
+        return self._digest(unique, found, started)
+
+    def _merge(self, found: Dict[str, List[Dict[str, Any]] | None]) -> List[Dict[str, Any]]:
+        """All results best score first, without repeated pages or near-identical content."""
+        candidates = sorted((r for results in found.values() if results for r in results), key=lambda r: -r["score"])
+        kept: List[Dict[str, Any]] = []
+        seen_urls, seen_shingles = set(), []
+        for result in candidates:
+            url = canonical_url(result["url"])
+            shingles = _shingles(result["content"])
+            duplicate = url in seen_urls or any(
+                len(shingles & other) / max(min(len(shingles), len(other)), 1) >= self.near_duplicate_threshold
+                for other in seen_shingles
+            )
+            if duplicate:
+                self._count(duplicate_results=1)
+                continue
+            seen_urls.add(url)
+            seen_shingles.append(shingles)
+            kept.append(result)
+        return kept
+
+    def _digest(self, queries: Dict[str, str], found: Dict[str, List[Dict[str, Any]] | None], started: float) -> str:
+        results = self._merge(found)
+        failed = [queries[key] for key, value in found.items() if value is None]
+        lines = [f"Searched: {'; '.join(queries.values())}"]
+        if failed:
+            lines.append(f"Failed searches (retry once or rephrase): {'; '.join(failed)}")
+        budget = self.digest_tokens - estimate_tokens("\n".join(lines))
+        shown = 0
+        for result in results:
+            content = " ".join(result["content"].split())
+            snippet = content[:self.snippet_chars] + ("..." if len(content) > self.snippet_chars else "")
+            entry = f"[{shown + 1}] {result['title']} ({result['url']})\n{snippet}"
+            cost = estimate_tokens(entry) + 1
+            if cost > budget and shown:
+                break
+            budget -= cost
+            lines.append(entry)
+            shown += 1
+        if not results:
+            lines.append("No results.")
+        elif shown < len(results):
+            lines.append(f"({len(results) - shown} more results left out to stay within the token budget)")
+        record_timing("search", "batch", time.perf_counter() - started, queries=len(found), results=shown)
+        return "\n\n".join(lines)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counters = dict(self._counters)
+        return {**counters, **(self.cache.stats() if self.cache is not None else {})}
+
+
+class WebSearchInput(BaseModel):
+    queries: List[str] = Field(..., description="One or more search queries (different angles of the question), searched in parallel.")
+
+
+def create_web_search_tool(search: BatchedWebSearch, name: str = "tavily_search") -> BaseTool:
+    """Agent tool on `search`, keeps the wrapped tool's name so prompts and routing stay the same."""
+    def web_search(queries: List[str]) -> str:
+        return search.search(queries)
+
+    async def aweb_search(queries: List[str]) -> str:
+        return await search.asearch(queries)
+
+    return StructuredTool.from_function(
+        func=web_search,
+        coroutine=aweb_search,
+        name=name,
+        description=(
+            f"A search engine for current events and general web questions. Pass all the searches you need "
+            f"(up to {search.max_queries}) in one call, they run in parallel and repeated results are merged "
+            f"into one numbered list of sources."
+        ),
+        args_schema=WebSearchInput,
+    )
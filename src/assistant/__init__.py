@@ -1 +1,2 @@
-from .backend import ChatBot
\ No newline at end of file
+from .backend import ChatBot
+from .results import ResultBrowser
@@ -1,16 +1,50 @@
-from langchain_core.messages import AnyMessage, HumanMessage, AIMessage, ToolMessage
+from langchain_core.messages import HumanMessage, AIMessage, convert_to_messages
 
-from typing import List, Generator
+from typing import Dict, List, Generator, AsyncGenerator, Tuple
+import threading
+import uuid
+import time
 
+from .semantic_cache import SEMANTIC_CACHE, CachedAnswer
+from .streaming import StreamRenderer
+from .startup import GRAPH
+from ..agents.tools.result_sql import references_results
+from ..agents.tools.rag import CONTEXT_COMPRESSOR
+from ..agents.tools.spark_sql import SQL_RESULT_CACHE, CATALOG_SNAPSHOT, QUERY_RESULTS, SparkSQLResponse, run_query
 from ..agents.backend import pretty_print_messages
-from ..load_config import LoadToolsConfig
-from ..agents import build_graph
+from ..agents.history import COMPACTION_STATS
+from ..agents.fast_router import ROUTERS
+from ..utils.instrumentation import INSTRUMENTATION, METRICS, record_timing
+from ..utils.app_utils import get_spark_pool, run_blocking
+from ..utils.embedding_cache import get_embeddings
+from ..utils.llm_gateway import gateway_stats
+from ..utils.scheduler import SCHEDULER, BackendBusyError
+from ..load_config import get_tools_config
 
 
-TOOLS_CFG = LoadToolsConfig()
+TOOLS_CFG = get_tools_config()
+
+# Read at scrape time by the /metrics endpoint.
+METRICS.register_stats("spark_pool", lambda: get_spark_pool().stats())
+METRICS.register_stats("checkpointer", lambda: GRAPH.built.checkpointer.stats() if GRAPH.ready else {})
+METRICS.register_stats("history_compaction", COMPACTION_STATS.stats)
+METRICS.register_stats("fast_router", lambda: {name: router.stats() for name, router in ROUTERS.items() if router is not None})
+METRICS.register_stats("query_results", QUERY_RESULTS.stats)
+METRICS.register_stats("embedding_cache", lambda: getattr(get_embeddings(), "stats", dict)())
+METRICS.register_stats("llm_gateway", gateway_stats)
+METRICS.register_stats("scheduler", SCHEDULER.stats)
+for name, component in (("sql_result_cache", SQL_RESULT_CACHE), ("catalog_snapshot", CATALOG_SNAPSHOT), ("semantic_cache", SEMANTIC_CACHE), ("context_compression", CONTEXT_COMPRESSOR)):
+    if component is not None:
+        METRICS.register_stats(name, component.stats)
+
+
+def thread_config(session_id: str = "") -> dict:
+    """Graph config for one UI session, each browser session gets its own conversation thread."""
+    config = {"configurable": {"thread_id": session_id or TOOLS_CFG.thread_id}, "metadata": {"session_id": session_id}}
+    if INSTRUMENTATION is not None:
+        config["callbacks"] = [INSTRUMENTATION]
+    return config
 
-graph = build_graph()
-config = {"configurable": {"thread_id": TOOLS_CFG.thread_id}}
 
 class ChatBot:
     """
@@ -18,7 +52,7 @@ class ChatBot:
     The chatbot processes user messages, generates appropriate responses.
     """
     @staticmethod
-    def respond(chatbot: List, message: str) -> Generator:
+    def respond(chatbot: List, message: str, session_id: str = "") -> Generator:
         """
         Processes a user message using the agent graph, generates a response, and appends it to the chat history.
         The chat history is also saved to a memory file for future reference.
@@ -26,6 +60,7 @@ class ChatBot:
         Args:
             chatbot (List): A list representing the chatbot conversation history. Each entry is a tuple of the user message and the bot response.
             message (str): The user message to process.
+            session_id (str): The browser session id used as the graph thread id.
 
         Returns:
             Tuple: Returns an empty string (representing the new user input placeholder) and the updated conversation history.
@@ -34,28 +69,212 @@ class ChatBot:
             "role": "user",
             "content": message
         })
+        started = time.perf_counter()
+        graph = GRAPH.get()
 
-        events = graph.stream({"messages": [("user", message)]}, config=config, stream_mode=["messages", "updates"])#, print_mode="values")
+        # Follow ups in a running conversation depend on it: never answered from or added to the cache.
+        history = SEMANTIC_CACHE is not None and bool(graph.get_state(thread_config(session_id)).values.get("messages"))
+        cached = SEMANTIC_CACHE.lookup(message, history) if SEMANTIC_CACHE is not None else None
+        preview = None
+        if cached is not None and TOOLS_CFG.semantic_cache_rerun_sql:
+            try:
+                preview = run_query(cached.query)
+            except Exception:
+                # Warehouse errors and guard refusals: answer through the graph instead.
+                METRICS.inc("semantic_cache_rerun_errors")
+                cached = None
+        if cached is not None:
+            content = ChatBot._cached_content(cached, preview)
+            graph.update_state(thread_config(session_id), ChatBot._cached_update(message, content), as_node=TOOLS_CFG.spark_sql_agent_name)
+            chatbot.append({"role": "assistant", "content": content})
+            record_timing("request", "semantic_cache", time.perf_counter() - started)
+            yield "", chatbot
+            return
 
-        event: AnyMessage
-        for event in events:
-            if event[0] == "updates":
-                pretty_print_messages(event[1])
-            elif event[0] == "messages":
-                display = ""
-                response: AnyMessage = event[1][0]
-                if isinstance(response, AIMessage):
-                    display += f"*Agent: `{response.name}`*\n"
-                    text = response.content if response.content else response.additional_kwargs.get("reasoning_content", "")
-                    display += f"{text}\n"
-                elif isinstance(response, ToolMessage):
-                    display += f"*Tool: `{response.name}`*\n"
-                    text = response.content
-                    display += f"{text}\n"
-                
-                chatbot.append({
-                    "role": "assistant",
-                    "content": display
-                })
+        final_response = None
+        renderer = ChatBot._renderer(chatbot)
+        try:
+            with SCHEDULER.slot("request", session_id):
+                events = graph.stream({"messages": [("user", message)]}, config=thread_config(session_id), stream_mode=["messages", "updates"])#, print_mode="values")
+                for event in events:
+                    ChatBot._handle_event(renderer, event)
+                    final_response = ChatBot._final_sql_response(event) or final_response
+                    if renderer.frame_due():
+                        yield "", chatbot
+        except BackendBusyError as e:
+            renderer.flush()
+            chatbot.append({"role": "assistant", "content": ChatBot._busy_content(e)})
+            record_timing("request", "busy", time.perf_counter() - started)
+            yield "", chatbot
+            return
+        if renderer.flush():
+            yield "", chatbot
+        record_timing("request", "graph", time.perf_counter() - started)
 
+        # Answers over the session's own earlier results only make sense in that conversation.
+        if SEMANTIC_CACHE is not None and final_response is not None and not references_results(final_response["query"]):
+            SEMANTIC_CACHE.add(message, **final_response, history=history)
+
+    @staticmethod
+    async def arespond(chatbot: List, message: str, session_id: str = "") -> AsyncGenerator:
+        """
+        Async variant of `respond` streaming from `graph.astream`.
+
+        Tools and LLM calls run on their async paths, so a slow warehouse query or model call
+        awaits instead of holding a Gradio worker thread and concurrent sessions interleave.
+
+        Args:
+            chatbot (List): A list representing the chatbot conversation history.
+            message (str): The user message to process.
+            session_id (str): The browser session id used as the graph thread id.
+
+        Yields:
+            Tuple: An empty string (the new user input placeholder) and the updated conversation history.
+        """
+        chatbot.append({
+            "role": "user",
+            "content": message
+        })
+        started = time.perf_counter()
+        graph = await GRAPH.aget()
+
+        history = SEMANTIC_CACHE is not None and bool((await graph.aget_state(thread_config(session_id))).values.get("messages"))
+        cached = await SEMANTIC_CACHE.alookup(message, history) if SEMANTIC_CACHE is not None else None
+        preview = None
+        if cached is not None and TOOLS_CFG.semantic_cache_rerun_sql:
+            try:
+                preview = await run_blocking(run_query, cached.query)
+            except Exception:
+                METRICS.inc("semantic_cache_rerun_errors")
+                cached = None
+        if cached is not None:
+            content = ChatBot._cached_content(cached, preview)
+            await graph.aupdate_state(thread_config(session_id), ChatBot._cached_update(message, content), as_node=TOOLS_CFG.spark_sql_agent_name)
+            chatbot.append({"role": "assistant", "content": content})
+            record_timing("request", "semantic_cache", time.perf_counter() - started)
             yield "", chatbot
+            return
+
+        final_response = None
+        renderer = ChatBot._renderer(chatbot)
+        try:
+            async with SCHEDULER.aslot("request", session_id):
+                events = graph.astream({"messages": [("user", message)]}, config=thread_config(session_id), stream_mode=["messages", "updates"])
+                async for event in events:
+                    ChatBot._handle_event(renderer, event)
+                    final_response = ChatBot._final_sql_response(event) or final_response
+                    if renderer.frame_due():
+                        yield "", chatbot
+        except BackendBusyError as e:
+            renderer.flush()
+            chatbot.append({"role": "assistant", "content": ChatBot._busy_content(e)})
+            record_timing("request", "busy", time.perf_counter() - started)
+            yield "", chatbot
+            return
+        if renderer.flush():
+            yield "", chatbot
+        record_timing("request", "graph", time.perf_counter() - started)
+
+        # Answers over the session's own earlier results only make sense in that conversation.
+        if SEMANTIC_CACHE is not None and final_response is not None and not references_results(final_response["query"]):
+            await SEMANTIC_CACHE.aadd(message, **final_response, history=history)
+
+    @staticmethod
+    def restore_session(session_id: str) -> Tuple[str, List]:
+        """
+        Assigns a session id to a new browser session, or rebuilds the visible chat history of
+        a returning one from its checkpointed thread (also after an app restart). The page load
+        waits at most `startup.restore_timeout` seconds for the graph; while it is still being
+        built (or its build failed) the history starts empty, the thread itself is kept.
+
+        Args:
+            session_id (str): The session id kept in the browser, empty on first visit.
+
+        Returns:
+            Tuple: The session id and the restored conversation history.
+        """
+        if not session_id:
+            return uuid.uuid4().hex, []
+
+        try:
+            graph = GRAPH.built or GRAPH.get(timeout=TOOLS_CFG.startup_restore_timeout)
+        except (TimeoutError, RuntimeError):
+            return session_id, []
+        state = graph.get_state(thread_config(session_id))
+        chatbot = []
+        for message in state.values.get("messages", []):
+            if isinstance(message, HumanMessage):
+                chatbot.append({"role": "user", "content": message.content})
+            elif isinstance(message, AIMessage) and message.content:
+                chatbot.append({"role": "assistant", "content": f"*Agent: `{message.name}`*\n{message.content}\n"})
+        return session_id, chatbot
+
+    @staticmethod
+    def clear_session(session_id: str) -> str:
+        """
+        Deletes the session's conversation thread and returns a fresh session id. Before the
+        graph is built the thread is deleted in the background once it is.
+        """
+        if session_id:
+            graph = GRAPH.built
+            if graph is not None:
+                graph.checkpointer.delete_thread(session_id)
+            else:
+                threading.Thread(target=ChatBot._delete_thread_when_built, args=(session_id,), daemon=True).start()
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def _delete_thread_when_built(session_id: str) -> None:
+        try:
+            GRAPH.get().checkpointer.delete_thread(session_id)
+        except RuntimeError:
+            # A failed build has no threads to delete, persisted ones expire after `idle_ttl`.
+            pass
+
+    @staticmethod
+    def _cached_content(cached: CachedAnswer, preview: str | None = None) -> str:
+        """Chat bubble replaying a semantic cache hit, optionally with freshly re-run rows."""
+        content = f"*Agent: `semantic_cache`*\n{cached.response}\n\n```sql\n{cached.query}\n```\n"
+        if preview is not None:
+            content += f"\n{preview}\n"
+        return content
+
+    @staticmethod
+    def _busy_content(error: BackendBusyError) -> str:
+        """Immediate reply when admission control turns the request (or one of its backend calls) away."""
+        return f"*Agent: `scheduler`*\nThe assistant is busy right now ({error.reason} on {error.backend}), please retry in a few seconds.\n"
+
+    @staticmethod
+    def _cached_update(message: str, content: str) -> dict:
+        """Writes a cached turn to the thread, so the agents and `restore_session` still see it."""
+        return {"messages": [HumanMessage(message), AIMessage(content.split("\n", 1)[1], name="semantic_cache")]}
+
+    @staticmethod
+    def _final_sql_response(event: tuple) -> Dict[str, str] | None:
+        """The `SparkSQLResponse` arguments (query + response) of an agent update, if any."""
+        if event[0] != "updates" or not isinstance(event[1], dict):
+            return None
+        for node_update in event[1].values():
+            if not isinstance(node_update, dict):
+                continue
+            for message in convert_to_messages(node_update.get("messages", [])):
+                if not isinstance(message, AIMessage):
+                    continue
+                for tool_call in message.tool_calls:
+                    if tool_call["name"] == SparkSQLResponse.__name__:
+                        return {"query": tool_call["args"]["query"], "response": tool_call["args"]["response"]}
+        return None
+
+    @staticmethod
+    def _renderer(chatbot: List) -> StreamRenderer:
+        frame_rate = TOOLS_CFG.streaming_frame_rate
+        return StreamRenderer(chatbot, frame_interval=1 / frame_rate if frame_rate > 0 else 0.0)
+
+    @staticmethod
+    def _handle_event(renderer: StreamRenderer, event: tuple) -> None:
+        """Merges streamed agent/tool messages into the chat history, node updates are only printed when verbose."""
+        if event[0] == "updates":
+            if TOOLS_CFG.instrumentation_verbose:
+                pretty_print_messages(event[1])
+        else:
+            renderer.add(event)
@@ -0,0 +1,50 @@
+import pandas as pd
+
+from typing import Tuple
+
+from ..agents.tools.spark_sql import QUERY_RESULTS
+
+
+class ResultBrowser:
+    """
+    Gradio callbacks to page through or download a stored query result by its handle,
+    without re-running the query on the warehouse.
+    """
+    @staticmethod
+    def show(handle: str, page: int) -> Tuple[pd.DataFrame, int, str]:
+        """
+        Loads one page of a stored result.
+
+        Args:
+            handle (str): The result handle printed under the query preview.
+            page (int): The 0 based page number.
+
+        Returns:
+            Tuple: The page as a DataFrame, the (clamped) page number and a status line.
+        """
+        result = QUERY_RESULTS.get(handle or "")
+        if result is None:
+            return pd.DataFrame(), 0, f"Result handle '{handle}' not found or expired, re-run the query."
+
+        page_size = QUERY_RESULTS.page_size
+        last_page = max((result.num_rows - 1) // page_size, 0)
+        page = min(max(int(page or 0), 0), last_page)
+        rows = QUERY_RESULTS.page(result.handle, page).to_pandas()
+        total = f"{result.num_rows}+ (truncated)" if result.truncated else str(result.num_rows)
+        return rows, page, f"Page {page + 1}/{last_page + 1} of {total} rows for `{result.query}`"
+
+    @staticmethod
+    def next_page(handle: str, page: int) -> Tuple[pd.DataFrame, int, str]:
+        return ResultBrowser.show(handle, int(page or 0) + 1)
+
+    @staticmethod
+    def previous_page(handle: str, page: int) -> Tuple[pd.DataFrame, int, str]:
+        return ResultBrowser.show(handle, int(page or 0) - 1)
+
+    @staticmethod
+    def download(handle: str) -> str | None:
+        """Writes the full stored result to a CSV file and returns its path."""
+        try:
+            return QUERY_RESULTS.to_csv(handle or "")
+        except KeyError:
+            return None
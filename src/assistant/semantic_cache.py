@@ -0,0 +1,267 @@
+from langchain_core.embeddings import Embeddings
+import numpy as np
+
+from typing import Callable, Dict, List
+from dataclasses import dataclass, field
+import threading
+import time
+import re
+
+from ..agents.tools.spark_sql import SQL_RESULT_CACHE, CATALOG, SCHEMA, get_table_versions
+from ..agents.tools.sql_parsing import referenced_tables, is_read_only, is_deterministic
+from ..agents.fast_router import is_follow_up
+from ..utils.embedding_cache import get_embeddings
+from ..utils.app_utils import run_blocking
+from ..load_config import get_tools_config
+
+TOOLS_CFG = get_tools_config()
+
+_QUOTED_RE = re.compile(r"'([^']+)'|\"([^\"]+)\"")
+_NUMBER_RE = re.compile(r"\d+(?:[.,:/-]\d+)*")
+_WORD_RE = re.compile(r"[A-Za-z][\w#&-]*")
+_SENTENCE_END_RE = re.compile(r"(^|[.!?])\s*$")
+# Capitalized only because they open the question, not names.
+_STARTERS = frozenset(
+    "what which who whom whose when where why how is are was were do does did can could should would will "
+    "show list give find get tell compare count calculate compute display return the a an in for of i".split()
+)
+
+
+def question_literals(question: str) -> frozenset:
+    """
+    Literal values of a question: quoted strings, numbers and dates, and capitalized names.
+    Two questions only share a cached answer when these match (1995 is not 1996).
+    """
+    literals = {next(g for g in m.groups() if g).strip().lower() for m in _QUOTED_RE.finditer(question)}
+    unquoted = _QUOTED_RE.sub(" ", question)
+    literals.update(_NUMBER_RE.findall(unquoted))
+    for match in _WORD_RE.finditer(unquoted):
+        word = match.group()
+        if not word[0].isupper():
+            continue
+        if _SENTENCE_END_RE.search(unquoted[:match.start()]) and word.lower() in _STARTERS:
+            continue
+        literals.add(word.lower())
+    return frozenset(literals)
+
+
+@dataclass(eq=False)
+class CachedAnswer:
+    """A final `SparkSQLResponse` (query + answer) with the table versions it was computed on."""
+    question: str
+    query: str
+    response: str
+    table_versions: Dict[str, str]
+    literals: frozenset = frozenset()
+    created_at: float = field(default_factory=time.monotonic)
+    last_hit: float = field(default_factory=time.monotonic)
+    hits: int = 0
+
+
+class SemanticAnswerCache:
+    """
+    Cache of final Spark SQL answers looked up by question similarity.
+
+    Questions are embedded into an in-memory matrix of normalized vectors; a new question
+    hits when its cosine similarity to a cached one reaches `threshold` and both contain the
+    same literal values (`question_literals`), so paraphrases of the same question skip the
+    router, the ReAct loop and the warehouse, but "revenue in 1995" never replays 1996. An entry is
+    dropped once one of the tables its query reads has a new Delta version, after `ttl`
+    seconds, or when `max_entries` is exceeded (least recently hit first).
+
+    Questions whose meaning depends on the conversation are never looked up or cached:
+    any question asked in a thread that already has earlier turns (`history`), follow ups
+    ("now sort that by nation", see `fast_router.is_follow_up`) and questions under
+    `min_words` words.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        version_lookup: Callable[[List[str]], Dict[str, str]],
+        catalog: str | None = None,
+        schema: str | None = None,
+        threshold: float = 0.93,
+        ttl: float = 86400.0,
+        max_entries: int = 1024,
+        min_words: int = 4,
+    ) -> None:
+        self.embeddings = embeddings
+        self.version_lookup = version_lookup
+        self.catalog = catalog
+        self.schema = schema
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.min_words = min_words
+
+        self._entries: List[CachedAnswer] = []
+        self._vectors: np.ndarray | None = None
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "skipped": 0, "added": 0, "evictions": 0, "invalidations": 0, "literal_mismatches": 0}
+
+    def cacheable(self, question: str, history: bool = False) -> bool:
+        return not history and not is_follow_up(question, self.min_words)
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, indices: List[int]) -> None:
+        drop = set(indices)
+        keep = [i for i in range(len(self._entries)) if i not in drop]
+        self._entries = [self._entries[i] for i in keep]
+        self._vectors = self._vectors[keep] if keep else None
+
+    def _match(self, vector: np.ndarray, literals: frozenset) -> CachedAnswer | None:
+        """
+        Most similar live entry above the threshold with the same literals, expired entries
+        are dropped on the way.
+        """
+        with self._lock:
+            now = time.monotonic()
+            expired = [i for i, entry in enumerate(self._entries) if now - entry.created_at > self.ttl]
+            if expired:
+                self._remove(expired)
+                self._counters["evictions"] += len(expired)
+            if self._vectors is None:
+                return None
+            similarity = self._vectors @ vector
+            for i in np.argsort(-similarity):
+                if similarity[i] < self.threshold:
+                    break
+                if self._entries[i].literals == literals:
+                    return self._entries[i]
+                self._counters["literal_mismatches"] += 1
+            return None
+
+    def _is_fresh(self, entry: CachedAnswer) -> bool:
+        """False (and the entry dropped) when a table read by its query has changed."""
+        if not entry.table_versions:
+            return True
+        current = self.version_lookup(list(entry.table_versions))
+        if all(current.get(table, version) == version for table, version in entry.table_versions.items()):
+            return True
+        with self._lock:
+            if entry in self._entries:
+                self._remove([self._entries.index(entry)])
+                self._counters["invalidations"] += 1
+        return False
+
+    def _record_lookup(self, entry: CachedAnswer | None) -> CachedAnswer | None:
+        with self._lock:
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            entry.hits += 1
+            entry.last_hit = time.monotonic()
+            self._counters["hits"] += 1
+        return entry
+
+    def _skip(self) -> None:
+        with self._lock:
+            self._counters["skipped"] += 1
+
+    def lookup(self, question: str, history: bool = False) -> CachedAnswer | None:
+        """
+        Cached answer of a near duplicate of `question`, if it is still valid. `history` tells
+        whether the question's thread has earlier turns.
+        """
+        if not self.cacheable(question, history):
+            self._skip()
+            return None
+        try:
+            entry = self._match(self._normalize(self.embeddings.embed_query(question)), question_literals(question))
+            if entry is not None and not self._is_fresh(entry):
+                entry = None
+        except Exception as e:
+            print(f"Semantic cache lookup failed: {e}")
+            entry = None
+        return self._record_lookup(entry)
+
+    async def alookup(self, question: str, history: bool = False) -> CachedAnswer | None:
+        """Async variant of `lookup`, the table version check runs on the Spark executor."""
+        if not self.cacheable(question, history):
+            self._skip()
+            return None
+        try:
+            entry = self._match(self._normalize(await self.embeddings.aembed_query(question)), question_literals(question))
+            if entry is not None and not await run_blocking(self._is_fresh, entry):
+                entry = None
+        except Exception as e:
+            print(f"Semantic cache lookup failed: {e}")
+            entry = None
+        return self._record_lookup(entry)
+
+    def _should_add(self, question: str, query: str, history: bool) -> bool:
+        if self.cacheable(question, history) and is_read_only(query) and is_deterministic(query):
+            return True
+        self._skip()
+        return False
+
+    def _insert(self, question: str, query: str, response: str, vector: np.ndarray, versions: Dict[str, str]) -> None:
+        entry = CachedAnswer(question=question, query=query, response=response, table_versions=versions, literals=question_literals(question))
+        with self._lock:
+            self._entries.append(entry)
+            self._vectors = vector[None, :] if self._vectors is None else np.vstack([self._vectors, vector])
+            self._counters["added"] += 1
+            if len(self._entries) > self.max_entries:
+                overflow = len(self._entries) - self.max_entries
+                by_last_hit = sorted(range(len(self._entries)), key=lambda i: self._entries[i].last_hit)
+                self._remove(by_last_hit[:overflow])
+                self._counters["evictions"] += overflow
+
+    def add(self, question: str, query: str, response: str, history: bool = False) -> None:
+        """Caches the final answer to `question` along with the current versions of the tables it read."""
+        if not self._should_add(question, query, history):
+            return
+        try:
+            vector = self._normalize(self.embeddings.embed_query(question))
+            versions = self.version_lookup(referenced_tables(query, self.catalog, self.schema))
+        except Exception as e:
+            print(f"Semantic cache insert failed: {e}")
+            return
+        self._insert(question, query, response, vector, versions)
+
+    async def aadd(self, question: str, query: str, response: str, history: bool = False) -> None:
+        """Async variant of `add`."""
+        if not self._should_add(question, query, history):
+            return
+        try:
+            vector = self._normalize(await self.embeddings.aembed_query(question))
+            versions = await run_blocking(self.version_lookup, referenced_tables(query, self.catalog, self.schema))
+        except Exception as e:
+            print(f"Semantic cache insert failed: {e}")
+            return
+        self._insert(question, query, response, vector, versions)
+
+    def invalidate(self, table: str | None = None) -> None:
+        """Drops every entry, or only the entries whose query reads `table`."""
+        with self._lock:
+            indices = [i for i, e in enumerate(self._entries) if table is None or table in e.table_versions]
+            self._remove(indices)
+            self._counters["invalidations"] += len(indices)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_ratio": self._counters["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+SEMANTIC_CACHE = SemanticAnswerCache(
+    embeddings=get_embeddings(),
+    # Shares the memoized Delta version lookups of the SQL result cache when it is enabled.
+    version_lookup=SQL_RESULT_CACHE.table_versions if SQL_RESULT_CACHE is not None else get_table_versions,
+    catalog=CATALOG,
+    schema=SCHEMA,
+    threshold=TOOLS_CFG.semantic_cache_threshold,
+    ttl=TOOLS_CFG.semantic_cache_ttl,
+    max_entries=TOOLS_CFG.semantic_cache_max_entries,
+    min_words=TOOLS_CFG.semantic_cache_min_words,
+) if TOOLS_CFG.semantic_cache_enabled else None
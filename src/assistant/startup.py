@@ -0,0 +1,118 @@
+from langgraph.graph.state import CompiledStateGraph
+from starlette.responses import JSONResponse
+from starlette.requests import Request
+from starlette.routing import Route
+
+from typing import Any, Callable, Dict, List
+import threading
+import asyncio
+import time
+
+from ..load_config import get_tools_config
+
+TOOLS_CFG = get_tools_config()
+
+
+def _build_default_graph() -> CompiledStateGraph:
+    # Imported here: the agents package pulls in the LLM, Spark and Supabase client libraries.
+    from ..agents import build_graph
+    return build_graph()
+
+
+class GraphLoader:
+    """
+    Builds the agent graph once, on a background thread.
+
+    `start()` returns immediately, so the UI is served while the LLM, Databricks, Supabase
+    and Tavily clients connect; `get()` / `aget()` wait for the build (starting it if needed)
+    and re-raise its error. A failed build is retried on the next `start()` / `get()`.
+    """
+
+    def __init__(self, factory: Callable[[], CompiledStateGraph]) -> None:
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._graph: CompiledStateGraph | None = None
+        self._error: BaseException | None = None
+        self._started_at = 0.0
+        self._build_seconds: float | None = None
+
+    def _build(self) -> None:
+        try:
+            self._graph = self.factory()
+            self._build_seconds = time.perf_counter() - self._started_at
+            print(f"Agent graph ready in {self._build_seconds:.2f}s")
+        except BaseException as e:
+            self._error = e
+            print(f"Agent graph build failed: {type(e).__name__}: {e}")
+        finally:
+            self._done.set()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._graph is not None or (self._thread is not None and not self._done.is_set()):
+                return
+            self._error = None
+            self._done.clear()
+            self._started_at = time.perf_counter()
+            self._thread = threading.Thread(target=self._build, name="graph-build", daemon=True)
+            self._thread.start()
+
+    @property
+    def ready(self) -> bool:
+        return self._graph is not None
+
+    @property
+    def built(self) -> CompiledStateGraph | None:
+        """The graph if it is already built, never waits."""
+        return self._graph
+
+    def get(self, timeout: float | None = None) -> CompiledStateGraph:
+        if self._graph is not None:
+            return self._graph
+        if self._done.is_set() or self._thread is None:
+            self.start()
+        if not self._done.wait(timeout):
+            raise TimeoutError("The agent graph is still being built")
+        if self._graph is None:
+            raise RuntimeError(f"The agent graph could not be built: {self._error}") from self._error
+        return self._graph
+
+    async def aget(self) -> CompiledStateGraph:
+        if self._graph is not None:
+            return self._graph
+        return await asyncio.to_thread(self.get)
+
+    def status(self) -> Dict[str, Any]:
+        if self._graph is not None:
+            return {"status": "ready", "build_seconds": round(self._build_seconds, 3)}
+        if self._error is not None and self._done.is_set():
+            return {"status": "failed", "error": f"{type(self._error).__name__}: {self._error}"}
+        return {"status": "starting" if self._thread is not None else "idle"}
+
+
+GRAPH = GraphLoader(_build_default_graph)
+
+
+def warm_up() -> None:
+    """Starts the graph build in the background (`startup.warm_up`), otherwise the first request builds it."""
+    if TOOLS_CFG.startup_warm_up:
+        GRAPH.start()
+
+
+async def health_endpoint(request: Request) -> JSONResponse:
+    return JSONResponse({"status": "ok"})
+
+
+async def ready_endpoint(request: Request) -> JSONResponse:
+    status = GRAPH.status()
+    return JSONResponse(status, status_code=200 if GRAPH.ready else 503)
+
+
+def health_routes() -> List[Route]:
+    """Liveness and readiness probes, served by the Gradio app (`demo.launch(app_kwargs={"routes": ...})`)."""
+    return [
+        Route(TOOLS_CFG.startup_health_path, health_endpoint),
+        Route(TOOLS_CFG.startup_ready_path, ready_endpoint),
+    ]
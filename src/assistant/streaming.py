@@ -0,0 +1,80 @@
+from langchain_core.messages import AIMessage, AIMessageChunk, AnyMessage, ToolMessage
+
+from typing import Any, Dict, List
+import time
+
+
+class StreamRenderer:
+    """
+    Renders `stream_mode="messages"` events into the Gradio chat history.
+
+    Token chunks are merged into one bubble per agent / tool message (keyed by message id),
+    and `frame_due()` throttles how often the history is yielded to `frame_interval`
+    seconds, so a long answer costs a handful of UI updates instead of one per chunk.
+    Gradio sends consecutive generator outputs as diffs, so each frame only carries the
+    text added to the last bubbles.
+    """
+
+    def __init__(self, chatbot: List[Dict[str, str]], frame_interval: float = 0.1) -> None:
+        self.chatbot = chatbot
+        self.frame_interval = frame_interval
+        self._bubbles: Dict[str, Dict[str, Any]] = {}
+        self._last_frame = 0.0
+        self.dirty = False
+
+    @staticmethod
+    def _agent_name(message: AnyMessage, metadata: Dict[str, Any]) -> str:
+        # Streamed chunks carry no name yet, the agent subgraph namespace does.
+        namespace = metadata.get("langgraph_checkpoint_ns") or metadata.get("checkpoint_ns") or ""
+        return message.name or namespace.split(":")[0] or metadata.get("langgraph_node", "agent")
+
+    def add(self, event: tuple) -> None:
+        """Merges a `("messages", (message, metadata))` event, other events are ignored."""
+        if event[0] != "messages":
+            return
+        message, metadata = event[1]
+        if isinstance(message, AIMessage):
+            key = message.id or f"ai-{len(self._bubbles)}"
+            bubble = self._bubbles.get(key)
+            if bubble is None:
+                bubble = self._bubbles[key] = {"label": f"*Agent: `{self._agent_name(message, metadata)}`*", "content": "", "reasoning": "", "index": None}
+            reasoning = message.additional_kwargs.get("reasoning_content", "")
+            if isinstance(message, AIMessageChunk):
+                bubble["content"] += message.content if isinstance(message.content, str) else ""
+                bubble["reasoning"] += reasoning
+            else:
+                # A complete message (e.g. from a node that did not stream) replaces its chunks.
+                bubble["content"] = message.content if isinstance(message.content, str) else str(message.content)
+                bubble["reasoning"] = reasoning
+            text = bubble["content"] or bubble["reasoning"]
+        elif isinstance(message, ToolMessage):
+            key = message.id or message.tool_call_id
+            bubble = self._bubbles.setdefault(key, {"label": f"*Tool: `{message.name}`*", "index": None})
+            text = message.content if isinstance(message.content, str) else str(message.content)
+        else:
+            return
+
+        # Bubbles only appear once they have text (tool call only chunks show nothing).
+        if not text:
+            return
+        display = f"{bubble['label']}\n{text}\n"
+        if bubble["index"] is None:
+            bubble["index"] = len(self.chatbot)
+            self.chatbot.append({"role": "assistant", "content": display})
+        else:
+            self.chatbot[bubble["index"]]["content"] = display
+        self.dirty = True
+
+    def frame_due(self) -> bool:
+        """True (and resets the frame clock) when there are changes and the frame interval has passed."""
+        now = time.monotonic()
+        if not self.dirty or now - self._last_frame < self.frame_interval:
+            return False
+        self._last_frame = now
+        self.dirty = False
+        return True
+
+    def flush(self) -> bool:
+        """True when changes are still pending after the stream ended."""
+        dirty, self.dirty = self.dirty, False
+        return dirty
@@ -0,0 +1,2 @@
+from .corpus import Scenario, default_scenarios, TPCH_DOCUMENTS
+from .tpch import generate_tpch, load_tpch, local_spark_pool
@@ -0,0 +1,138 @@
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.graph import END
+
+from typing import Any, Dict, List, Tuple
+import argparse
+import asyncio
+import json
+import os
+
+from ..load_config import get_tools_config
+from .corpus import TPCH_DOCUMENTS, Scenario, default_scenarios
+from .runner import compare, run_benchmark
+from .tpch import DEFAULT_SPARK_REMOTE
+
+TOOLS_CFG = get_tools_config()
+
+
+def build_offline_graph(args: argparse.Namespace) -> Tuple[CompiledStateGraph, List[Scenario]]:
+    """
+    The production graph on stand-in backends: scripted chat models, a fake search tool, an
+    in-memory retriever and, unless `--skip-sql`, Spark SQL tools on TPC-H tables of a local
+    Spark Connect server (`--spark-remote`).
+    """
+    # Imported here: the Spark SQL tools read the catalog / schema env vars on import.
+    from ..agents.fast_router import ROUTERS, FastRouter, SPARK_SQL_KEYWORDS, WEB_SEARCH_KEYWORDS, RETRIEVER_KEYWORDS, DIRECT_KEYWORDS
+    from ..agents.checkpoint import BoundedCheckpointSaver
+    from ..agents.graph import build_graph
+    from ..utils.app_utils import set_spark_pool
+    from .fakes import ROUTER, ScriptedChatModel, load_fake_search_tool, load_in_memory_retriever_tool
+
+    scenarios = default_scenarios("spark_catalog", args.schema)
+    spark_sql_tools = None
+    if args.skip_sql:
+        scenarios = [s for s in scenarios if TOOLS_CFG.spark_sql_agent_name not in s.agents]
+        spark_sql_tools = []
+    else:
+        from .tpch import check_spark_connect, create_local_spark_session, load_tpch, local_spark_pool
+
+        check_spark_connect(args.spark_remote)
+        spark = create_local_spark_session(args.spark_remote)
+        print(f"Loaded TPC-H tables: {load_tpch(spark, args.schema, args.scale)}")
+        set_spark_pool(local_spark_pool(args.spark_remote, args.schema))
+
+    by_question = {scenario.question: scenario for scenario in scenarios}
+    latency = args.llm_latency / 1000
+
+    if TOOLS_CFG.fast_router_enabled:
+        # A cold router without a decision log, so every run starts from the same state;
+        # registered as None it is left out of the graph.
+        ROUTERS[TOOLS_CFG.router_agent_name] = FastRouter(
+            TOOLS_CFG.router_agent_name,
+            {
+                TOOLS_CFG.spark_sql_agent_name: SPARK_SQL_KEYWORDS,
+                TOOLS_CFG.web_search_agent_name: WEB_SEARCH_KEYWORDS,
+                TOOLS_CFG.rag_agent_name: RETRIEVER_KEYWORDS,
+                END: DIRECT_KEYWORDS,
+            },
+            min_confidence=TOOLS_CFG.fast_router_min_confidence,
+            min_examples=TOOLS_CFG.fast_router_min_examples,
+            min_tokens=TOOLS_CFG.fast_router_min_tokens,
+            cache_size=TOOLS_CFG.fast_router_cache_size,
+            feature_dim=TOOLS_CFG.fast_router_feature_dim,
+        ) if args.fast_router else None
+
+    graph = build_graph(
+        web_search_agent_llm=ScriptedChatModel(scenarios=by_question, role=TOOLS_CFG.web_search_agent_name, latency=latency),
+        spark_sql_agent_llm=ScriptedChatModel(scenarios=by_question, role=TOOLS_CFG.spark_sql_agent_name, latency=latency),
+        router_llm=ScriptedChatModel(scenarios=by_question, role=ROUTER, latency=latency),
+        rag_agent_llm=ScriptedChatModel(scenarios=by_question, role=TOOLS_CFG.rag_agent_name, latency=latency),
+        search_tool=load_fake_search_tool(TOOLS_CFG.tavily_search_max_results, latency=args.tool_latency / 1000),
+        spark_sql_tools=spark_sql_tools,
+        retriever_tool=load_in_memory_retriever_tool(TPCH_DOCUMENTS),
+        checkpointer=BoundedCheckpointSaver(
+            max_threads=TOOLS_CFG.checkpointer_max_threads,
+            idle_ttl=TOOLS_CFG.checkpointer_idle_ttl,
+            keep_checkpoints=TOOLS_CFG.checkpointer_keep_checkpoints,
+        ),
+        plot=False,
+    )
+    return graph, scenarios
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n{report['questions']} questions in {report['elapsed_s']}s ({report['questions_per_second']} q/s)")
+    for kind in ("end_to_end", "nodes", "tools", "retrievers", "llm"):
+        if not report[kind]:
+            continue
+        print(f"\n{kind:<40} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}")
+        for name, stats in report[kind].items():
+            print(f"  {name:<38} {stats['count']:>6} {stats['p50_ms']:>10.2f} {stats['p95_ms']:>10.2f} {stats['max_ms']:>10.2f}")
+    print("\nReAct iterations (LLM calls per question):")
+    for node, stats in report["react_iterations"].items():
+        print(f"  {node:<38} mean {stats['mean']:<6} max {stats['max']}")
+    print(f"\nTokens: {report['tokens']}")
+    print(f"Memory: {report['memory']}")
+    if report["errors"] or report["failures"]:
+        print(f"Errors: {report['errors']}\nFailures: {json.dumps(report['failures'], indent=2)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the agent graph on stand-in LLMs, search, retriever and a local TPC-H Spark Connect server.")
+    parser.add_argument("--iterations", type=int, default=5, help="Measured replays of the question corpus")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured replays before measuring")
+    parser.add_argument("--scale", type=float, default=0.001, help="TPC-H scale factor of the local dataset")
+    parser.add_argument("--schema", default="tpch", help="Local schema the TPC-H tables are written to")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated latency of every LLM call (ms)")
+    parser.add_argument("--tool-latency", type=float, default=0.0, help="Simulated latency of every web search (ms)")
+    parser.add_argument("--spark-remote", default=os.environ.get("SPARK_REMOTE", DEFAULT_SPARK_REMOTE), help="Spark Connect server holding the TPC-H tables (start-connect-server.sh of a Spark 3.5 install)")
+    parser.add_argument("--skip-sql", action="store_true", help="Leave out the Spark SQL questions (no Spark Connect server needed)")
+    parser.add_argument("--fast-router", action=argparse.BooleanOptionalAction, default=True, help="Keep the fast router in front of the router LLM")
+    parser.add_argument("--trace-memory", action="store_true", help="Also report the Python heap peak (tracemalloc, slows the run)")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report of another branch to compare p50 / p95 against")
+    args = parser.parse_args()
+
+    os.environ["UC_CATALOG_NAME"] = "spark_catalog"
+    os.environ["UC_SCHEMA_NAME"] = args.schema
+
+    graph, scenarios = build_offline_graph(args)
+    report = asyncio.run(run_benchmark(graph, scenarios, iterations=args.iterations, warmup=args.warmup, trace_memory=args.trace_memory))
+    report["config"] = {k: v for k, v in vars(args).items() if k not in ("output", "baseline")}
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\n{'metric':<60} {'baseline':>10} {'current':>10} {'change':>8}")
+        for metric, old, new, change in compare(report, baseline):
+            print(f"  {metric:<58} {old:>10.2f} {new:>10.2f} {change:>+7.1f}%")
+
+
+if __name__ == "__main__":
+    main()
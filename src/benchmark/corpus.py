@@ -0,0 +1,142 @@
+from langgraph.graph import END
+
+from typing import Any, Dict, List, Tuple
+from dataclasses import dataclass, field
+
+from ..load_config import get_tools_config
+
+TOOLS_CFG = get_tools_config()
+
+FAN_OUT = "fan_out"
+
+
+@dataclass
+class Scenario:
+    """
+    A benchmark question and the script the stand-in LLMs follow for it: the router hands
+    off to `route` (END answers directly), the agent then makes `tool_calls` one per ReAct
+    iteration and finally replies `answer`. With `route=FAN_OUT` the router dispatches
+    `subtasks` instead, (agent, question) pairs replayed by the scenarios of those questions.
+    """
+    question: str
+    route: str
+    tool_calls: List[Tuple[str, Dict[str, Any]]] = field(default_factory=list)
+    answer: str = ""
+    subtasks: List[Tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def agents(self) -> List[str]:
+        """Agents the scenario runs on."""
+        return [agent for agent, _ in self.subtasks] if self.route == FAN_OUT else [self.route]
+
+
+def _sql_calls(tables: List[str], query: str, response: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """The tool sequence the Spark SQL prompt asks for: list, schema, check, query, SparkSQLResponse."""
+    return [
+        ("list_tables_sql_db", {"tool_input": ""}),
+        ("schema_sql_db", {"table_names": ", ".join(tables)}),
+        ("query_checker_sql_db", {"query": query}),
+        ("query_sql_db", {"query": query}),
+        ("SparkSQLResponse", {"query": query, "response": response}),
+    ]
+
+
+def default_scenarios(catalog: str, schema: str) -> List[Scenario]:
+    """The fixed benchmark corpus: Spark SQL, web search, documentation, compound (fan-out) and directly answered questions."""
+    fqn = f"{catalog}.{schema}"
+    sql_agent, web_agent, rag_agent = TOOLS_CFG.spark_sql_agent_name, TOOLS_CFG.web_search_agent_name, TOOLS_CFG.rag_agent_name
+    sql = [
+        (
+            "How many orders were placed in 1995?",
+            ["orders"],
+            f"SELECT COUNT(*) AS orders FROM {fqn}.orders WHERE YEAR(o_orderdate) = 1995",
+        ),
+        (
+            "What is the total revenue per order priority?",
+            ["orders"],
+            f"SELECT o_orderpriority, ROUND(SUM(o_totalprice), 2) AS revenue FROM {fqn}.orders GROUP BY o_orderpriority ORDER BY o_orderpriority",
+        ),
+        (
+            "Show the pricing summary report (TPC-H Q1) per return flag and line status.",
+            ["lineitem"],
+            f"SELECT l_returnflag, l_linestatus, SUM(l_quantity) AS sum_qty, SUM(l_extendedprice) AS sum_base_price, "
+            f"SUM(l_extendedprice * (1 - l_discount)) AS sum_disc_price, AVG(l_discount) AS avg_disc, COUNT(*) AS count_order "
+            f"FROM {fqn}.lineitem WHERE l_shipdate <= DATE '1998-09-02' GROUP BY l_returnflag, l_linestatus ORDER BY l_returnflag, l_linestatus",
+        ),
+        (
+            "Which 10 customers spent the most, and which nation are they from?",
+            ["customer", "orders", "nation"],
+            f"SELECT c.c_name, n.n_name, ROUND(SUM(o.o_totalprice), 2) AS spent FROM {fqn}.customer c "
+            f"JOIN {fqn}.orders o ON o.o_custkey = c.c_custkey JOIN {fqn}.nation n ON n.n_nationkey = c.c_nationkey "
+            f"GROUP BY c.c_name, n.n_name ORDER BY spent DESC LIMIT 10",
+        ),
+        (
+            "List the revenue by region for orders shipped in 1994.",
+            ["lineitem", "orders", "customer", "nation", "region"],
+            f"SELECT r.r_name, ROUND(SUM(l.l_extendedprice * (1 - l.l_discount)), 2) AS revenue FROM {fqn}.lineitem l "
+            f"JOIN {fqn}.orders o ON o.o_orderkey = l.l_orderkey JOIN {fqn}.customer c ON c.c_custkey = o.o_custkey "
+            f"JOIN {fqn}.nation n ON n.n_nationkey = c.c_nationkey JOIN {fqn}.region r ON r.r_regionkey = n.n_regionkey "
+            f"WHERE YEAR(l.l_shipdate) = 1994 GROUP BY r.r_name ORDER BY revenue DESC",
+        ),
+    ]
+    scenarios = [
+        Scenario(question, sql_agent, _sql_calls(tables, query, "See the query result above."), "Here is the result of the query.")
+        for question, tables, query in sql
+    ]
+
+    web = [
+        ("What is the latest Databricks Runtime LTS version?", ["latest Databricks Runtime LTS version"]),
+        ("Who maintains the TPC-H benchmark specification?", ["TPC-H benchmark specification maintainer"]),
+        ("Compare Delta Lake and Apache Iceberg table formats.", ["Delta Lake features", "Apache Iceberg features"]),
+    ]
+    # The batched search layer takes all queries in one call, the bare tool one query per call.
+    scenarios += [
+        Scenario(
+            question,
+            web_agent,
+            [("tavily_search", {"queries": queries})] if TOOLS_CFG.web_search_enabled else [("tavily_search", {"query": query}) for query in queries],
+            "According to the search results, here is the answer.",
+        )
+        for question, queries in web
+    ]
+
+    docs = [
+        ("How is revenue defined in the TPC-H specification?", "revenue definition L_EXTENDEDPRICE L_DISCOUNT"),
+        ("What does TPC-H query Q17 compute?", "Q17 small-quantity-order revenue"),
+    ]
+    scenarios += [
+        Scenario(question, rag_agent, [("retrieve_docs", {"query": query})], "According to the documentation, here is the answer.")
+        for question, query in docs
+    ]
+
+    # Independent parts of one question, the router fans them out to run in parallel.
+    scenarios += [
+        Scenario(
+            "Compare the revenue by region in 1994 with what the web says about current regional GDP.",
+            FAN_OUT,
+            subtasks=[(sql_agent, sql[4][0]), (web_agent, web[2][0])],
+        ),
+        Scenario(
+            "How does TPC-H define revenue, and what is the latest Databricks Runtime LTS version?",
+            FAN_OUT,
+            subtasks=[(rag_agent, docs[0][0]), (web_agent, web[0][0])],
+        ),
+    ]
+
+    scenarios += [
+        Scenario("Hello! What can you do?", END, answer="I can answer questions about the TPC-H lakehouse and search the web."),
+        Scenario("Thanks, that is all.", END, answer="You're welcome!"),
+    ]
+    return scenarios
+
+
+TPCH_DOCUMENTS: List[Tuple[str, Dict[str, Any]]] = [
+    ("The LINEITEM table holds one row per order line. L_EXTENDEDPRICE is L_QUANTITY times the part retail price.", {"page": 14, "chunk_order": 0}),
+    ("L_DISCOUNT and L_TAX are fractions between 0 and 0.1; revenue is L_EXTENDEDPRICE * (1 - L_DISCOUNT).", {"page": 14, "chunk_order": 1}),
+    ("The ORDERS table has one row per order; O_TOTALPRICE sums the discounted, taxed prices of its line items.", {"page": 15, "chunk_order": 2}),
+    ("Q1, the pricing summary report, aggregates LINEITEM by L_RETURNFLAG and L_LINESTATUS up to a ship date.", {"page": 29, "chunk_order": 3}),
+    ("Q5, the local supplier volume query, lists revenue per nation for customers and suppliers of one region.", {"page": 38, "chunk_order": 4}),
+    ("Q17, the small-quantity-order revenue query, averages yearly revenue lost on small orders of a brand.", {"page": 57, "chunk_order": 5}),
+    ("The NATION table has 25 rows and REGION has 5; every nation belongs to exactly one region.", {"page": 13, "chunk_order": 6}),
+    ("The scale factor sets the database size: SF 1 is about 1 GB with 1.5 million orders and 6 million line items.", {"page": 80, "chunk_order": 7}),
+]
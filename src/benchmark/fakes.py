@@ -0,0 +1,136 @@
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.language_models import BaseChatModel
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.vectorstores import InMemoryVectorStore
+from langchain_core.tools import BaseTool, StructuredTool
+from langgraph.graph import END
+from pydantic import BaseModel, Field
+
+from typing import Any, Dict, List, Sequence, Tuple
+import hashlib
+import asyncio
+import time
+import uuid
+
+from ..agents.tools.rag import load_supabase_retriever_tool
+from ..utils.tokens import estimate_tokens
+from .corpus import FAN_OUT, Scenario
+
+ROUTER = "router"
+
+
+def _text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else str(message.content)
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Stand-in chat model replaying the `Scenario` of the current question.
+
+    The question is the last human message. As `role="router"` it hands off to the scenario
+    route, dispatches its sub tasks or answers directly; as an agent it makes the next scripted tool call, counted
+    from the tool messages since the question, then answers. Prompts matching no scenario
+    (e.g. the query checker) get `fallback`. `latency` seconds are slept per call and token
+    usage is estimated from the message sizes, so the graph sees realistic metadata.
+    """
+
+    scenarios: Dict[str, Scenario]
+    role: str = ROUTER
+    latency: float = 0.0
+    fallback: str = "The query looks correct."
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-chat"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "ScriptedChatModel":
+        return self
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        position = next((i for i in range(len(messages) - 1, -1, -1) if isinstance(messages[i], HumanMessage)), None)
+        scenario = self.scenarios.get(_text(messages[position])) if position is not None else None
+
+        if scenario is None:
+            message = AIMessage(content=self.fallback)
+        elif self.role == ROUTER:
+            if scenario.route == END:
+                message = AIMessage(content=scenario.answer)
+            elif scenario.route == FAN_OUT:
+                subtasks = [{"agent": agent, "task": task} for agent, task in scenario.subtasks]
+                message = AIMessage(content="", tool_calls=[self._tool_call("dispatch_subtasks", {"subtasks": subtasks})])
+            else:
+                message = AIMessage(content="", tool_calls=[self._tool_call(f"transfer_to_{scenario.route}", {})])
+        else:
+            step = sum(isinstance(m, ToolMessage) for m in messages[position + 1:])
+            if step < len(scenario.tool_calls):
+                message = AIMessage(content="", tool_calls=[self._tool_call(*scenario.tool_calls[step])])
+            else:
+                message = AIMessage(content=scenario.answer)
+
+        input_tokens = sum(estimate_tokens(_text(m)) for m in messages)
+        output_tokens = estimate_tokens(_text(message)) + sum(estimate_tokens(str(call["args"])) for call in message.tool_calls)
+        message.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+        message.response_metadata = {"model_name": f"scripted-{self.role}"}
+        return message
+
+    @staticmethod
+    def _tool_call(name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        return {"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}", "type": "tool_call"}
+
+    def _generate(self, messages: List[BaseMessage], stop: List[str] | None = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: List[str] | None = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+
+class FakeSearchInput(BaseModel):
+    query: str = Field(..., description="Search query to look up")
+
+
+def load_fake_search_tool(max_results: int = 5, latency: float = 0.0) -> BaseTool:
+    """Offline `tavily_search` stand-in returning deterministic, Tavily shaped results."""
+    def results(query: str) -> Dict[str, Any]:
+        digest = hashlib.sha1(query.encode()).hexdigest()
+        return {
+            "query": query,
+            "results": [
+                {
+                    "title": f"{query} ({i + 1})",
+                    "url": f"https://example.com/{digest[:8]}/{i}",
+                    "content": f"Result {i + 1} about {query}. " * 8,
+                    "score": round(1 - i / (max_results + 1), 3),
+                }
+                for i in range(max_results)
+            ],
+        }
+
+    def search(query: str) -> Dict[str, Any]:
+        if latency:
+            time.sleep(latency)
+        return results(query)
+
+    async def asearch(query: str) -> Dict[str, Any]:
+        if latency:
+            await asyncio.sleep(latency)
+        return results(query)
+
+    return StructuredTool.from_function(
+        func=search,
+        coroutine=asearch,
+        name="tavily_search",
+        description="A search engine for current events and general web questions.",
+        args_schema=FakeSearchInput,
+    )
+
+
+def load_in_memory_retriever_tool(documents: List[Tuple[str, Dict[str, Any]]], embedding_size: int = 256) -> BaseTool:
+    """The production `retrieve_docs` tool on an in-memory store of `documents` with fake embeddings."""
+    vector_store = InMemoryVectorStore(DeterministicFakeEmbedding(size=embedding_size))
+    vector_store.add_texts([text for text, _ in documents], metadatas=[metadata for _, metadata in documents])
+    return load_supabase_retriever_tool(vector_store)
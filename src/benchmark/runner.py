@@ -0,0 +1,208 @@
+from langchain_core.callbacks import BaseCallbackHandler
+from langgraph.graph.state import CompiledStateGraph
+from langchain_core.outputs import LLMResult
+import numpy as np
+
+from typing import Any, Dict, List, Tuple
+from collections import defaultdict
+from uuid import UUID
+import threading
+import tracemalloc
+import resource
+import time
+import uuid
+
+from ..utils.instrumentation import node_path
+from .corpus import Scenario
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """count / mean / p50 / p95 / max of latencies in seconds, reported in milliseconds."""
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+class BenchmarkRecorder(BaseCallbackHandler):
+    """
+    Callback handler timing graph nodes, tools, retrievers and LLM calls.
+
+    LLM calls are also counted per top level node and question (the ReAct iterations of an
+    agent) together with the token usage they report.
+    """
+
+    run_inline = True
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._runs: Dict[UUID, Tuple[str, float]] = {}
+        self.latencies: Dict[str, Dict[str, List[float]]] = {kind: defaultdict(list) for kind in ("nodes", "tools", "retrievers", "llm")}
+        self.iterations: Dict[str, List[int]] = defaultdict(list)
+        self.tokens = {"input": 0, "output": 0, "total": 0}
+        self.errors: Dict[str, int] = defaultdict(int)
+        self._question_calls: Dict[str, int] = defaultdict(int)
+
+    def begin_question(self) -> None:
+        with self._lock:
+            self._question_calls.clear()
+
+    def end_question(self) -> None:
+        with self._lock:
+            for node, calls in self._question_calls.items():
+                self.iterations[node].append(calls)
+
+    def _start(self, run_id: UUID, key: str) -> None:
+        with self._lock:
+            self._runs[run_id] = (key, time.perf_counter())
+
+    def _end(self, run_id: UUID, error: bool = False) -> None:
+        with self._lock:
+            started = self._runs.pop(run_id, None)
+            if started is None:
+                return
+            key, t0 = started
+            kind, name = key.split(":", 1)
+            self.latencies[kind][name].append(time.perf_counter() - t0)
+            if error:
+                self.errors[key] += 1
+
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Dict[str, Any], *, run_id: UUID, parent_run_id: UUID | None = None, metadata: Dict[str, Any] | None = None, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name", "")
+        # Only node runs, not the runnables they are made of.
+        if not metadata or metadata.get("langgraph_node") != name:
+            return
+        key = f"nodes:{node_path(metadata, name)}"
+        parent = self._runs.get(parent_run_id)
+        # A node wrapping an agent shows up again as the wrapper and the agent subgraph.
+        if parent is None or parent[0] != key:
+            self._start(run_id, key)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        # Handoffs (ParentCommand) surface as node errors but are normal control flow.
+        self._end(run_id, error=type(error).__name__ != "ParentCommand")
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, f"tools:{kwargs.get('name') or (serialized or {}).get('name', 'tool')}")
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error=True)
+
+    def on_retriever_start(self, serialized: Dict[str, Any], query: str, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, f"retrievers:{kwargs.get('name') or (serialized or {}).get('name', 'retriever')}")
+
+    def on_retriever_end(self, documents: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_retriever_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error=True)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, metadata: Dict[str, Any] | None = None, **kwargs: Any) -> None:
+        metadata = metadata or {}
+        node = node_path(metadata, metadata.get("langgraph_node", "llm"))
+        with self._lock:
+            self._question_calls[node.split("/")[0]] += 1
+        self._start(run_id, f"llm:{node}")
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                with self._lock:
+                    self.tokens["input"] += usage.get("input_tokens", 0)
+                    self.tokens["output"] += usage.get("output_tokens", 0)
+                    self.tokens["total"] += usage.get("total_tokens", 0)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error=True)
+
+
+async def run_benchmark(
+    graph: CompiledStateGraph,
+    scenarios: List[Scenario],
+    iterations: int = 5,
+    warmup: int = 1,
+    trace_memory: bool = False,
+    recursion_limit: int = 50,
+) -> Dict[str, Any]:
+    """
+    Replays every scenario `warmup` + `iterations` times (a new thread each time) and
+    returns the latency / iteration / token / memory report of the measured runs.
+    """
+    for _ in range(warmup):
+        for scenario in scenarios:
+            await graph.ainvoke({"messages": [("user", scenario.question)]}, {"configurable": {"thread_id": uuid.uuid4().hex}, "recursion_limit": recursion_limit})
+
+    recorder = BenchmarkRecorder()
+    end_to_end: Dict[str, List[float]] = defaultdict(list)
+    failures: Dict[str, str] = {}
+    if trace_memory:
+        tracemalloc.start()
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for scenario in scenarios:
+            config = {"configurable": {"thread_id": uuid.uuid4().hex}, "callbacks": [recorder], "recursion_limit": recursion_limit}
+            recorder.begin_question()
+            t0 = time.perf_counter()
+            try:
+                await graph.ainvoke({"messages": [("user", scenario.question)]}, config)
+            except Exception as e:
+                failures[scenario.question] = f"{type(e).__name__}: {e}"
+            end_to_end[scenario.route].append(time.perf_counter() - t0)
+            recorder.end_question()
+    elapsed = time.perf_counter() - started
+
+    traced_peak = 0
+    if trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    questions = iterations * len(scenarios)
+    return {
+        "questions": questions,
+        "elapsed_s": round(elapsed, 3),
+        "questions_per_second": round(questions / elapsed, 2) if elapsed else 0.0,
+        "end_to_end": {
+            "all": summarize([t for samples in end_to_end.values() for t in samples]),
+            **{route: summarize(samples) for route, samples in sorted(end_to_end.items())},
+        },
+        **{kind: {name: summarize(samples) for name, samples in sorted(by_name.items())} for kind, by_name in recorder.latencies.items()},
+        "react_iterations": {
+            node: {"mean": round(float(np.mean(calls)), 2), "max": int(max(calls))}
+            for node, calls in sorted(recorder.iterations.items())
+        },
+        "tokens": {**recorder.tokens, "per_question": round(recorder.tokens["total"] / questions, 1) if questions else 0.0},
+        "memory": {
+            # ru_maxrss is in KiB on Linux.
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "traced_peak_mb": round(traced_peak / 2**20, 2) if trace_memory else None,
+        },
+        "errors": dict(recorder.errors),
+        "failures": failures,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[Tuple[str, float, float, float]]:
+    """(metric, baseline p50/p95 ms, current, change %) of every latency present in both reports."""
+    rows = []
+    for kind in ("end_to_end", "nodes", "tools", "retrievers", "llm"):
+        for name, current in report.get(kind, {}).items():
+            before = baseline.get(kind, {}).get(name)
+            if not before:
+                continue
+            for stat in ("p50_ms", "p95_ms"):
+                old, new = before[stat], current[stat]
+                rows.append((f"{kind}.{name}.{stat}", old, new, round((new - old) / old * 100, 1) if old else 0.0))
+    return rows
@@ -0,0 +1,131 @@
+from pyspark.sql import SparkSession
+
+from typing import Dict, List, Tuple
+from datetime import date, timedelta
+from urllib.parse import urlparse
+import socket
+import random
+
+from ..utils.spark_pool import SparkSessionPool
+
+TPCH_SCHEMAS: Dict[str, str] = {
+    "region": "r_regionkey BIGINT, r_name STRING, r_comment STRING",
+    "nation": "n_nationkey BIGINT, n_name STRING, n_regionkey BIGINT, n_comment STRING",
+    "customer": "c_custkey BIGINT, c_name STRING, c_nationkey BIGINT, c_acctbal DOUBLE, c_mktsegment STRING",
+    "supplier": "s_suppkey BIGINT, s_name STRING, s_nationkey BIGINT, s_acctbal DOUBLE",
+    "part": "p_partkey BIGINT, p_name STRING, p_brand STRING, p_type STRING, p_size INT, p_retailprice DOUBLE",
+    "orders": "o_orderkey BIGINT, o_custkey BIGINT, o_orderstatus STRING, o_totalprice DOUBLE, o_orderdate DATE, o_orderpriority STRING",
+    "lineitem": (
+        "l_orderkey BIGINT, l_partkey BIGINT, l_suppkey BIGINT, l_linenumber INT, l_quantity DOUBLE, "
+        "l_extendedprice DOUBLE, l_discount DOUBLE, l_tax DOUBLE, l_returnflag STRING, l_linestatus STRING, l_shipdate DATE"
+    ),
+}
+
+_REGIONS = ["AFRICA", "AMERICA", "ASIA", "EUROPE", "MIDDLE EAST"]
+_NATIONS = [
+    ("ALGERIA", 0), ("ARGENTINA", 1), ("BRAZIL", 1), ("CANADA", 1), ("EGYPT", 4), ("ETHIOPIA", 0), ("FRANCE", 3),
+    ("GERMANY", 3), ("INDIA", 2), ("INDONESIA", 2), ("IRAN", 4), ("IRAQ", 4), ("JAPAN", 2), ("JORDAN", 4),
+    ("KENYA", 0), ("MOROCCO", 0), ("MOZAMBIQUE", 0), ("PERU", 1), ("CHINA", 2), ("ROMANIA", 3), ("SAUDI ARABIA", 4),
+    ("VIETNAM", 2), ("RUSSIA", 3), ("UNITED KINGDOM", 3), ("UNITED STATES", 1),
+]
+_SEGMENTS = ["AUTOMOBILE", "BUILDING", "FURNITURE", "HOUSEHOLD", "MACHINERY"]
+_PRIORITIES = ["1-URGENT", "2-HIGH", "3-MEDIUM", "4-NOT SPECIFIED", "5-LOW"]
+_TYPES = ["STANDARD ANODIZED TIN", "SMALL PLATED COPPER", "PROMO BURNISHED NICKEL", "LARGE BRUSHED BRASS", "ECONOMY POLISHED STEEL"]
+
+
+def generate_tpch(scale: float = 0.001, seed: int = 7) -> Dict[str, List[Tuple]]:
+    """
+    Rows of a small TPC-H shaped dataset. Scale 1 would be the official row counts, the
+    default (0.001) gives 1500 orders and ~6000 line items; the same seed gives the same rows.
+    """
+    rng = random.Random(seed)
+    n_customers, n_suppliers, n_parts = max(int(150_000 * scale), 10), max(int(10_000 * scale), 5), max(int(200_000 * scale), 20)
+    n_orders = max(int(1_500_000 * scale), 50)
+
+    rows: Dict[str, List[Tuple]] = {
+        "region": [(i, name, f"region {name.lower()}") for i, name in enumerate(_REGIONS)],
+        "nation": [(i, name, region, f"nation {name.lower()}") for i, (name, region) in enumerate(_NATIONS)],
+        "customer": [
+            (i, f"Customer#{i:09d}", rng.randrange(len(_NATIONS)), round(rng.uniform(-999.99, 9999.99), 2), rng.choice(_SEGMENTS))
+            for i in range(1, n_customers + 1)
+        ],
+        "supplier": [
+            (i, f"Supplier#{i:09d}", rng.randrange(len(_NATIONS)), round(rng.uniform(-999.99, 9999.99), 2))
+            for i in range(1, n_suppliers + 1)
+        ],
+        "part": [
+            (i, f"part {i}", f"Brand#{rng.randint(1, 5)}{rng.randint(1, 5)}", rng.choice(_TYPES), rng.randint(1, 50), round(900 + i % 1000 + (i % 10) / 10, 2))
+            for i in range(1, n_parts + 1)
+        ],
+        "orders": [],
+        "lineitem": [],
+    }
+
+    start = date(1992, 1, 1)
+    for order_key in range(1, n_orders + 1):
+        order_date = start + timedelta(days=rng.randrange(2400))
+        total = 0.0
+        for line in range(1, rng.randint(1, 7) + 1):
+            quantity = float(rng.randint(1, 50))
+            price = round(quantity * rng.uniform(900, 2000), 2)
+            discount, tax = round(rng.uniform(0, 0.1), 2), round(rng.uniform(0, 0.08), 2)
+            ship_date = order_date + timedelta(days=rng.randint(1, 121))
+            shipped = ship_date <= date(1995, 6, 17)
+            rows["lineitem"].append((
+                order_key, rng.randint(1, n_parts), rng.randint(1, n_suppliers), line, quantity, price, discount, tax,
+                rng.choice("RA") if shipped else "N", "F" if shipped else "O", ship_date,
+            ))
+            total += price * (1 - discount) * (1 + tax)
+        rows["orders"].append((
+            order_key, rng.randint(1, n_customers), rng.choice("FOP"), round(total, 2), order_date, rng.choice(_PRIORITIES),
+        ))
+    return rows
+
+
+DEFAULT_SPARK_REMOTE = "sc://localhost:15002"
+
+
+def check_spark_connect(remote: str) -> None:
+    """
+    Exits with instructions when no Spark Connect server listens at `remote`.
+
+    The pinned Databricks Connect build of pyspark only creates remote sessions (a classic
+    `master("local[2]")` session raises), so the SQL leg runs against a local Apache Spark
+    Connect server started from a plain Spark 3.5 install (Java needed).
+    """
+    url = urlparse(remote.replace("sc://", "http://", 1))
+    try:
+        socket.create_connection((url.hostname or "localhost", url.port or 15002), timeout=2).close()
+    except OSError as e:
+        raise SystemExit(
+            f"No Spark Connect server at {remote} ({e}). Start one with\n"
+            f"  $SPARK_HOME/sbin/start-connect-server.sh --packages org.apache.spark:spark-connect_2.12:3.5.2\n"
+            f"and pass its address with --spark-remote, or run the benchmark with --skip-sql."
+        )
+
+
+def create_local_spark_session(remote: str = DEFAULT_SPARK_REMOTE) -> SparkSession:
+    """A session of the local Spark Connect server at `remote`, standing in for Databricks Connect."""
+    return SparkSession.builder.remote(remote).config("spark.sql.shuffle.partitions", "2").create()
+
+
+def load_tpch(spark: SparkSession, schema: str = "tpch", scale: float = 0.001, seed: int = 7) -> Dict[str, int]:
+    """(Re)creates the TPC-H tables in `spark_catalog.<schema>`, returns the row count of each table."""
+    spark.sql(f"CREATE DATABASE IF NOT EXISTS spark_catalog.{schema}")
+    counts = {}
+    for table, rows in generate_tpch(scale, seed).items():
+        spark.createDataFrame(rows, TPCH_SCHEMAS[table]).write.mode("overwrite").saveAsTable(f"spark_catalog.{schema}.{table}")
+        counts[table] = len(rows)
+    return counts
+
+
+def local_spark_pool(remote: str = DEFAULT_SPARK_REMOTE, schema: str = "tpch", max_sessions: int = 4) -> SparkSessionPool:
+    """SparkSessionPool handing out sessions of the Spark Connect server at `remote` (they share its catalog)."""
+    return SparkSessionPool(
+        session_factory=lambda: create_local_spark_session(remote),
+        catalog="spark_catalog",
+        schema=schema,
+        max_sessions=max_sessions,
+        # Local sessions do not expire, the heartbeat would only add noise to the timings.
+        heartbeat_ttl=24 * 3600.0,
+    )
@@ -0,0 +1,3 @@
+from .pipeline import IngestionPipeline, IngestionStats, RateLimitedEmbedder
+from .sinks import SupabaseSink, LocalSink
+from .sources import list_files, read_pages, chunk_pages
@@ -0,0 +1,70 @@
+from supabase.client import create_client
+from pyprojroot import here
+from dotenv import load_dotenv
+
+import argparse
+import asyncio
+import json
+import os
+
+from ..agents.tools.local_vector_store import LocalVectorStore
+from ..utils.embedding_cache import get_embeddings
+from ..load_config import get_tools_config
+from .pipeline import IngestionPipeline, RateLimitedEmbedder
+from .sinks import LocalSink, SupabaseSink
+
+load_dotenv()
+
+TOOLS_CFG = get_tools_config()
+
+
+def build_pipeline() -> IngestionPipeline:
+    """Pipeline writing to the backend selected by `rag_agent.vs_backend`."""
+    # Cached, so chunks already embedded by an earlier run (or another backend) are free.
+    embeddings = get_embeddings()
+
+    if TOOLS_CFG.rag_agent_vs_backend == "local":
+        sink = LocalSink(LocalVectorStore(
+            path=here(TOOLS_CFG.rag_agent_local_vs_path),
+            embedding=embeddings,
+            dtype=TOOLS_CFG.rag_agent_local_vs_dtype,
+            index=TOOLS_CFG.rag_agent_local_vs_index,
+            index_min_rows=TOOLS_CFG.rag_agent_local_vs_index_min_rows,
+            n_probe=TOOLS_CFG.rag_agent_local_vs_n_probe,
+        ))
+        embed_kwargs = {}
+    else:
+        client = create_client(os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY"))
+        sink = SupabaseSink(client, TOOLS_CFG.ingestion_documents_table, TOOLS_CFG.ingestion_chunks_table)
+        # document_chunks.embedding is a fixed size pgvector column.
+        embed_kwargs = {"output_dimensionality": TOOLS_CFG.ingestion_embedding_dim}
+
+    embedder = RateLimitedEmbedder(
+        embeddings,
+        batch_size=TOOLS_CFG.ingestion_embed_batch_size,
+        max_concurrency=TOOLS_CFG.ingestion_embed_concurrency,
+        requests_per_minute=TOOLS_CFG.ingestion_embed_requests_per_minute,
+        embed_kwargs=embed_kwargs,
+    )
+    return IngestionPipeline(
+        sink,
+        embedder,
+        chunk_size=TOOLS_CFG.ingestion_chunk_size,
+        chunk_overlap=TOOLS_CFG.ingestion_chunk_overlap,
+        upsert_batch_size=TOOLS_CFG.ingestion_upsert_batch_size,
+        manifest_path=here(TOOLS_CFG.ingestion_manifest_path) if TOOLS_CFG.ingestion_manifest_path else None,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingest documents (local directory or /Volumes path) into the RAG vector store.")
+    parser.add_argument("path", nargs="?", default=str(here("data")), help="File, directory or UC Volume path to ingest")
+    parser.add_argument("--full", action="store_true", help="Re-check every file instead of skipping unchanged ones")
+    args = parser.parse_args()
+
+    stats = asyncio.run(build_pipeline().run(args.path, full=args.full))
+    print(json.dumps(stats.report(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
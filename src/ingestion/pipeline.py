@@ -0,0 +1,193 @@
+from langchain_core.embeddings import Embeddings
+
+from typing import Any, Dict, List
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+import asyncio
+import json
+import time
+import os
+
+from .sinks import ChunkRow, LocalSink, SupabaseSink, chunk_id, document_id
+from .sources import SourceFile, chunk_pages, list_files, read_pages
+
+
+@dataclass
+class IngestionStats:
+    files: int = 0
+    files_skipped: int = 0
+    pages: int = 0
+    chunks: int = 0
+    chunks_skipped: int = 0
+    chunks_deleted: int = 0
+    embeddings: int = 0
+    embedding_retries: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    elapsed: float = 0.0
+
+    def report(self) -> Dict[str, float]:
+        elapsed = self.elapsed or time.perf_counter() - self.started_at
+        report = {k: v for k, v in asdict(self).items() if k != "started_at"}
+        report["elapsed"] = round(elapsed, 3)
+        for name in ("pages", "chunks", "embeddings"):
+            report[f"{name}_per_second"] = round(getattr(self, name) / elapsed, 2) if elapsed else 0.0
+        return report
+
+
+class RateLimitedEmbedder:
+    """
+    Embeds texts in batches of `batch_size`, with at most `max_concurrency` requests in
+    flight and at most `requests_per_minute` requests started per minute (spaced evenly).
+    Failed requests are retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = 32,
+        max_concurrency: int = 4,
+        requests_per_minute: int = 100,
+        max_retries: int = 5,
+        embed_kwargs: Dict[str, Any] | None = None,
+    ) -> None:
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self.max_retries = max_retries
+        self.embed_kwargs = embed_kwargs or {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pace_lock = asyncio.Lock()
+        self._next_slot = 0.0
+        self.retries = 0
+
+    async def _pace(self) -> None:
+        async with self._pace_lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            async with self._semaphore:
+                await self._pace()
+                try:
+                    return await self.embeddings.aembed_documents(texts, **self.embed_kwargs)
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        raise
+                    print(f"Embedding batch failed ({e}), retrying")
+            self.retries += 1
+            await asyncio.sleep(min(2 ** attempt, 60))
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = await asyncio.gather(*(self._embed_batch(batch) for batch in batches))
+        return [vector for batch in results for vector in batch]
+
+
+class IngestionPipeline:
+    """
+    Incremental ingestion of a directory / UC Volume into a vector store sink.
+
+    - Files whose size and modification time match the manifest of the previous run are
+      skipped without being read.
+    - Changed files are streamed page by page and chunked; chunk ids derive from the chunk
+      content hash, so only new chunks are embedded and upserted, chunks that vanished are
+      deleted and unchanged ones only get their order refreshed if it moved.
+    - New chunks of all files are embedded concurrently and upserted in bulk batches; the
+      sink's `flush` then applies what it buffered (the local store writes once per run).
+    """
+
+    def __init__(
+        self,
+        sink: SupabaseSink | LocalSink,
+        embedder: RateLimitedEmbedder,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 100,
+        upsert_batch_size: int = 200,
+        manifest_path: str | Path | None = None,
+    ) -> None:
+        self.sink = sink
+        self.embedder = embedder
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.upsert_batch_size = upsert_batch_size
+        self.manifest_path = Path(manifest_path) if manifest_path else None
+        self.manifest: Dict[str, str] = {}
+        if self.manifest_path is not None and self.manifest_path.exists():
+            self.manifest = json.loads(self.manifest_path.read_text())
+
+    def _save_manifest(self) -> None:
+        if self.manifest_path is None:
+            return
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        tmp.write_text(json.dumps(self.manifest, indent=2))
+        os.replace(tmp, self.manifest_path)
+
+    def _plan(self, source: SourceFile, stats: IngestionStats) -> List[ChunkRow]:
+        """Reads and chunks one file, applies deletions / reorders, returns the chunks to embed."""
+        doc_id = document_id(source)
+        self.sink.upsert_document(doc_id, source)
+        existing = self.sink.existing_chunks(doc_id)
+
+        pages = 0
+        def counted_pages():
+            nonlocal pages
+            for page in read_pages(source):
+                pages += 1
+                yield page
+
+        current: Dict[str, ChunkRow] = {}
+        for chunk in chunk_pages(source, counted_pages(), self.chunk_size, self.chunk_overlap):
+            id_ = chunk_id(doc_id, chunk)
+            if id_ not in current:
+                current[id_] = ChunkRow(id=id_, document_id=doc_id, chunk=chunk, embedding=[])
+        stats.pages += pages
+        stats.chunks += len(current)
+
+        stale = [id_ for id_ in existing if id_ not in current]
+        self.sink.delete_chunks(stale)
+        stats.chunks_deleted += len(stale)
+
+        moved = {id_: row.chunk.order for id_, row in current.items() if id_ in existing and existing[id_] != row.chunk.order}
+        if moved:
+            self.sink.reorder_chunks(moved)
+
+        new_rows = [row for id_, row in current.items() if id_ not in existing]
+        stats.chunks_skipped += len(current) - len(new_rows)
+        return new_rows
+
+    async def run(self, root: str, full: bool = False) -> IngestionStats:
+        """Ingests every supported file under `root`; `full` ignores the manifest and re-checks every file."""
+        stats = IngestionStats()
+        pending: List[ChunkRow] = []
+        changed: List[SourceFile] = []
+
+        for source in list_files(root):
+            stats.files += 1
+            if not full and self.manifest.get(source.path) == source.fingerprint:
+                stats.files_skipped += 1
+                continue
+            pending += await asyncio.to_thread(self._plan, source, stats)
+            changed.append(source)
+
+        for start in range(0, len(pending), self.upsert_batch_size):
+            batch = pending[start:start + self.upsert_batch_size]
+            vectors = await self.embedder.embed([row.chunk.content for row in batch])
+            for row, vector in zip(batch, vectors):
+                row.embedding = vector
+            stats.embeddings += len(batch)
+            await asyncio.to_thread(self.sink.upsert_chunks, batch)
+        await asyncio.to_thread(self.sink.flush)
+
+        # Only recorded once everything is stored, a failed run is redone for these files.
+        for source in changed:
+            self.manifest[source.path] = source.fingerprint
+        self._save_manifest()
+
+        stats.embedding_retries = self.embedder.retries
+        stats.elapsed = time.perf_counter() - stats.started_at
+        return stats
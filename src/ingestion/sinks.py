@@ -0,0 +1,128 @@
+from supabase.client import Client
+
+from typing import Any, Dict, List, Set, Tuple
+from dataclasses import dataclass
+import uuid
+
+from ..agents.tools.local_vector_store import LocalVectorStore
+from .sources import Chunk, SourceFile
+
+# Namespace of the deterministic document / chunk ids, so re-runs upsert instead of duplicating.
+_ID_NAMESPACE = uuid.UUID("6f1c1b52-8a0e-4d7c-9b1e-3f0c2f9a7d41")
+
+
+def document_id(source: SourceFile) -> str:
+    return str(uuid.uuid5(_ID_NAMESPACE, source.path))
+
+
+def chunk_id(doc_id: str, chunk: Chunk) -> str:
+    """Derived from the chunk content hash: an unchanged chunk keeps its id and embedding."""
+    return str(uuid.uuid5(_ID_NAMESPACE, f"{doc_id}:{chunk.sha256}"))
+
+
+@dataclass
+class ChunkRow:
+    id: str
+    document_id: str
+    chunk: Chunk
+    embedding: List[float]
+
+
+class SupabaseSink:
+    """Bulk upserts into the `documents` / `document_chunks` tables of `supabase/DDL_with_index.sql`."""
+
+    def __init__(self, client: Client, documents_table: str = "documents", chunks_table: str = "document_chunks") -> None:
+        self.client = client
+        self.documents_table = documents_table
+        self.chunks_table = chunks_table
+
+    def upsert_document(self, doc_id: str, source: SourceFile) -> None:
+        self.client.table(self.documents_table).upsert({
+            "id": doc_id,
+            "file_name": source.name,
+            "file_path": source.path,
+            "file_metadata": {"size": source.size, "modified": source.modified},
+        }).execute()
+
+    def existing_chunks(self, doc_id: str) -> Dict[str, int]:
+        """{chunk id: chunk order} already stored for a document."""
+        rows = self.client.table(self.chunks_table).select("id, chunk_order").eq("document_id", doc_id).execute().data
+        return {row["id"]: row["chunk_order"] for row in rows}
+
+    def upsert_chunks(self, rows: List[ChunkRow]) -> None:
+        self.client.table(self.chunks_table).upsert([
+            {
+                "id": row.id,
+                "document_id": row.document_id,
+                "content": row.chunk.content,
+                "embedding": row.embedding,
+                "chunk_order": row.chunk.order,
+            }
+            for row in rows
+        ]).execute()
+
+    def reorder_chunks(self, orders: Dict[str, int]) -> None:
+        # Rare (only when chunks are inserted before unchanged ones); the embedding is kept.
+        for id_, order in orders.items():
+            self.client.table(self.chunks_table).update({"chunk_order": order}).eq("id", id_).execute()
+
+    def delete_chunks(self, ids: List[str]) -> None:
+        if ids:
+            self.client.table(self.chunks_table).delete().in_("id", ids).execute()
+
+    def flush(self) -> None:
+        """Writes are applied immediately."""
+
+
+class LocalSink:
+    """
+    Writes chunks into a LocalVectorStore, the document fields go to the chunk metadata.
+
+    Every store write rewrites the whole store, so upserts, reorders and deletes are
+    buffered and applied in a single `LocalVectorStore.update` by `flush` at the end of a run.
+    """
+
+    def __init__(self, store: LocalVectorStore) -> None:
+        self.store = store
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        # {chunk id: (content, embedding, metadata)} to add, ids to delete.
+        self._pending: Dict[str, Tuple[str, Any, Dict[str, Any]]] = {}
+        self._deleted: Set[str] = set()
+
+    def upsert_document(self, doc_id: str, source: SourceFile) -> None:
+        self._documents[doc_id] = {"document_id": doc_id, "file_name": source.name, "file_path": source.path}
+
+    def existing_chunks(self, doc_id: str) -> Dict[str, int]:
+        return {doc.id: doc.metadata.get("chunk_order", 0) for doc in self.store.get_where({"document_id": doc_id})}
+
+    def upsert_chunks(self, rows: List[ChunkRow]) -> None:
+        for row in rows:
+            metadata = {**self._documents[row.document_id], "page": row.chunk.page, "chunk_order": row.chunk.order}
+            self._pending[row.id] = (row.chunk.content, row.embedding, metadata)
+
+    def reorder_chunks(self, orders: Dict[str, int]) -> None:
+        # Re-adds the moved chunks with their stored embeddings and the new order.
+        ids = list(orders)
+        documents, vectors = self.store.get_by_ids(ids), self.store.get_vectors(ids)
+        for doc, vector in zip(documents, vectors):
+            self._pending[doc.id] = (doc.page_content, vector, {**doc.metadata, "chunk_order": orders[doc.id]})
+
+    def delete_chunks(self, ids: List[str]) -> None:
+        self._deleted.update(ids)
+        for id_ in ids:
+            self._pending.pop(id_, None)
+
+    def flush(self) -> None:
+        """Applies the buffered writes in one store rewrite."""
+        if not self._pending and not self._deleted:
+            return
+        ids = list(self._pending)
+        self.store.update(
+            texts=[self._pending[id_][0] for id_ in ids],
+            vectors=[self._pending[id_][1] for id_ in ids],
+            metadatas=[self._pending[id_][2] for id_ in ids],
+            ids=ids,
+            delete_ids=list(self._deleted.union(ids)),
+        )
+        self._pending.clear()
+        self._deleted.clear()
@@ -0,0 +1,102 @@
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+from typing import BinaryIO, Iterator, List, Tuple
+from dataclasses import dataclass
+from pathlib import Path
+import hashlib
+import io
+import os
+
+SUPPORTED_SUFFIXES = (".pdf", ".txt", ".md")
+
+
+@dataclass
+class SourceFile:
+    """A file to ingest, from the local file system or a Unity Catalog Volume."""
+    path: str
+    name: str
+    size: int
+    modified: float
+    volume: bool = False
+
+    @property
+    def fingerprint(self) -> str:
+        """Changes whenever the file is rewritten, used to skip unchanged files without reading them."""
+        return f"{self.size}:{self.modified}"
+
+
+@dataclass
+class Chunk:
+    document_path: str
+    page: int
+    order: int
+    content: str
+
+    @property
+    def sha256(self) -> str:
+        return hashlib.sha256(self.content.encode()).hexdigest()
+
+
+def _is_volume_path(path: str) -> bool:
+    return path.startswith("/Volumes/") and not os.path.exists(path)
+
+
+def list_files(root: str) -> List[SourceFile]:
+    """
+    Supported files under `root`.
+
+    `/Volumes/<catalog>/<schema>/<volume>/...` paths are listed through the Databricks Files
+    API when the volume is not mounted locally (i.e. outside a Databricks cluster).
+    """
+    if _is_volume_path(root):
+        from databricks.sdk import WorkspaceClient
+
+        files, stack, client = [], [root], WorkspaceClient()
+        while stack:
+            for entry in client.files.list_directory_contents(stack.pop()):
+                if entry.is_directory:
+                    stack.append(entry.path)
+                elif entry.path.lower().endswith(SUPPORTED_SUFFIXES):
+                    files.append(SourceFile(entry.path, entry.name, entry.file_size or 0, float(entry.last_modified or 0), volume=True))
+        return sorted(files, key=lambda f: f.path)
+
+    root_path = Path(root)
+    paths = [root_path] if root_path.is_file() else sorted(p for p in root_path.rglob("*") if p.is_file())
+    return [
+        SourceFile(str(p), p.name, p.stat().st_size, p.stat().st_mtime)
+        for p in paths
+        if p.suffix.lower() in SUPPORTED_SUFFIXES
+    ]
+
+
+def _open(source: SourceFile) -> BinaryIO:
+    if source.volume:
+        from databricks.sdk import WorkspaceClient
+
+        # pypdf needs a seekable stream, the download is buffered once in memory.
+        return io.BytesIO(WorkspaceClient().files.download(source.path).contents.read())
+    return open(source.path, "rb")
+
+
+def read_pages(source: SourceFile) -> Iterator[Tuple[int, str]]:
+    """Streams (page number, text) of a file; text files are a single page."""
+    with _open(source) as f:
+        if source.path.lower().endswith(".pdf"):
+            for number, page in enumerate(PdfReader(f).pages, start=1):
+                yield number, page.extract_text() or ""
+        else:
+            yield 1, f.read().decode("utf-8", errors="replace")
+
+
+def chunk_pages(source: SourceFile, pages: Iterator[Tuple[int, str]], chunk_size: int, chunk_overlap: int) -> Iterator[Chunk]:
+    """
+    Splits each page on its own, so an edit on one page leaves the chunks (and their
+    hashes) of every other page unchanged.
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    order = 0
+    for page, text in pages:
+        for content in splitter.split_text(text):
+            yield Chunk(document_path=source.path, page=page, order=order, content=content)
+            order += 1
@@ -1,6 +1,7 @@
 from dotenv import load_dotenv
 from pyprojroot import here
 
+from functools import lru_cache
 import yaml
 
 class LoadToolsConfig:
@@ -15,27 +16,214 @@ class LoadToolsConfig:
         self.router_agent_name = app_config["router_agent"]["name"]
         self.router_agent_llm = app_config["router_agent"]["llm"]
         self.router_agent_llm_temperature = app_config["router_agent"]["llm_temperature"]
-        
+
+        # LLM gateway
+        self.llm_gateway_enabled = bool(app_config["llm_gateway"]["enabled"])
+        self.llm_gateway_requests_per_minute = float(app_config["llm_gateway"]["requests_per_minute"])
+        self.llm_gateway_tokens_per_minute = float(app_config["llm_gateway"]["tokens_per_minute"])
+        self.llm_gateway_max_concurrency = int(app_config["llm_gateway"]["max_concurrency"])
+        self.llm_gateway_router_priority = int(app_config["llm_gateway"]["router_priority"])
+        self.llm_gateway_agent_priority = int(app_config["llm_gateway"]["agent_priority"])
+        self.llm_gateway_queue_timeout = float(app_config["llm_gateway"]["queue_timeout"])
+        self.llm_gateway_throttle_cooldown = float(app_config["llm_gateway"]["throttle_cooldown"])
+        self.llm_gateway_max_retries = int(app_config["llm_gateway"]["max_retries"])
+        self.llm_gateway_max_connections = int(app_config["llm_gateway"]["max_connections"])
+        self.llm_gateway_max_keepalive_connections = int(app_config["llm_gateway"]["max_keepalive_connections"])
+        self.llm_gateway_request_timeout = float(app_config["llm_gateway"]["request_timeout"])
+        self.llm_gateway_fallback_provider = app_config["llm_gateway"]["fallback"]["provider"]
+        self.llm_gateway_fallback_model = app_config["llm_gateway"]["fallback"]["model"]
+        self.llm_gateway_fallback_base_url = app_config["llm_gateway"]["fallback"]["base_url"]
+        self.llm_gateway_fallback_requests_per_minute = float(app_config["llm_gateway"]["fallback"]["requests_per_minute"])
+        self.llm_gateway_fallback_tokens_per_minute = float(app_config["llm_gateway"]["fallback"]["tokens_per_minute"])
+
+        # Fast router
+        self.fast_router_enabled = bool(app_config["fast_router"]["enabled"])
+        self.fast_router_min_confidence = float(app_config["fast_router"]["min_confidence"])
+        self.fast_router_min_examples = int(app_config["fast_router"]["min_examples"])
+        self.fast_router_min_tokens = int(app_config["fast_router"]["min_tokens"])
+        self.fast_router_cache_min_tokens = int(app_config["fast_router"]["cache_min_tokens"])
+        self.fast_router_cache_size = int(app_config["fast_router"]["cache_size"])
+        self.fast_router_feature_dim = int(app_config["fast_router"]["feature_dim"])
+        self.fast_router_log_path = app_config["fast_router"]["log_path"]
+        self.fast_router_max_log_examples = int(app_config["fast_router"]["max_log_examples"])
+        self.fast_router_max_log_bytes = int(app_config["fast_router"]["max_log_bytes"])
+
         # Web Search Agent
         self.web_search_agent_name = app_config["web_search_agent"]["name"]
         self.web_search_agent_llm = app_config["web_search_agent"]["llm"]
         self.web_search_agent_llm_temperature = app_config["web_search_agent"]["llm_temperature"]
+        self.web_search_agent_history_token_budget = int(app_config["web_search_agent"]["history_token_budget"])
 
         # Spark SQL Agent config
         self.spark_sql_agent_name = app_config["spark_sql_agent"]["name"]
         self.spark_sql_agent_llm = app_config["spark_sql_agent"]["llm"]
         self.spark_sql_agent_llm_temperature = app_config["spark_sql_agent"]["llm_temperature"]
-        self.spark_sql_agent_step_timeout = app_config["spark_sql_agent"]["step_timeout"]
+        self.spark_sql_agent_step_timeout = float(app_config["spark_sql_agent"]["step_timeout"])
+        self.spark_sql_agent_history_token_budget = int(app_config["spark_sql_agent"]["history_token_budget"])
+
+        # Parallel fan-out of compound questions
+        self.fan_out_enabled = bool(app_config["fan_out"]["enabled"])
+        self.fan_out_max_subtasks = int(app_config["fan_out"]["max_subtasks"])
+
+        # History compaction for agent handoffs
+        self.history_keep_recent_turns = int(app_config["history_compaction"]["keep_recent_turns"])
+        self.history_summary_chars = int(app_config["history_compaction"]["summary_chars"])
+
+        # Spark session pool
+        self.spark_pool_max_sessions = int(app_config["spark_session_pool"]["max_sessions"])
+        self.spark_pool_heartbeat_ttl = float(app_config["spark_session_pool"]["heartbeat_ttl"])
+        self.spark_pool_lease_timeout = float(app_config["spark_session_pool"]["lease_timeout"])
+        self.spark_pool_probe_timeout = float(app_config["spark_session_pool"]["probe_timeout"])
+        self.spark_pool_executor_workers = int(app_config["spark_session_pool"]["executor_workers"])
+
+        # SQL result cache
+        self.sql_cache_enabled = bool(app_config["sql_result_cache"]["enabled"])
+        self.sql_cache_ttl = float(app_config["sql_result_cache"]["ttl"])
+        self.sql_cache_max_entries = int(app_config["sql_result_cache"]["max_entries"])
+        self.sql_cache_max_bytes = int(app_config["sql_result_cache"]["max_bytes"])
+        self.sql_cache_version_check_interval = float(app_config["sql_result_cache"]["version_check_interval"])
+
+        # Catalog metadata snapshot
+        self.catalog_snapshot_enabled = bool(app_config["catalog_snapshot"]["enabled"])
+        self.catalog_snapshot_refresh_interval = float(app_config["catalog_snapshot"]["refresh_interval"])
+        self.catalog_snapshot_sample_rows = int(app_config["catalog_snapshot"]["sample_rows"])
+        self.catalog_snapshot_persist_path = app_config["catalog_snapshot"]["persist_path"]
+
+        # Local SQL validation
+        self.sql_validator_enabled = bool(app_config["sql_validator"]["enabled"])
+        self.sql_validator_explain = bool(app_config["sql_validator"]["explain"])
+
+        # Query guard
+        self.query_guard_enabled = bool(app_config["query_guard"]["enabled"])
+        self.query_guard_max_scan_bytes = int(app_config["query_guard"]["max_scan_bytes"])
+        self.query_guard_exploratory_limit = int(app_config["query_guard"]["exploratory_limit"])
+        self.query_guard_sample = bool(app_config["query_guard"]["sample"])
+        self.query_guard_min_sample_percent = float(app_config["query_guard"]["min_sample_percent"])
+        self.query_guard_query_timeout = float(app_config["query_guard"]["query_timeout"])
+
+        # Query results
+        self.query_results_max_rows = int(app_config["query_results"]["max_rows"])
+        self.query_results_max_bytes = int(app_config["query_results"]["max_bytes"])
+        self.query_results_preview_tokens = int(app_config["query_results"]["preview_tokens"])
+        self.query_results_page_size = int(app_config["query_results"]["page_size"])
+        self.query_results_max_handles = int(app_config["query_results"]["max_handles"])
+        self.query_results_session_results = int(app_config["query_results"]["session_results"])
+        self.query_results_local_sql = bool(app_config["query_results"]["local_sql"])
+        self.query_results_local_sql_threads = int(app_config["query_results"]["local_sql_threads"])
+
+        # Semantic answer cache
+        self.semantic_cache_enabled = bool(app_config["semantic_cache"]["enabled"])
+        self.semantic_cache_threshold = float(app_config["semantic_cache"]["similarity_threshold"])
+        self.semantic_cache_ttl = float(app_config["semantic_cache"]["ttl"])
+        self.semantic_cache_max_entries = int(app_config["semantic_cache"]["max_entries"])
+        self.semantic_cache_min_words = int(app_config["semantic_cache"]["min_words"])
+        self.semantic_cache_rerun_sql = bool(app_config["semantic_cache"]["rerun_sql"])
+
+        # Embedding cache
+        self.embedding_cache_enabled = bool(app_config["embedding_cache"]["enabled"])
+        self.embedding_cache_memory_items = int(app_config["embedding_cache"]["memory_items"])
+        self.embedding_cache_disk_path = app_config["embedding_cache"]["disk_path"]
+        self.embedding_cache_disk_max_items = int(app_config["embedding_cache"]["disk_max_items"])
 
         # RAG Agent
         self.rag_agent_name = app_config["rag_agent"]["name"]
+        self.rag_agent_llm = app_config["rag_agent"]["llm"]
+        self.rag_agent_llm_temperature = app_config["rag_agent"]["llm_temperature"]
+        self.rag_agent_history_token_budget = int(app_config["rag_agent"]["history_token_budget"])
         self.rag_agent_embedding = app_config["rag_agent"]["embedding"]
         self.rag_agent_vs_table = app_config["rag_agent"]["vs_table"]
         self.rag_agent_vs_query = app_config["rag_agent"]["vs_query"]
+        self.rag_agent_vs_backend = app_config["rag_agent"]["vs_backend"]
+        self.rag_agent_hybrid_enabled = bool(app_config["rag_agent"]["hybrid"]["enabled"])
+        self.rag_agent_hybrid_k = int(app_config["rag_agent"]["hybrid"]["k"])
+        self.rag_agent_hybrid_fetch_k = int(app_config["rag_agent"]["hybrid"]["fetch_k"])
+        self.rag_agent_hybrid_rrf_k = int(app_config["rag_agent"]["hybrid"]["rrf_k"])
+        self.rag_agent_hybrid_bm25_weight = float(app_config["rag_agent"]["hybrid"]["bm25_weight"])
+        self.rag_agent_hybrid_vector_weight = float(app_config["rag_agent"]["hybrid"]["vector_weight"])
+        self.rag_agent_hybrid_reranker = app_config["rag_agent"]["hybrid"]["reranker"]
+        self.rag_agent_hybrid_cross_encoder_model = app_config["rag_agent"]["hybrid"]["cross_encoder_model"]
+        self.rag_agent_hybrid_refresh_interval = float(app_config["rag_agent"]["hybrid"]["refresh_interval"])
+        self.rag_agent_compression_enabled = bool(app_config["rag_agent"]["compression"]["enabled"])
+        self.rag_agent_compression_token_budget = int(app_config["rag_agent"]["compression"]["token_budget"])
+        self.rag_agent_compression_min_score = float(app_config["rag_agent"]["compression"]["min_score"])
+        self.rag_agent_compression_duplicate_threshold = float(app_config["rag_agent"]["compression"]["duplicate_threshold"])
+        self.rag_agent_local_vs_path = app_config["rag_agent"]["local_vs"]["path"]
+        self.rag_agent_local_vs_dtype = app_config["rag_agent"]["local_vs"]["dtype"]
+        self.rag_agent_local_vs_index = app_config["rag_agent"]["local_vs"]["index"]
+        self.rag_agent_local_vs_index_min_rows = int(app_config["rag_agent"]["local_vs"]["index_min_rows"])
+        self.rag_agent_local_vs_n_probe = int(app_config["rag_agent"]["local_vs"]["n_probe"])
+
+        # Document ingestion
+        self.ingestion_chunk_size = int(app_config["ingestion"]["chunk_size"])
+        self.ingestion_chunk_overlap = int(app_config["ingestion"]["chunk_overlap"])
+        self.ingestion_embed_batch_size = int(app_config["ingestion"]["embed_batch_size"])
+        self.ingestion_embed_concurrency = int(app_config["ingestion"]["embed_concurrency"])
+        self.ingestion_embed_requests_per_minute = int(app_config["ingestion"]["embed_requests_per_minute"])
+        self.ingestion_embedding_dim = int(app_config["ingestion"]["embedding_dim"])
+        self.ingestion_upsert_batch_size = int(app_config["ingestion"]["upsert_batch_size"])
+        self.ingestion_documents_table = app_config["ingestion"]["documents_table"]
+        self.ingestion_chunks_table = app_config["ingestion"]["chunks_table"]
+        self.ingestion_manifest_path = app_config["ingestion"]["manifest_path"]
 
         # Internet Search config
         self.tavily_search_max_results = int(app_config["tavily_search_api"]["max_search_results"])
 
+        # Web search layer
+        self.web_search_enabled = bool(app_config["web_search"]["enabled"])
+        self.web_search_max_queries = int(app_config["web_search"]["max_queries"])
+        self.web_search_concurrency = int(app_config["web_search"]["concurrency"])
+        self.web_search_cache_ttl = float(app_config["web_search"]["cache_ttl"])
+        self.web_search_cache_size = int(app_config["web_search"]["cache_size"])
+        self.web_search_disk_path = app_config["web_search"]["disk_path"]
+        self.web_search_digest_tokens = int(app_config["web_search"]["digest_tokens"])
+        self.web_search_snippet_chars = int(app_config["web_search"]["snippet_chars"])
+        self.web_search_near_duplicate_threshold = float(app_config["web_search"]["near_duplicate_threshold"])
+
+        # Scheduler
+        self.scheduler_enabled = bool(app_config["scheduler"]["enabled"])
+        self.scheduler_request_max_concurrency = int(app_config["scheduler"]["request"]["max_concurrency"])
+        self.scheduler_request_max_queue = int(app_config["scheduler"]["request"]["max_queue"])
+        self.scheduler_request_queue_timeout = float(app_config["scheduler"]["request"]["queue_timeout"])
+        self.scheduler_spark_max_concurrency = int(app_config["scheduler"]["spark"]["max_concurrency"])
+        self.scheduler_spark_max_queue = int(app_config["scheduler"]["spark"]["max_queue"])
+        self.scheduler_spark_queue_timeout = float(app_config["scheduler"]["spark"]["queue_timeout"])
+        self.scheduler_llm_max_concurrency = int(app_config["scheduler"]["llm"]["max_concurrency"])
+        self.scheduler_llm_max_queue = int(app_config["scheduler"]["llm"]["max_queue"])
+        self.scheduler_llm_queue_timeout = float(app_config["scheduler"]["llm"]["queue_timeout"])
+        self.scheduler_search_max_concurrency = int(app_config["scheduler"]["search"]["max_concurrency"])
+        self.scheduler_search_max_queue = int(app_config["scheduler"]["search"]["max_queue"])
+        self.scheduler_search_queue_timeout = float(app_config["scheduler"]["search"]["queue_timeout"])
+        self.scheduler_retrieval_max_concurrency = int(app_config["scheduler"]["retrieval"]["max_concurrency"])
+        self.scheduler_retrieval_max_queue = int(app_config["scheduler"]["retrieval"]["max_queue"])
+        self.scheduler_retrieval_queue_timeout = float(app_config["scheduler"]["retrieval"]["queue_timeout"])
+
+        # UI streaming
+        self.streaming_frame_rate = float(app_config["streaming"]["frame_rate"])
+
+        # Startup
+        self.startup_warm_up = bool(app_config["startup"]["warm_up"])
+        self.startup_parallel_init = bool(app_config["startup"]["parallel_init"])
+        self.startup_restore_timeout = float(app_config["startup"]["restore_timeout"])
+        self.startup_ready_path = app_config["startup"]["ready_path"]
+        self.startup_health_path = app_config["startup"]["health_path"]
+
+        # Instrumentation
+        self.instrumentation_enabled = bool(app_config["instrumentation"]["enabled"])
+        self.instrumentation_metrics_path = app_config["instrumentation"]["metrics_path"]
+        self.instrumentation_log_path = app_config["instrumentation"]["log_path"]
+        self.instrumentation_log_sample_rate = float(app_config["instrumentation"]["log_sample_rate"])
+        self.instrumentation_verbose = bool(app_config["instrumentation"]["verbose"])
+
         # LangGraph configs
         self.thread_id = str(app_config["graph_configs"]["thread_id"])
+        self.checkpointer_max_threads = int(app_config["graph_configs"]["checkpointer"]["max_threads"])
+        self.checkpointer_idle_ttl = float(app_config["graph_configs"]["checkpointer"]["idle_ttl"])
+        self.checkpointer_keep_checkpoints = int(app_config["graph_configs"]["checkpointer"]["keep_checkpoints"])
+        self.checkpointer_sqlite_path = app_config["graph_configs"]["checkpointer"]["sqlite_path"]
+        self.checkpointer_disk_ttl = float(app_config["graph_configs"]["checkpointer"]["disk_ttl"])
+
 
+@lru_cache(maxsize=None)
+def get_tools_config() -> LoadToolsConfig:
+    """The process wide config, the YAML and `.env` files are only parsed on the first call."""
+    return LoadToolsConfig()
@@ -4,9 +4,20 @@ from pyspark.sql import SparkSession
 from pyprojroot import here
 
 from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+from functools import partial
+import contextvars
+import threading
 import asyncio
 import os
 
+from ..load_config import get_tools_config
+from .spark_pool import SparkSessionPool
+
+TOOLS_CFG = get_tools_config()
+
+T = TypeVar("T")
+
 
 def create_directory(directory_path: str) -> None:
     """
@@ -25,40 +36,63 @@ def create_directory(directory_path: str) -> None:
         os.makedirs(here(directory_path))
 
 
-executor = ThreadPoolExecutor()
-spark: SparkSession | None = None  # cached global session
+# Bounded pool for blocking Spark Connect calls made from the async tool path.
+executor = ThreadPoolExecutor(max_workers=TOOLS_CFG.spark_pool_executor_workers, thread_name_prefix="spark-tools")
+_spark_pool: SparkSessionPool | None = None
+_spark_pool_lock = threading.Lock()
+
 
 def _new_spark_session() -> SparkSession:
-    """Blocking init/reinit of SparkSession."""
+    """Blocking creation of a dedicated Databricks Connect session for the pool."""
     try:
-        return DatabricksSession.builder.getOrCreate()
-    except SparkConnectGrpcException:
         return DatabricksSession.builder.create()
+    except SparkConnectGrpcException:
+        return DatabricksSession.builder.getOrCreate()
 
-async def get_spark_session_async() -> SparkSession:
-    global spark
-    loop = asyncio.get_event_loop()
 
-    # If no session yet, create one
-    if spark is None:
-        spark = await loop.run_in_executor(executor, _new_spark_session)
-        return spark
+def get_spark_pool() -> SparkSessionPool:
+    """Returns the process wide SparkSessionPool, creating it on first use."""
+    global _spark_pool
+    if _spark_pool is None:
+        with _spark_pool_lock:
+            if _spark_pool is None:
+                _spark_pool = SparkSessionPool(
+                    session_factory=_new_spark_session,
+                    catalog=os.environ.get("UC_CATALOG_NAME", "tpch"),
+                    schema=os.environ.get("UC_SCHEMA_NAME", "bronze"),
+                    max_sessions=TOOLS_CFG.spark_pool_max_sessions,
+                    heartbeat_ttl=TOOLS_CFG.spark_pool_heartbeat_ttl,
+                    lease_timeout=TOOLS_CFG.spark_pool_lease_timeout,
+                    probe_timeout=TOOLS_CFG.spark_pool_probe_timeout,
+                )
+    return _spark_pool
 
-    # Validate session by running a trivial query
-    try:
-        await loop.run_in_executor(executor, lambda: spark.sql("SELECT 1").collect())
-    except SparkConnectGrpcException:
-        spark = await loop.run_in_executor(executor, _new_spark_session)
 
-    return spark
+def set_spark_pool(pool: SparkSessionPool) -> SparkSessionPool | None:
+    """Replaces the process wide SparkSessionPool (e.g. with local sessions), returns the previous one."""
+    global _spark_pool
+    with _spark_pool_lock:
+        previous, _spark_pool = _spark_pool, pool
+    return previous
+
 
 def get_spark_session_sync() -> SparkSession:
-    global spark
-    if spark is None:
-        spark = _new_spark_session()
-    
-    try:
-        test_run = spark.sql("SELECT 1").collect()
-    except SparkConnectGrpcException:
-        spark = _new_spark_session()
-    return spark
\ No newline at end of file
+    """
+    Returns a live pooled SparkSession for ad-hoc use.
+
+    The session is not leased, use `get_spark_pool().lease()` when the caller needs
+    exclusive use of a session or wants broken sessions to be replaced.
+    """
+    with get_spark_pool().lease() as pooled:
+        return pooled.session
+
+
+async def run_blocking(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Runs a blocking call on the bounded `executor`, keeping the caller's context variables."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(executor, ctx.run, partial(fn, *args, **kwargs))
+
+
+async def get_spark_session_async() -> SparkSession:
+    return await run_blocking(get_spark_session_sync)
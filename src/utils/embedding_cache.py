@@ -0,0 +1,323 @@
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from langchain_core.embeddings import Embeddings
+from pyprojroot import here
+import numpy as np
+
+from typing import Any, Dict, List, Tuple
+from collections import OrderedDict
+from pathlib import Path
+import threading
+import asyncio
+import hashlib
+import sqlite3
+import time
+
+from ..load_config import get_tools_config
+
+TOOLS_CFG = get_tools_config()
+
+
+class DiskEmbeddingStore:
+    """
+    Persistent embedding tier: one memory-mapped float32 matrix per vector dimension plus
+    a SQLite key index (key -> row slot). At most `max_items` vectors are kept, the least
+    recently used ones are dropped and their slots reused. Safe to share between threads,
+    reads and writes are serialized by the store's own lock.
+    """
+
+    def __init__(self, path: str | Path, max_items: int = 200_000) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_items = max_items
+        self._db = sqlite3.connect(str(self.path / "index.sqlite"), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, dim INTEGER, slot INTEGER, last_used REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._db.commit()
+        self._matrices: Dict[int, np.memmap] = {}
+        self._free: Dict[int, List[int]] = {}
+        self._next_slot: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def _count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _matrix(self, dim: int, min_rows: int = 0) -> np.memmap:
+        """The matrix of `dim` vectors, grown (doubling) to hold at least `min_rows` rows."""
+        file = self.path / f"vectors_{dim}.f32"
+        if dim not in self._next_slot:
+            if not file.exists():
+                file.write_bytes(b"")
+            rows = file.stat().st_size // (4 * dim)
+            if rows:
+                self._matrices[dim] = np.memmap(file, dtype=np.float32, mode="r+", shape=(rows, dim))
+            used = {slot for (slot,) in self._db.execute("SELECT slot FROM embeddings WHERE dim = ?", (dim,))}
+            self._next_slot[dim] = max(used, default=-1) + 1
+            self._free[dim] = [slot for slot in range(self._next_slot[dim]) if slot not in used]
+
+        matrix = self._matrices.get(dim)
+
+        rows = 0 if matrix is None else matrix.shape[0]
+        if min_rows > rows:
+            capacity = max(rows * 2, min_rows, 1024)
+            if matrix is not None:
+                matrix.flush()
+                del matrix
+            with open(file, "r+b") as f:
+                f.truncate(capacity * 4 * dim)
+            matrix = np.memmap(file, dtype=np.float32, mode="r+", shape=(capacity, dim))
+        if matrix is not None:
+            self._matrices[dim] = matrix
+        return matrix
+
+    def get(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        with self._lock:
+            return self._get(keys)
+
+    def _get(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT key, dim, slot FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            for key, dim, slot in rows:
+                found[key] = np.array(self._matrix(dim)[slot])
+        if found:
+            now = time.time()
+            self._db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+            self._db.commit()
+        return found
+
+    def put(self, items: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            self._put(items)
+
+    def _put(self, items: Dict[str, np.ndarray]) -> None:
+        now = time.time()
+        keys = list(items)
+        # A key stored meanwhile (two concurrent misses) keeps its slot.
+        existing = {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            query = f"SELECT key, dim, slot FROM embeddings WHERE key IN ({','.join('?' * len(batch))})"
+            existing.update({key: (dim, slot) for key, dim, slot in self._db.execute(query, batch)})
+
+        rows = []
+        written = set()
+        for key, vector in items.items():
+            dim = len(vector)
+            self._matrix(dim)
+            if key in existing and existing[key][0] == dim:
+                slot = existing[key][1]
+            elif self._free[dim]:
+                slot = self._free[dim].pop()
+            else:
+                slot = self._next_slot[dim]
+                self._next_slot[dim] += 1
+            matrix = self._matrix(dim, min_rows=slot + 1)
+            matrix[slot] = vector
+            rows.append((key, dim, slot, now))
+            written.add(dim)
+        for dim in written:
+            self._matrices[dim].flush()
+        self._db.executemany("INSERT OR REPLACE INTO embeddings (key, dim, slot, last_used) VALUES (?, ?, ?, ?)", rows)
+        self._db.commit()
+        self._evict()
+
+    def _evict(self) -> None:
+        overflow = self._count() - self.max_items
+        if overflow <= 0:
+            return
+        # Drops a tenth more than needed so eviction does not run on every insert.
+        stale = self._db.execute(
+            "SELECT key, dim, slot FROM embeddings ORDER BY last_used LIMIT ?", (overflow + self.max_items // 10,)
+        ).fetchall()
+        self._db.executemany("DELETE FROM embeddings WHERE key = ?", [(key,) for key, _, _ in stale])
+        self._db.commit()
+        for _, dim, slot in stale:
+            self._free.setdefault(dim, []).append(slot)
+        self.evictions += len(stale)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper with an in-memory LRU tier and an optional on-disk tier.
+
+    Vectors are keyed by (model, output dimension, query/document task, text hash), so a
+    model or dimension change never serves a stale vector. Only texts missing from both
+    tiers are sent to the wrapped embeddings, in one batched call. The disk tier is read
+    and written outside the memory tier's lock, and from a worker thread on the async paths.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        memory_items: int = 4096,
+        disk_path: str | Path | None = None,
+        disk_max_items: int = 200_000,
+    ) -> None:
+        self.embeddings = embeddings
+        self.model = str(getattr(embeddings, "model", type(embeddings).__name__))
+        self.memory_items = memory_items
+        self.disk = DiskEmbeddingStore(disk_path, disk_max_items) if disk_path else None
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _key(self, text: str, kind: str, kwargs: Dict[str, Any]) -> str:
+        options = ",".join(f"{k}={kwargs[k]}" for k in sorted(kwargs) if k != "batch_size")
+        return hashlib.sha256(f"{self.model}|{options}|{kind}|{text}".encode()).hexdigest()
+
+    def _lookup_memory(self, keys: List[str]) -> Tuple[Dict[str, np.ndarray], List[str]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+            self._counters["memory_hits"] += len(found)
+        return found, [key for key in dict.fromkeys(keys) if key not in found]
+
+    def _lookup_disk(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        if self.disk is None or not keys:
+            return {}
+        from_disk = self.disk.get(keys)
+        with self._lock:
+            self._counters["disk_hits"] += len(from_disk)
+            self._remember(from_disk)
+        return from_disk
+
+    def _remember(self, items: Dict[str, np.ndarray]) -> None:
+        for key, vector in items.items():
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _store(self, items: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            self._counters["misses"] += len(items)
+            self._remember(items)
+
+    def _persist(self, items: Dict[str, np.ndarray]) -> None:
+        if self.disk is not None and items:
+            self.disk.put(items)
+
+    def _keys(self, texts: List[str], kind: str, kwargs: Dict[str, Any]) -> List[str]:
+        return [self._key(text, kind, kwargs) for text in texts]
+
+    @staticmethod
+    def _missing(texts: List[str], keys: List[str], found: Dict[str, np.ndarray]) -> List[str]:
+        return list(dict.fromkeys(text for text, key in zip(texts, keys) if key not in found))
+
+    def _plan(self, texts: List[str], kind: str, kwargs: Dict[str, Any]) -> Tuple[List[str], Dict[str, np.ndarray], List[str]]:
+        keys = self._keys(texts, kind, kwargs)
+        found, not_in_memory = self._lookup_memory(keys)
+        found.update(self._lookup_disk(not_in_memory))
+        return keys, found, self._missing(texts, keys, found)
+
+    async def _aplan(self, texts: List[str], kind: str, kwargs: Dict[str, Any]) -> Tuple[List[str], Dict[str, np.ndarray], List[str]]:
+        keys = self._keys(texts, kind, kwargs)
+        found, not_in_memory = self._lookup_memory(keys)
+        if self.disk is not None and not_in_memory:
+            found.update(await asyncio.to_thread(self._lookup_disk, not_in_memory))
+        return keys, found, self._missing(texts, keys, found)
+
+    def _assemble(self, keys: List[str], found: Dict[str, np.ndarray], missing: List[str], vectors: List[List[float]], kind: str, kwargs: Dict[str, Any]) -> Tuple[List[List[float]], Dict[str, np.ndarray]]:
+        """The vectors of `keys` and the newly embedded ones, which the caller persists."""
+        new = {self._key(text, kind, kwargs): np.asarray(vector, dtype=np.float32) for text, vector in zip(missing, vectors)}
+        if new:
+            self._store(new)
+        found.update(new)
+        return [found[key].tolist() for key in keys], new
+
+    def embed_documents(self, texts: List[str], **kwargs: Any) -> List[List[float]]:
+        keys, found, missing = self._plan(texts, "document", kwargs)
+        vectors = self.embeddings.embed_documents(missing, **kwargs) if missing else []
+        result, new = self._assemble(keys, found, missing, vectors, "document", kwargs)
+        self._persist(new)
+        return result
+
+    async def aembed_documents(self, texts: List[str], **kwargs: Any) -> List[List[float]]:
+        keys, found, missing = await self._aplan(texts, "document", kwargs)
+        vectors = await self.embeddings.aembed_documents(missing, **kwargs) if missing else []
+        result, new = self._assemble(keys, found, missing, vectors, "document", kwargs)
+        if self.disk is not None and new:
+            await asyncio.to_thread(self._persist, new)
+        return result
+
+    def embed_query(self, text: str, **kwargs: Any) -> List[float]:
+        keys, found, missing = self._plan([text], "query", kwargs)
+        vectors = [self.embeddings.embed_query(text, **kwargs)] if missing else []
+        result, new = self._assemble(keys, found, missing, vectors, "query", kwargs)
+        self._persist(new)
+        return result[0]
+
+    async def aembed_query(self, text: str, **kwargs: Any) -> List[float]:
+        keys, found, missing = await self._aplan([text], "query", kwargs)
+        vectors = [await self.embeddings.aembed_query(text, **kwargs)] if missing else []
+        result, new = self._assemble(keys, found, missing, vectors, "query", kwargs)
+        if self.disk is not None and new:
+            await asyncio.to_thread(self._persist, new)
+        return result[0]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            counters = dict(self._counters)
+            memory_items = len(self._memory)
+        lookups = sum(counters.values())
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        return {
+            **counters,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "memory_items": memory_items,
+            "disk_items": len(self.disk) if self.disk is not None else 0,
+            "disk_evictions": self.disk.evictions if self.disk is not None else 0,
+        }
+
+
+class FixedDimensionEmbeddings(Embeddings):
+    """Passes `output_dimensionality` on every call, so vectors fit a fixed size pgvector column."""
+
+    def __init__(self, embeddings: Embeddings, dimension: int) -> None:
+        self.embeddings = embeddings
+        self.dimension = dimension
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts, output_dimensionality=self.dimension)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts, output_dimensionality=self.dimension)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text, output_dimensionality=self.dimension)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text, output_dimensionality=self.dimension)
+
+
+_embeddings: Embeddings | None = None
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings() -> Embeddings:
+    """Returns the process wide (cached) document/query embeddings, creating them on first use."""
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                embeddings = GoogleGenerativeAIEmbeddings(model=TOOLS_CFG.rag_agent_embedding)
+                if TOOLS_CFG.embedding_cache_enabled:
+                    embeddings = CachedEmbeddings(
+                        embeddings,
+                        memory_items=TOOLS_CFG.embedding_cache_memory_items,
+                        disk_path=here(TOOLS_CFG.embedding_cache_disk_path) if TOOLS_CFG.embedding_cache_disk_path else None,
+                        disk_max_items=TOOLS_CFG.embedding_cache_disk_max_items,
+                    )
+                _embeddings = embeddings
+    return _embeddings
@@ -0,0 +1,310 @@
+from langchain_core.runnables.config import var_child_runnable_config
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from starlette.responses import PlainTextResponse
+from starlette.requests import Request
+from starlette.routing import Route
+from pyprojroot import here
+
+from typing import Any, Callable, Dict, List, Tuple
+from collections import defaultdict
+from pathlib import Path
+from uuid import UUID
+import threading
+import random
+import json
+import time
+import re
+
+from ..load_config import get_tools_config
+
+TOOLS_CFG = get_tools_config()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class MetricsRegistry:
+    """
+    Latency histograms, counters and `stats()` providers rendered in the Prometheus text
+    exposition format. Providers are the `stats()` methods of the caches / pools, read at
+    scrape time so they cost nothing on the request path.
+    """
+
+    def __init__(self, prefix: str = "lakehouse", buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.prefix = prefix
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Labels, List[float]]] = defaultdict(dict)
+        self._counters: Dict[str, Dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self._providers: Dict[Tuple[str, Labels], Callable[[], Dict[str, Any]]] = {}
+
+    def observe(self, metric: str, seconds: float, **labels: str) -> None:
+        """Adds `seconds` to histogram `metric`; the series keeps bucket counts, then sum and count."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms[metric].get(key)
+            if series is None:
+                series = self._histograms[metric][key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def inc(self, metric: str, amount: float = 1.0, **labels: str) -> None:
+        with self._lock:
+            self._counters[metric][tuple(sorted(labels.items()))] += amount
+
+    def register_stats(self, name: str, provider: Callable[[], Dict[str, Any]], **labels: str) -> None:
+        """Exports the numeric values of `provider()` as gauges `<prefix>_<name>_<key>`."""
+        with self._lock:
+            self._providers[(name, tuple(sorted(labels.items())))] = provider
+
+    def _gauges(self) -> Dict[str, Dict[Labels, float]]:
+        with self._lock:
+            providers = list(self._providers.items())
+        gauges: Dict[str, Dict[Labels, float]] = defaultdict(dict)
+        for (name, labels), provider in providers:
+            try:
+                values = provider()
+            except Exception as e:
+                print(f"Metrics provider {name} failed: {e}")
+                continue
+            for key, value in values.items():
+                # Nested stats (e.g. per agent) become a `key` label.
+                nested = value if isinstance(value, dict) else {None: value}
+                for inner_key, inner in nested.items():
+                    if isinstance(inner, (int, float)):
+                        metric = _metric_name(f"{self.prefix}_{name}_{inner_key if inner_key is not None else key}")
+                        series = labels + ((("key", str(key)),) if inner_key is not None else ())
+                        gauges[metric][series] = float(inner)
+        return gauges
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            histograms = {name: {k: list(v) for k, v in series.items()} for name, series in self._histograms.items()}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+
+        for name, series in sorted(histograms.items()):
+            metric = _metric_name(f"{self.prefix}_{name}_seconds")
+            lines.append(f"# TYPE {metric} histogram")
+            for labels, values in series.items():
+                for bound, count in zip(self.buckets + ("+Inf",), values[:-2] + values[-1:]):
+                    le = f'le="{bound}"'
+                    lines.append(f"{metric}_bucket{_format_labels(labels, le)} {count:g}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {values[-2]:.6f}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {values[-1]:g}")
+
+        for name, series in sorted(counters.items()):
+            metric = _metric_name(f"{self.prefix}_{name}_total")
+            lines.append(f"# TYPE {metric} counter")
+            lines += [f"{metric}{_format_labels(labels)} {value:g}" for labels, value in series.items()]
+
+        for metric, series in sorted(self._gauges().items()):
+            lines.append(f"# TYPE {metric} gauge")
+            lines += [f"{metric}{_format_labels(labels)} {value:g}" for labels, value in series.items()]
+        return "\n".join(lines) + "\n"
+
+
+class SampledEventLog:
+    """
+    JSON lines log of timing events. Sampling is decided once per request (root run), so a
+    sampled request has all of its node / LLM / tool / Spark events logged.
+    """
+
+    def __init__(self, path: str | Path | None, sample_rate: float = 0.05) -> None:
+        self.path = Path(path) if path else None
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._roots: Dict[UUID, Tuple[UUID, bool]] = {}
+
+    def start(self, run_id: UUID, parent_run_id: UUID | None) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            parent = self._roots.get(parent_run_id) if parent_run_id is not None else None
+            self._roots[run_id] = parent or (run_id, random.random() < self.sample_rate)
+
+    def end(self, run_id: UUID) -> Tuple[UUID, bool] | None:
+        with self._lock:
+            return self._roots.pop(run_id, None)
+
+    def sampled(self, run_id: UUID | None) -> Tuple[UUID, bool] | None:
+        with self._lock:
+            return self._roots.get(run_id) if run_id is not None else None
+
+    def write(self, root: Tuple[UUID, bool] | None, event: Dict[str, Any]) -> None:
+        if self.path is None or root is None or not root[1]:
+            return
+        record = {"ts": round(time.time(), 3), "request": str(root[0]), **event}
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+
+def node_path(metadata: Dict[str, Any], name: str) -> str:
+    """`parent/child` path of a graph node from its checkpoint namespace, e.g. `spark_sql_agent/tools`."""
+    path = [part.split(":")[0] for part in (metadata.get("checkpoint_ns") or "").split("|") if part]
+    if not path or path[-1] != name:
+        path.append(name)
+    return "/".join(path)
+
+
+def _tags(metadata: Dict[str, Any] | None) -> Dict[str, str]:
+    metadata = metadata or {}
+    return {key: metadata[key] for key in ("session_id", "thread_id") if metadata.get(key)}
+
+
+class InstrumentationHandler(BaseCallbackHandler):
+    """
+    Callback handler timing graph nodes, LLM calls (time to first token, total, tokens in /
+    out), tools and retrievers into METRICS, and logging sampled requests event by event,
+    tagged with their session and thread.
+    """
+
+    run_inline = True
+
+    def __init__(self, metrics: "MetricsRegistry", log: SampledEventLog) -> None:
+        self.metrics = metrics
+        self.log = log
+        self._lock = threading.Lock()
+        self._runs: Dict[UUID, Dict[str, Any]] = {}
+
+    def _start(self, run_id: UUID, kind: str, name: str, metadata: Dict[str, Any] | None, **extra: Any) -> None:
+        with self._lock:
+            self._runs[run_id] = {"kind": kind, "name": name, "started": time.perf_counter(), "tags": _tags(metadata), **extra}
+
+    def _end(self, run_id: UUID, error: BaseException | None = None, **fields: Any) -> Dict[str, Any] | None:
+        root = self.log.end(run_id)
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return None
+        seconds = time.perf_counter() - run["started"]
+        self.metrics.observe(run["kind"], seconds, name=run["name"])
+        # Handoffs (ParentCommand) surface as node errors but are normal control flow.
+        if error is not None and type(error).__name__ != "ParentCommand":
+            self.metrics.inc("errors", kind=run["kind"], name=run["name"])
+            fields["error"] = type(error).__name__
+        self.log.write(root, {"event": run["kind"], "name": run["name"], "ms": round(seconds * 1000, 3), **run["tags"], **fields})
+        return run
+
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Dict[str, Any], *, run_id: UUID, parent_run_id: UUID | None = None, metadata: Dict[str, Any] | None = None, **kwargs: Any) -> None:
+        self.log.start(run_id, parent_run_id)
+        name = kwargs.get("name") or (serialized or {}).get("name", "")
+        # Only node runs, not the runnables they are made of.
+        if not metadata or metadata.get("langgraph_node") != name:
+            return
+        path = node_path(metadata, name)
+        with self._lock:
+            parent = self._runs.get(parent_run_id)
+        # A node wrapping an agent shows up again as the wrapper and the agent subgraph.
+        if parent is None or parent["name"] != path:
+            self._start(run_id, "node", path, metadata)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, parent_run_id: UUID | None = None, metadata: Dict[str, Any] | None = None, **kwargs: Any) -> None:
+        self.log.start(run_id, parent_run_id)
+        self._start(run_id, "tool", kwargs.get("name") or (serialized or {}).get("name", "tool"), metadata)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    def on_retriever_start(self, serialized: Dict[str, Any], query: str, *, run_id: UUID, parent_run_id: UUID | None = None, metadata: Dict[str, Any] | None = None, **kwargs: Any) -> None:
+        self.log.start(run_id, parent_run_id)
+        self._start(run_id, "retriever", kwargs.get("name") or (serialized or {}).get("name", "retriever"), metadata)
+
+    def on_retriever_end(self, documents: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, documents=len(documents))
+
+    def on_retriever_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, parent_run_id: UUID | None = None, metadata: Dict[str, Any] | None = None, **kwargs: Any) -> None:
+        self.log.start(run_id, parent_run_id)
+        metadata = metadata or {}
+        model = metadata.get("ls_model_name") or (serialized or {}).get("name", "llm")
+        self._start(run_id, "llm", model, metadata, node=node_path(metadata, metadata.get("langgraph_node", "llm")), first_token=None)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None or run["first_token"] is not None:
+                return
+            run["first_token"] = time.perf_counter() - run["started"]
+        self.metrics.observe("llm_ttft", run["first_token"], name=run["name"])
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        usage = {"input_tokens": 0, "output_tokens": 0}
+        for generations in response.generations:
+            for generation in generations:
+                message_usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                for key in usage:
+                    usage[key] += message_usage.get(key, 0)
+        with self._lock:
+            run = self._runs.get(run_id)
+        if run is None:
+            self.log.end(run_id)
+            return
+        for key, value in usage.items():
+            self.metrics.inc("llm_tokens", value, name=run["name"], direction=key.split("_")[0])
+        ttft = run["first_token"]
+        self._end(run_id, node=run["node"], ttft_ms=round(ttft * 1000, 3) if ttft is not None else None, **usage)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+
+METRICS = MetricsRegistry()
+EVENT_LOG = SampledEventLog(
+    here(TOOLS_CFG.instrumentation_log_path) if TOOLS_CFG.instrumentation_log_path else None,
+    sample_rate=TOOLS_CFG.instrumentation_log_sample_rate,
+)
+INSTRUMENTATION = InstrumentationHandler(METRICS, EVENT_LOG) if TOOLS_CFG.instrumentation_enabled else None
+
+
+def record_timing(kind: str, name: str, seconds: float, **fields: Any) -> None:
+    """
+    Observes a timing taken outside the callbacks (e.g. the Spark query phases). It is
+    logged with the session / thread of the enclosing tool run when that request is sampled.
+    """
+    if INSTRUMENTATION is None:
+        return
+    METRICS.observe(kind, seconds, name=name)
+    config = var_child_runnable_config.get() or {}
+    root = EVENT_LOG.sampled(getattr(config.get("callbacks"), "parent_run_id", None))
+    EVENT_LOG.write(root, {"event": kind, "name": name, "ms": round(seconds * 1000, 3), **_tags(config.get("metadata")), **fields})
+
+
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+
+def metrics_routes() -> List[Route]:
+    """The Prometheus scrape route, served by the Gradio app (`demo.launch(app_kwargs={"routes": ...})`)."""
+    if INSTRUMENTATION is None:
+        return []
+    return [Route(TOOLS_CFG.instrumentation_metrics_path, metrics_endpoint)]
@@ -0,0 +1,518 @@
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable
+from pydantic import ConfigDict
+import httpx
+
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Tuple
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+import threading
+import asyncio
+import heapq
+import time
+
+from ..load_config import get_tools_config
+from .instrumentation import METRICS
+from .scheduler import SCHEDULER
+from .tokens import estimate_tokens
+
+TOOLS_CFG = get_tools_config()
+
+# Calls are not traced twice: the gateway model is the run the graph's callbacks see.
+_UNTRACED = {"callbacks": []}
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """True for HTTP 429 / provider RateLimitError, whichever client library raised it."""
+    if getattr(exc, "status_code", None) == 429 or getattr(getattr(exc, "response", None), "status_code", None) == 429:
+        return True
+    return "RateLimit" in type(exc).__name__
+
+
+def retry_after(exc: BaseException) -> float | None:
+    """Seconds from the `retry-after` header of a 429 response, if the provider sent one."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units per minute up to `capacity`. `reserve` takes the units right
+    away (the level may go negative) and returns how long the caller has to wait, so the
+    waits of concurrent callers queue up behind each other. `per_minute <= 0` disables it.
+    """
+
+    def __init__(self, per_minute: float, capacity: float | None = None) -> None:
+        self.rate = per_minute / 60
+        self.capacity = capacity or per_minute
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            self._level -= min(amount, self.capacity)
+            return max(0.0, -self._level / self.rate)
+
+    def refund(self, amount: float) -> None:
+        """Gives back over-reserved units (negative `amount` charges an under-estimate)."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self._level = min(self.capacity, self._level + amount)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    wake: Callable[[], None] = field(compare=False)
+    granted: bool = field(default=False, compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+class PriorityGate:
+    """
+    At most `max_concurrency` holders; waiting threads and coroutines are admitted lowest
+    `priority` first (FIFO within a priority).
+    """
+
+    def __init__(self, max_concurrency: int) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(not waiter.cancelled for waiter in self._waiters)
+
+    def _enqueue(self, priority: int, wake: Callable[[], None]) -> _Waiter:
+        with self._lock:
+            self._seq += 1
+            waiter = _Waiter(priority, self._seq, wake)
+            heapq.heappush(self._waiters, waiter)
+            self._grant()
+        return waiter
+
+    def _grant(self) -> None:
+        while self._active < self.max_concurrency and self._waiters:
+            waiter = heapq.heappop(self._waiters)
+            if waiter.cancelled:
+                continue
+            self._active += 1
+            waiter.granted = True
+            waiter.wake()
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        with self._lock:
+            waiter.cancelled = True
+            if waiter.granted:
+                self._active -= 1
+                self._grant()
+
+    def acquire(self, priority: int, timeout: float | None = None) -> None:
+        event = threading.Event()
+        waiter = self._enqueue(priority, event.set)
+        if not event.wait(timeout):
+            # A slot granted at the last moment is handed on, not leaked.
+            self._abandon(waiter)
+            raise TimeoutError(f"No LLM call slot within {timeout:g}s")
+
+    async def aacquire(self, priority: int, timeout: float | None = None) -> None:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = self._enqueue(priority, wake)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            self._abandon(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                raise TimeoutError(f"No LLM call slot within {timeout:g}s") from e
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            self._active -= 1
+            self._grant()
+
+
+class ModelLimiter:
+    """
+    Client side limits of one provider model: calls in flight, requests and tokens per
+    minute. Calls wait in priority order; a 429 marks the model throttled for a cooldown.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_concurrency: int = 8,
+        queue_timeout: float | None = None,
+    ) -> None:
+        self.name = name
+        self.gate = PriorityGate(max_concurrency)
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.queue_timeout = queue_timeout
+        self.throttled_until = 0.0
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "throttled": 0, "fallbacks": 0, "queue_timeouts": 0}
+        self._wait_seconds = 0.0
+
+    @property
+    def throttled(self) -> bool:
+        return time.monotonic() < self.throttled_until
+
+    def throttle(self, seconds: float) -> None:
+        with self._lock:
+            self.throttled_until = max(self.throttled_until, time.monotonic() + seconds)
+            self._counts["throttled"] += 1
+        METRICS.inc("llm_throttled", model=self.name)
+        print(f"LLM {self.name} throttled (429), cooling down for {seconds:g}s")
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+    def _admitted(self, priority: int, started: float) -> None:
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._counts["calls"] += 1
+            self._wait_seconds += waited
+        METRICS.observe("llm_queue_wait", waited, model=self.name, priority=str(priority))
+
+    def settle(self, reserved: int, message: BaseMessage | None) -> None:
+        """Corrects the token reservation with the usage the provider reported."""
+        usage = getattr(message, "usage_metadata", None)
+        if usage and usage.get("total_tokens"):
+            self.tokens.refund(reserved - usage["total_tokens"])
+
+    @contextmanager
+    def slot(self, priority: int, tokens: int) -> Iterator[None]:
+        # The scheduler's `llm` slot keeps sessions fair, the gate orders by priority per model.
+        with SCHEDULER.slot("llm"):
+            started = time.perf_counter()
+            try:
+                self.gate.acquire(priority, self.queue_timeout)
+            except TimeoutError:
+                self.count("queue_timeouts")
+                raise
+            try:
+                # The slot is held while pacing, so lower priority calls keep waiting behind.
+                time.sleep(max(self.requests.reserve(1), self.tokens.reserve(tokens)))
+                self._admitted(priority, started)
+                yield
+            finally:
+                self.gate.release()
+
+    @asynccontextmanager
+    async def aslot(self, priority: int, tokens: int) -> AsyncIterator[None]:
+        async with SCHEDULER.aslot("llm"):
+            started = time.perf_counter()
+            try:
+                await self.gate.aacquire(priority, self.queue_timeout)
+            except TimeoutError:
+                self.count("queue_timeouts")
+                raise
+            try:
+                await asyncio.sleep(max(self.requests.reserve(1), self.tokens.reserve(tokens)))
+                self._admitted(priority, started)
+                yield
+            finally:
+                self.gate.release()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            calls = self._counts["calls"]
+            return {
+                **self._counts,
+                "queued": self.gate.queued,
+                "throttled_now": int(self.throttled),
+                "avg_queue_wait_ms": round(1000 * self._wait_seconds / calls, 2) if calls else 0.0,
+            }
+
+
+@dataclass
+class _Route:
+    model: Runnable
+    limiter: ModelLimiter
+
+
+class GatewayChatModel(BaseChatModel):
+    """
+    Chat model calling `primary` through its `ModelLimiter`.
+
+    While the primary is throttled (it answered 429) calls go to `fallback`; without a
+    fallback they wait for the cooldown and retry up to `max_retries` times. Only calls
+    that have not streamed anything yet are moved to the fallback.
+    `bind_tools` / `with_structured_output` bind both models, so agents use it like any
+    chat model. Lower `priority` is served first when calls queue (the router is 0).
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    primary: Runnable
+    primary_limiter: ModelLimiter
+    fallback: Runnable | None = None
+    fallback_limiter: ModelLimiter | None = None
+    priority: int = 0
+    max_retries: int = 2
+    throttle_cooldown: float = 30.0
+    output_token_estimate: int = 512
+
+    @property
+    def _llm_type(self) -> str:
+        return "llm-gateway"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"primary": self.primary_limiter.name, "fallback": self.fallback_limiter.name if self.fallback_limiter else None}
+
+    def bind_tools(self, tools, **kwargs) -> "GatewayChatModel":
+        return self.model_copy(update={
+            "primary": self.primary.bind_tools(tools, **kwargs),
+            "fallback": self.fallback.bind_tools(tools, **kwargs) if self.fallback is not None else None,
+        })
+
+    def _estimate(self, messages: List[BaseMessage]) -> int:
+        return sum(estimate_tokens(m.content if isinstance(m.content, str) else str(m.content)) for m in messages) + self.output_token_estimate
+
+    def _routes(self) -> Tuple[List[_Route], float]:
+        """Routes to try now, or none and the seconds until the primary's cooldown ends."""
+        primary = _Route(self.primary, self.primary_limiter)
+        fallback = _Route(self.fallback, self.fallback_limiter) if self.fallback is not None else None
+        routes = [route for route in (primary, fallback) if route is not None and not route.limiter.throttled]
+        return routes, max(0.0, self.primary_limiter.throttled_until - time.monotonic())
+
+    def _use(self, route: _Route) -> None:
+        if route.limiter is not self.primary_limiter:
+            self.primary_limiter.count("fallbacks")
+            METRICS.inc("llm_fallbacks", model=self.primary_limiter.name, fallback=route.limiter.name)
+
+    def _throttled(self, route: _Route, exc: BaseException) -> None:
+        route.limiter.throttle(retry_after(exc) or self.throttle_cooldown)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: List[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._estimate(messages)
+        error: BaseException | None = None
+        for _ in range(self.max_retries + 1):
+            routes, cooldown = self._routes()
+            if not routes:
+                time.sleep(cooldown)
+                continue
+            for route in routes:
+                self._use(route)
+                try:
+                    with route.limiter.slot(self.priority, tokens):
+                        message = route.model.invoke(messages, _UNTRACED, stop=stop, **kwargs)
+                except Exception as e:
+                    if not is_rate_limited(e):
+                        raise
+                    self._throttled(route, e)
+                    error = e
+                    continue
+                route.limiter.settle(tokens, message)
+                return ChatResult(generations=[ChatGeneration(message=message)])
+        raise error or TimeoutError(f"LLM {self.primary_limiter.name} stayed throttled")
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: List[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._estimate(messages)
+        error: BaseException | None = None
+        for _ in range(self.max_retries + 1):
+            routes, cooldown = self._routes()
+            if not routes:
+                await asyncio.sleep(cooldown)
+                continue
+            for route in routes:
+                self._use(route)
+                try:
+                    async with route.limiter.aslot(self.priority, tokens):
+                        message = await route.model.ainvoke(messages, _UNTRACED, stop=stop, **kwargs)
+                except Exception as e:
+                    if not is_rate_limited(e):
+                        raise
+                    self._throttled(route, e)
+                    error = e
+                    continue
+                route.limiter.settle(tokens, message)
+                return ChatResult(generations=[ChatGeneration(message=message)])
+        raise error or TimeoutError(f"LLM {self.primary_limiter.name} stayed throttled")
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: List[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        tokens = self._estimate(messages)
+        error: BaseException | None = None
+        for _ in range(self.max_retries + 1):
+            routes, cooldown = self._routes()
+            if not routes:
+                time.sleep(cooldown)
+                continue
+            for route in routes:
+                streamed: AIMessageChunk | None = None
+                self._use(route)
+                try:
+                    with route.limiter.slot(self.priority, tokens):
+                        for chunk in route.model.stream(messages, _UNTRACED, stop=stop, **kwargs):
+                            streamed = chunk if streamed is None else streamed + chunk
+                            generation = ChatGenerationChunk(message=chunk)
+                            if run_manager is not None:
+                                run_manager.on_llm_new_token(chunk.text(), chunk=generation)
+                            yield generation
+                except Exception as e:
+                    if streamed is not None or not is_rate_limited(e):
+                        raise
+                    self._throttled(route, e)
+                    error = e
+                    continue
+                route.limiter.settle(tokens, streamed)
+                return
+        raise error or TimeoutError(f"LLM {self.primary_limiter.name} stayed throttled")
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: List[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = self._estimate(messages)
+        error: BaseException | None = None
+        for _ in range(self.max_retries + 1):
+            routes, cooldown = self._routes()
+            if not routes:
+                await asyncio.sleep(cooldown)
+                continue
+            for route in routes:
+                streamed: AIMessageChunk | None = None
+                self._use(route)
+                try:
+                    async with route.limiter.aslot(self.priority, tokens):
+                        async for chunk in route.model.astream(messages, _UNTRACED, stop=stop, **kwargs):
+                            streamed = chunk if streamed is None else streamed + chunk
+                            generation = ChatGenerationChunk(message=chunk)
+                            if run_manager is not None:
+                                await run_manager.on_llm_new_token(chunk.text(), chunk=generation)
+                            yield generation
+                except Exception as e:
+                    if streamed is not None or not is_rate_limited(e):
+                        raise
+                    self._throttled(route, e)
+                    error = e
+                    continue
+                route.limiter.settle(tokens, streamed)
+                return
+        raise error or TimeoutError(f"LLM {self.primary_limiter.name} stayed throttled")
+
+
+@lru_cache(maxsize=None)
+def http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """One connection pool shared by every Groq client (router and agents)."""
+    limits = httpx.Limits(
+        max_connections=TOOLS_CFG.llm_gateway_max_connections,
+        max_keepalive_connections=TOOLS_CFG.llm_gateway_max_keepalive_connections,
+    )
+    return httpx.Client(limits=limits, timeout=TOOLS_CFG.llm_gateway_request_timeout), httpx.AsyncClient(limits=limits, timeout=TOOLS_CFG.llm_gateway_request_timeout)
+
+
+_LIMITERS: Dict[str, ModelLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_limiter(provider: str, model: str, requests_per_minute: float, tokens_per_minute: float) -> ModelLimiter:
+    """Limiter per provider model: providers rate limit per model, whichever agent calls it."""
+    name = f"{provider}:{model}"
+    with _LIMITERS_LOCK:
+        if name not in _LIMITERS:
+            _LIMITERS[name] = ModelLimiter(
+                name,
+                requests_per_minute=requests_per_minute,
+                tokens_per_minute=tokens_per_minute,
+                max_concurrency=TOOLS_CFG.llm_gateway_max_concurrency,
+                queue_timeout=TOOLS_CFG.llm_gateway_queue_timeout or None,
+            )
+        return _LIMITERS[name]
+
+
+def _client(provider: str, model: str, temperature: float, base_url: str = "") -> BaseChatModel:
+    if provider == "groq":
+        from langchain_groq import ChatGroq
+        http_client, http_async_client = http_clients()
+        # Throttling is handled by the gateway, the SDK's own backoff would stall the caller.
+        return ChatGroq(model=model, temperature=temperature, http_client=http_client, http_async_client=http_async_client, max_retries=0)
+    if provider == "ollama":
+        from langchain_ollama.chat_models import ChatOllama
+        return ChatOllama(model=model, temperature=temperature, base_url=base_url or None)
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+
+def get_chat_model(model: str, temperature: float, priority: int | None = None) -> BaseChatModel:
+    """
+    Groq chat model for `model`, behind the rate limiting gateway (`llm_gateway.enabled`)
+    with the configured fallback provider. `priority` defaults to the agent priority.
+    """
+    if not TOOLS_CFG.llm_gateway_enabled:
+        return _client("groq", model, temperature)
+    fallback = fallback_limiter = None
+    if TOOLS_CFG.llm_gateway_fallback_provider != "none":
+        fallback = _client(TOOLS_CFG.llm_gateway_fallback_provider, TOOLS_CFG.llm_gateway_fallback_model, temperature, TOOLS_CFG.llm_gateway_fallback_base_url)
+        fallback_limiter = get_limiter(
+            TOOLS_CFG.llm_gateway_fallback_provider,
+            TOOLS_CFG.llm_gateway_fallback_model,
+            TOOLS_CFG.llm_gateway_fallback_requests_per_minute,
+            TOOLS_CFG.llm_gateway_fallback_tokens_per_minute,
+        )
+    return GatewayChatModel(
+        primary=_client("groq", model, temperature),
+        primary_limiter=get_limiter("groq", model, TOOLS_CFG.llm_gateway_requests_per_minute, TOOLS_CFG.llm_gateway_tokens_per_minute),
+        fallback=fallback,
+        fallback_limiter=fallback_limiter,
+        priority=TOOLS_CFG.llm_gateway_agent_priority if priority is None else priority,
+        max_retries=TOOLS_CFG.llm_gateway_max_retries,
+        throttle_cooldown=TOOLS_CFG.llm_gateway_throttle_cooldown,
+    )
+
+
+def gateway_stats() -> Dict[str, Dict[str, float]]:
+    with _LIMITERS_LOCK:
+        limiters = list(_LIMITERS.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
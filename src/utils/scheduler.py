@@ -0,0 +1,229 @@
+from langchain_core.runnables.config import var_child_runnable_config
+
+from typing import AsyncIterator, Callable, Deque, Dict, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+import threading
+import asyncio
+import time
+
+from ..load_config import get_tools_config
+from .instrumentation import METRICS
+
+TOOLS_CFG = get_tools_config()
+
+# Session of calls made outside a graph run (scripts, benchmarks); graph runs carry it as
+# `session_id` metadata instead (see `thread_config`), which also reaches their tools.
+SESSION_ID: ContextVar[str] = ContextVar("session_id", default="")
+
+BACKENDS = ("request", "spark", "llm", "search", "retrieval")
+
+
+def current_session() -> str:
+    """The chat session of the running call: SESSION_ID, else the graph run's `session_id` metadata."""
+    session = SESSION_ID.get()
+    if session:
+        return session
+    config = var_child_runnable_config.get() or {}
+    return str((config.get("metadata") or {}).get("session_id") or "")
+
+
+class BackendBusyError(RuntimeError):
+    """A backend's wait queue is full, or the wait for a slot timed out; retry later."""
+
+    def __init__(self, backend: str, reason: str, queued: int) -> None:
+        self.backend = backend
+        self.reason = reason
+        super().__init__(f"The {backend} backend is busy ({reason}, {queued} calls waiting), retry in a few seconds.")
+
+
+@dataclass(eq=False)
+class _Ticket:
+    session: str
+    wake: Callable[[], None]
+    granted: bool = False
+
+
+class FairLimiter:
+    """
+    Concurrency limit of one backend with a bounded, per-session fair wait queue.
+
+    Up to `max_concurrency` calls run at once. Waiting calls are queued per session and
+    served round robin across sessions, so one session's burst (e.g. a fan-out question)
+    cannot starve the others. A call arriving at a full queue (`max_queue`) fails right
+    away and one waiting longer than `queue_timeout` seconds gives up, both with
+    BackendBusyError. Works for threads and coroutines alike.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float | None = None) -> None:
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._queues: OrderedDict[str, Deque[_Ticket]] = OrderedDict()
+        self._active = 0
+        self._queued = 0
+        self._counts = {"admitted": 0, "rejected_queue_full": 0, "rejected_timeout": 0}
+        self._wait_seconds = 0.0
+
+    def _enqueue(self, session: str, wake: Callable[[], None]) -> _Ticket:
+        with self._lock:
+            ticket = _Ticket(session, wake)
+            if self._active < self.max_concurrency and not self._queues:
+                self._active += 1
+                ticket.granted = True
+                return ticket
+            if self._queued >= self.max_queue:
+                self._counts["rejected_queue_full"] += 1
+                queued = self._queued
+            else:
+                self._queues.setdefault(session, deque()).append(ticket)
+                self._queued += 1
+                return ticket
+        METRICS.inc("scheduler_rejected", backend=self.name, reason="queue_full")
+        raise BackendBusyError(self.name, "queue full", queued)
+
+    def _grant(self) -> None:
+        while self._active < self.max_concurrency and self._queues:
+            session, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            # Round robin: the session goes to the back of the line after each grant.
+            if queue:
+                self._queues.move_to_end(session)
+            else:
+                del self._queues[session]
+            self._queued -= 1
+            self._active += 1
+            ticket.granted = True
+            ticket.wake()
+
+    def _abandon(self, ticket: _Ticket, reason: str) -> None:
+        with self._lock:
+            if ticket.granted:
+                # Granted while giving up: hand the slot on instead of leaking it.
+                self._active -= 1
+                self._grant()
+            else:
+                queue = self._queues[ticket.session]
+                queue.remove(ticket)
+                self._queued -= 1
+                if not queue:
+                    del self._queues[ticket.session]
+            if reason == "timeout":
+                self._counts["rejected_timeout"] += 1
+            queued = self._queued
+        if reason == "timeout":
+            METRICS.inc("scheduler_rejected", backend=self.name, reason="timeout")
+            raise BackendBusyError(self.name, f"no slot within {self.queue_timeout:g}s", queued)
+
+    def _admitted(self, started: float) -> None:
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._counts["admitted"] += 1
+            self._wait_seconds += waited
+        METRICS.observe("scheduler_wait", waited, backend=self.name)
+
+    def release(self) -> None:
+        with self._lock:
+            self._active -= 1
+            self._grant()
+
+    @contextmanager
+    def slot(self, session: str | None = None) -> Iterator[None]:
+        started = time.perf_counter()
+        event = threading.Event()
+        ticket = self._enqueue(current_session() if session is None else session, event.set)
+        if not ticket.granted and not event.wait(self.queue_timeout):
+            self._abandon(ticket, "timeout")
+        self._admitted(started)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self, session: str | None = None) -> AsyncIterator[None]:
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        ticket = self._enqueue(current_session() if session is None else session, wake)
+        if not ticket.granted:
+            try:
+                await asyncio.wait_for(future, self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._abandon(ticket, "timeout")
+            except asyncio.CancelledError:
+                self._abandon(ticket, "cancelled")
+                raise
+        self._admitted(started)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            admitted = self._counts["admitted"]
+            return {
+                **self._counts,
+                "active": self._active,
+                "queued": self._queued,
+                "sessions_waiting": len(self._queues),
+                "avg_wait_ms": round(1000 * self._wait_seconds / admitted, 2) if admitted else 0.0,
+            }
+
+
+class Scheduler:
+    """
+    Admission control for the backends a chat request uses: whole requests ("request"),
+    Spark queries, LLM calls, web search and retrieval each have their own FairLimiter.
+    A backend without a limiter (or a disabled scheduler) is not limited.
+    """
+
+    def __init__(self, limiters: Dict[str, FairLimiter] | None = None) -> None:
+        self.limiters = limiters or {}
+
+    @contextmanager
+    def slot(self, backend: str, session: str | None = None) -> Iterator[None]:
+        limiter = self.limiters.get(backend)
+        if limiter is None:
+            yield
+            return
+        with limiter.slot(session):
+            yield
+
+    @asynccontextmanager
+    async def aslot(self, backend: str, session: str | None = None) -> AsyncIterator[None]:
+        limiter = self.limiters.get(backend)
+        if limiter is None:
+            yield
+            return
+        async with limiter.aslot(session):
+            yield
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
+
+
+def _load_scheduler() -> Scheduler:
+    if not TOOLS_CFG.scheduler_enabled:
+        return Scheduler()
+    return Scheduler({
+        backend: FairLimiter(
+            backend,
+            max_concurrency=getattr(TOOLS_CFG, f"scheduler_{backend}_max_concurrency"),
+            max_queue=getattr(TOOLS_CFG, f"scheduler_{backend}_max_queue"),
+            queue_timeout=getattr(TOOLS_CFG, f"scheduler_{backend}_queue_timeout") or None,
+        )
+        for backend in BACKENDS
+    })
+
+
+SCHEDULER = _load_scheduler()
@@ -0,0 +1,230 @@
+from pyspark.sql.connect.client.core import SparkConnectGrpcException
+from langchain_community.utilities.spark_sql import SparkSQL
+from pyspark.sql import SparkSession
+
+from typing import Callable, Dict, Iterator, List, TypeVar
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import threading
+import time
+
+T = TypeVar("T")
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    """
+    True when `exc` means the Spark Connect session itself is unusable.
+
+    Query level failures (AnalysisException, ParseException, ...) are subclasses of
+    SparkConnectGrpcException, so only the bare exception type is treated as a broken
+    channel / expired session that warrants a reconnect.
+    """
+    return type(exc) is SparkConnectGrpcException
+
+
+@dataclass(eq=False)
+class PooledSparkSession:
+    """A SparkSession owned by the pool together with its cached SparkSQL wrapper."""
+    session: SparkSession
+    db: SparkSQL
+    last_checked: float = field(default_factory=time.monotonic)
+    healthy: bool = True
+
+
+class SparkSessionPool:
+    """
+    Hands out leased SparkSessions and keeps them alive with a background TTL heartbeat.
+
+    At most `max_sessions` sessions are leased at once; callers beyond that block for up to
+    `lease_timeout` seconds. A session is only replaced when a call on it raises a
+    connection-level SparkConnectGrpcException, so the hot path never pays a probe query.
+    The heartbeat probes a session only while holding one of the `max_sessions` slots and
+    interrupts a probe after `probe_timeout` seconds, so at most `max_sessions` sessions exist.
+
+    Any zero-argument callable returning a SparkSession can be used as `session_factory`,
+    e.g. `lambda: SparkSession.builder.remote("sc://localhost:15002").create()` to stand in
+    for Databricks Connect with a local Spark Connect server.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], SparkSession],
+        catalog: str | None = None,
+        schema: str | None = None,
+        max_sessions: int = 4,
+        heartbeat_ttl: float = 300.0,
+        lease_timeout: float = 60.0,
+        probe_timeout: float = 10.0,
+    ) -> None:
+        self.session_factory = session_factory
+        self.catalog = catalog
+        self.schema = schema
+        self.max_sessions = max_sessions
+        self.heartbeat_ttl = heartbeat_ttl
+        self.lease_timeout = lease_timeout
+        self.probe_timeout = probe_timeout
+
+        self._idle: List[PooledSparkSession] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_sessions)
+        self._closed = threading.Event()
+        self._heartbeat: threading.Thread | None = None
+        self._counters: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "reconnects": 0,
+            "heartbeats": 0,
+            "heartbeat_failures": 0,
+        }
+
+    def _connect(self) -> PooledSparkSession:
+        session = self.session_factory()
+        db = SparkSQL(spark_session=session, catalog=self.catalog, schema=self.schema)
+        return PooledSparkSession(session=session, db=db)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _checkout(self) -> PooledSparkSession:
+        with self._lock:
+            pooled = self._idle.pop() if self._idle else None
+        if pooled is not None:
+            self._count("hits")
+            return pooled
+        self._count("misses")
+        return self._connect()
+
+    def _checkin(self, pooled: PooledSparkSession) -> None:
+        if pooled.healthy:
+            with self._lock:
+                if len(self._idle) < self.max_sessions:
+                    self._idle.append(pooled)
+                    return
+            # Never more idle sessions than can be leased at once.
+            self._stop(pooled)
+            return
+
+        # Broken sessions are dropped, the next checkout opens a fresh one in their place.
+        self._count("reconnects")
+        self._stop(pooled)
+
+    @staticmethod
+    def _stop(pooled: PooledSparkSession) -> None:
+        try:
+            pooled.session.stop()
+        except Exception:
+            pass
+
+    @contextmanager
+    def lease(self, timeout: float | None = None) -> Iterator[PooledSparkSession]:
+        """Lease a session for the duration of the `with` block, waiting at most `timeout` (default `lease_timeout`) seconds."""
+        self._ensure_heartbeat()
+        timeout = self.lease_timeout if timeout is None else max(min(timeout, self.lease_timeout), 0.0)
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No Spark session available within {timeout:g}s (max_sessions={self.max_sessions}).")
+        try:
+            pooled = self._checkout()
+            try:
+                yield pooled
+            except Exception as exc:
+                if is_connection_error(exc):
+                    pooled.healthy = False
+                raise
+            finally:
+                pooled.last_checked = time.monotonic()
+                self._checkin(pooled)
+        finally:
+            self._slots.release()
+
+    def execute(self, fn: Callable[[PooledSparkSession], T], timeout: float | None = None) -> T:
+        """
+        Run `fn` on a leased session, reconnecting and retrying once on a connection error.
+        `timeout` bounds the wait for a session (see `lease`).
+        """
+        try:
+            with self.lease(timeout) as pooled:
+                return fn(pooled)
+        except Exception as exc:
+            if not is_connection_error(exc):
+                raise
+        with self.lease(timeout) as pooled:
+            return fn(pooled)
+
+    def heartbeat(self) -> None:
+        """
+        Probe idle sessions that have not been used within `heartbeat_ttl` seconds. Each probe
+        holds a lease slot; with every slot taken the sessions are in use and the rest wait.
+        """
+        now = time.monotonic()
+        with self._lock:
+            stale = [p for p in self._idle if now - p.last_checked >= self.heartbeat_ttl]
+
+        for pooled in stale:
+            if not self._slots.acquire(blocking=False):
+                return
+            try:
+                with self._lock:
+                    if pooled not in self._idle:
+                        # Leased meanwhile, the lease proved it alive or broken.
+                        continue
+                    self._idle.remove(pooled)
+                self._probe(pooled)
+                pooled.last_checked = time.monotonic()
+                self._checkin(pooled)
+            finally:
+                self._slots.release()
+
+    def _probe(self, pooled: PooledSparkSession) -> None:
+        """`SELECT 1` on the session, interrupted after `probe_timeout` seconds (then unhealthy)."""
+        self._count("heartbeats")
+        fired = threading.Event()
+
+        def on_timeout() -> None:
+            fired.set()
+            try:
+                pooled.session.interruptAll()
+            except Exception:
+                pass
+
+        timer = threading.Timer(self.probe_timeout, on_timeout)
+        timer.daemon = True
+        timer.start()
+        try:
+            pooled.session.sql("SELECT 1").collect()
+        except Exception as exc:
+            self._count("heartbeat_failures")
+            if fired.is_set() or is_connection_error(exc):
+                pooled.healthy = False
+        finally:
+            timer.cancel()
+
+    def _heartbeat_loop(self) -> None:
+        interval = max(self.heartbeat_ttl / 2, 1.0)
+        while not self._closed.wait(interval):
+            try:
+                self.heartbeat()
+            except Exception:
+                # Never let a failed probe kill the heartbeat thread.
+                pass
+
+    def _ensure_heartbeat(self) -> None:
+        if self._heartbeat is not None or self.heartbeat_ttl <= 0:
+            return
+        with self._lock:
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="spark-pool-heartbeat", daemon=True)
+                self._heartbeat.start()
+
+    def stats(self) -> Dict[str, int]:
+        """Pool hit/miss, reconnect and heartbeat counters plus current sizes."""
+        with self._lock:
+            return {**self._counters, "idle": len(self._idle), "max_sessions": self.max_sessions}
+
+    def close(self) -> None:
+        """Stop the heartbeat and drop all idle sessions."""
+        self._closed.set()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._stop(pooled)
@@ -0,0 +1,11 @@
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token) used for prompt budgets.
+
+    It avoids a tokenizer round trip on the hot path; budgets are soft limits so the
+    approximation is good enough across the Groq/Gemini models used here.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
@@ -19,3 +19,43 @@ create table if not exists document_chunks (
 
 create index if not exists document_chunk_embedding_index
 on document_chunks using hnsw (embedding vector_cosine_ops);
+
+-- What the RAG retriever reads (rag_agent.vs_table / vs_query): the chunks with their
+-- document fields as metadata, in the id / content / metadata / embedding shape of
+-- LangChain's SupabaseVectorStore.
+create or replace view document_chunks_search as
+select
+  c.id,
+  c.content,
+  jsonb_build_object(
+    'document_id', c.document_id,
+    'file_name', d.file_name,
+    'file_path', d.file_path,
+    'chunk_order', c.chunk_order
+  ) as metadata,
+  c.embedding
+from document_chunks c
+join documents d on d.id = c.document_id;
+
+create or replace function match_document_chunks (
+  query_embedding vector (768),
+  filter jsonb default '{}'
+) returns table (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language plpgsql as $$
+#variable_conflict use_column
+begin
+  return query
+  select
+    id,
+    content,
+    metadata,
+    1 - (document_chunks_search.embedding <=> query_embedding) as similarity
+  from document_chunks_search
+  where metadata @> filter
+  order by document_chunks_search.embedding <=> query_embedding;
+end;
+$$;